@@ -0,0 +1,75 @@
+"""
+Throughput of the training environments in env-steps per second, for 1 up to max_workers worker processes.
+Every worker runs a simulated RobotEnvWithObstacles (or RobotEnv with --no_obstacles) behind a
+SharedMemoryPyEnvironment and takes random actions, the scaling column is the speedup over a single worker.
+
+python -m benchmarks.environment_throughput --max_workers=8 --steps=500
+"""
+
+import functools
+import multiprocessing as mp
+import time
+
+import numpy as np
+from absl import app
+from absl import flags
+
+from src.reinforcementlearning.environment.robot_env import RobotEnv
+from src.reinforcementlearning.environment.robot_env_with_obstacles import RobotEnvWithObstacles
+from src.reinforcementlearning.environment.scenario import sensible_scenarios, train_scenarios, split_scenarios
+from src.reinforcementlearning.environment.shared_memory_py_environment import SharedMemoryPyEnvironment
+
+flags.DEFINE_integer('max_workers', mp.cpu_count(), 'Largest number of worker processes to measure')
+flags.DEFINE_integer('steps', 500, 'Batched steps to time for every number of workers')
+flags.DEFINE_boolean('no_obstacles', False, 'Use RobotEnv instead of RobotEnvWithObstacles')
+FLAGS = flags.FLAGS
+
+
+def get_worker_counts(max_workers):
+    """:return: 1, 2, 4, ... up to and including max_workers"""
+    counts = []
+    count = 1
+    while count < max_workers:
+        counts.append(count)
+        count *= 2
+    return counts + [max_workers]
+
+
+def get_env_constructors(number_of_workers, no_obstacles):
+    if no_obstacles:
+        return [RobotEnv] * number_of_workers
+    return [functools.partial(RobotEnvWithObstacles, scenarios=worker_scenarios)
+            for worker_scenarios in split_scenarios(sensible_scenarios + train_scenarios, number_of_workers)]
+
+
+def measure_steps_per_second(number_of_workers, steps, no_obstacles):
+    env = SharedMemoryPyEnvironment(get_env_constructors(number_of_workers, no_obstacles))
+    try:
+        random_generator = np.random.default_rng(0)
+        action_shape = (number_of_workers,) + env.action_spec().shape
+        env.reset()
+        # the first steps also load the kernels and the robot in every worker
+        for _ in range(10):
+            env.step(random_generator.uniform(-1, 1, action_shape).astype(np.float32))
+
+        start = time.perf_counter()
+        for _ in range(steps):
+            env.step(random_generator.uniform(-1, 1, action_shape).astype(np.float32))
+        return steps * number_of_workers / (time.perf_counter() - start)
+    finally:
+        env.close()
+
+
+def main(_):
+    print('{:>8} {:>14} {:>8}'.format('workers', 'env-steps/s', 'scaling'))
+    single_worker = None
+    for number_of_workers in get_worker_counts(FLAGS.max_workers):
+        steps_per_second = measure_steps_per_second(number_of_workers, FLAGS.steps, FLAGS.no_obstacles)
+        if single_worker is None:
+            single_worker = steps_per_second
+        print('{:>8} {:>14.1f} {:>7.2f}x'.format(number_of_workers, steps_per_second,
+                                                 steps_per_second / single_worker))
+
+
+if __name__ == '__main__':
+    app.run(main)
@@ -0,0 +1,188 @@
+"""
+Micro benchmarks for the kinematics used in the 100 Hz control loops.
+Every benchmark is run for a batch of 1, 100 and 10000 items and the latency per item is compared to the baseline
+stored in kinematics_baseline.json, the run fails when one of them got slower than the tolerance allows.
+
+python -m benchmarks.kinematics_benchmarks                     compare against the baseline
+python -m benchmarks.kinematics_benchmarks --update_baseline   store the current timings as the new baseline
+
+The baseline depends on the machine it was made on, update it when switching machines.
+"""
+
+import json
+import os
+import sys
+import timeit
+
+import numpy as np
+from absl import app
+from absl import flags
+
+from src import global_constants
+from src.kinematics.collision import get_clearances, get_trajectory_clearances
+from src.kinematics.jit_warmup import warmup_kernels
+from src.kinematics.kinematics import inverse_kinematics, batch_inverse_kinematics, forward_position_kinematics, \
+    batch_forward_position_kinematics, jacobian_transpose_on_f, batch_jacobian_transpose_on_f
+from src.kinematics.kinematics_utils import Pose, calculate_euler_matrix_from_angles, \
+    calculate_euler_matrices_from_angles
+from src.reinforcementlearning.environment.robot_env_utils import get_attractive_force_world
+from src.utils.movement_utils import get_spline_step_arrays
+
+flags.DEFINE_boolean('update_baseline', False, 'Store the timings of this run as the new baseline')
+flags.DEFINE_float('tolerance', 0.5, 'Allowed relative slowdown compared to the baseline before failing')
+flags.DEFINE_string('baseline', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'kinematics_baseline.json'),
+                    'Path of the baseline json file')
+FLAGS = flags.FLAGS
+
+BATCH_SIZES = [1, 100, 10000]
+robot_config = global_constants.dynamixel_robot_config
+
+
+class BenchmarkData:
+    """Random but reproducible inputs for a batch"""
+
+    def __init__(self, batch_size):
+        random_generator = np.random.default_rng(0)
+        self.batch_size = batch_size
+        self.positions = np.column_stack((random_generator.uniform(-20, 20, batch_size),
+                                          random_generator.uniform(20, 35, batch_size),
+                                          random_generator.uniform(5, 25, batch_size)))
+        self.alphas = random_generator.uniform(-0.5, 0.5, batch_size)
+        self.betas = np.zeros(batch_size)
+        self.gammas = random_generator.uniform(-0.5, 0.5, batch_size)
+        self.poses = [Pose(x, y, z, alpha=alpha, gamma=gamma)
+                      for (x, y, z), alpha, gamma in zip(self.positions, self.alphas, self.gammas)]
+        self.rotation_matrices = calculate_euler_matrices_from_angles(self.alphas, self.betas, self.gammas)
+        self.angles = batch_inverse_kinematics(self.positions, self.rotation_matrices, False, robot_config)
+        self.forces = random_generator.normal(size=(batch_size, 3, 3))
+        self.control_points = random_generator.normal(size=(batch_size, 3, 3))
+        self.target_points = random_generator.normal(size=(batch_size, 3, 3))
+        self.boxes = np.array([[0, 35, 10, 5, 5, 10, np.pi / 4], [20, 20, 5, 3, 3, 5, 0]])
+        self.spline_poses = [Pose(-20, 20, 5), Pose(-10, 30, 10), Pose(0, 20, 10), Pose(10, 30, 10), Pose(20, 20, 5)]
+
+
+def inverse_kinematics_loop(data):
+    for pose in data.poses:
+        inverse_kinematics(pose, robot_config)
+
+
+def batch_inverse_kinematics_call(data):
+    batch_inverse_kinematics(data.positions, data.rotation_matrices, False, robot_config)
+
+
+def forward_kinematics_loop(data):
+    for angles in data.angles:
+        forward_position_kinematics(angles, robot_config)
+
+
+def batch_forward_kinematics_call(data):
+    batch_forward_position_kinematics(data.angles, robot_config)
+
+
+def jacobian_transpose_loop(data):
+    for forces, angles in zip(data.forces, data.angles):
+        jacobian_transpose_on_f(forces, angles, robot_config, 11.2)
+
+
+def batch_jacobian_transpose_call(data):
+    batch_jacobian_transpose_on_f(data.forces, data.angles, robot_config, 11.2)
+
+
+def euler_matrix_loop(data):
+    for alpha, beta, gamma in zip(data.alphas, data.betas, data.gammas):
+        calculate_euler_matrix_from_angles(alpha, beta, gamma)
+
+
+def batch_euler_matrices_call(data):
+    calculate_euler_matrices_from_angles(data.alphas, data.betas, data.gammas)
+
+
+def attractive_forces_loop(data):
+    for control_points, target_points in zip(data.control_points, data.target_points):
+        get_attractive_force_world(control_points, target_points)
+
+
+def clearances_loop(data):
+    for angles in data.angles:
+        get_clearances(angles, robot_config, data.boxes)
+
+
+def trajectory_clearances_call(data):
+    get_trajectory_clearances(data.angles, robot_config, data.boxes)
+
+
+def spline_step_arrays_call(data):
+    # one spline with batch_size steps
+    get_spline_step_arrays(data.spline_poses, data.batch_size / global_constants.steps_per_second)
+
+
+# name: function that handles a whole batch
+BENCHMARKS = {
+    'inverse_kinematics': inverse_kinematics_loop,
+    'batch_inverse_kinematics': batch_inverse_kinematics_call,
+    'forward_position_kinematics': forward_kinematics_loop,
+    'batch_forward_position_kinematics': batch_forward_kinematics_call,
+    'jacobian_transpose_on_f': jacobian_transpose_loop,
+    'batch_jacobian_transpose_on_f': batch_jacobian_transpose_call,
+    'calculate_euler_matrix_from_angles': euler_matrix_loop,
+    'calculate_euler_matrices_from_angles': batch_euler_matrices_call,
+    'get_attractive_force_world': attractive_forces_loop,
+    'get_clearances': clearances_loop,
+    'get_trajectory_clearances': trajectory_clearances_call,
+    'get_spline_step_arrays': spline_step_arrays_call,
+}
+
+
+def time_per_item(function, data, repeats=5):
+    """Best time out of a number of repeats, divided by the batch size, in seconds"""
+    timer = timeit.Timer(lambda: function(data))
+    # autorange picks the number of calls that takes at least 0.2 seconds
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeats, number=number)) / number
+    return best / data.batch_size
+
+
+def run_benchmarks():
+    """:return: dict of 'name[batch_size]' to the latency per item in seconds"""
+    results = {}
+    for batch_size in BATCH_SIZES:
+        data = BenchmarkData(batch_size)
+        for name, function in BENCHMARKS.items():
+            key = '{}[{}]'.format(name, batch_size)
+            results[key] = time_per_item(function, data)
+            print('{:<50} {:>12.3f} us'.format(key, results[key] * 1e6))
+    return results
+
+
+def find_regressions(results, baseline, tolerance):
+    """:return: list of (name, baseline, result) for every benchmark that got slower than the tolerance allows"""
+    regressions = []
+    for key, result in results.items():
+        if key in baseline and result > baseline[key] * (1 + tolerance):
+            regressions.append((key, baseline[key], result))
+    return regressions
+
+
+def main(_):
+    warmup_kernels()
+    results = run_benchmarks()
+
+    if FLAGS.update_baseline:
+        with open(FLAGS.baseline, 'w') as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+        print('stored baseline in {}'.format(FLAGS.baseline))
+        return
+
+    with open(FLAGS.baseline, 'r') as file:
+        baseline = json.load(file)
+
+    regressions = find_regressions(results, baseline, FLAGS.tolerance)
+    for key, baseline_time, result in regressions:
+        print('REGRESSION {}: {:.3f} us -> {:.3f} us'.format(key, baseline_time * 1e6, result * 1e6))
+    if regressions:
+        sys.exit(1)
+    print('no regressions')
+
+
+if __name__ == '__main__':
+    app.run(main)
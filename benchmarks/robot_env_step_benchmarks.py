@@ -0,0 +1,155 @@
+"""
+Cost of one step of RobotEnv, split into its parts, for the way the observation used to be calculated and for the
+current fast path: control point positions in one getLinkStates call, target points cached for the episode,
+repulsive forces from a RepulsiveForceEngine instead of a getClosestPoints call per control point and obstacle,
+and the observation written into a preallocated buffer.
+Both are measured for a scenario without obstacles and for one with three obstacles.
+Runs the simulation and the functions that RobotEnv uses, without tf_agents.
+
+python -m benchmarks.robot_env_step_benchmarks
+"""
+
+import timeit
+
+import numpy as np
+import pybullet as p
+from absl import app
+
+from src.kinematics.jit_warmup import warmup_kernels
+from src.reinforcementlearning.environment.robot_env_utils import get_attractive_force_world, get_target_points, \
+    get_repulsive_forces_world, fill_observation
+from src.reinforcementlearning.environment.repulsive_force_engine import RepulsiveForceEngine
+from src.reinforcementlearning.environment.scenario import scenarios_no_obstacles, hard_scenarios
+from src.robot_controllers.simulated_robot.simulated_robot_controller import read_control_point_positions
+from src.simulation.simulation_utils import start_simulated_robot
+from src.utils.obstacle import BoxObstacle
+
+
+class StepData:
+    """The state of RobotEnv at the start of an episode of a scenario"""
+
+    def __init__(self, scenario):
+        self.robot = start_simulated_robot(use_gui=False)
+        self.physics_client = self.robot.physics_client
+        floor = BoxObstacle([1000, 1000, 1], [0, 0, -1])
+        floor.build(self.physics_client)
+        scenario = scenario.copy()
+        scenario.build_scenario(self.physics_client)
+        self.obstacle_ids = [obstacle.obstacle_id for obstacle in scenario.obstacles] + [floor.obstacle_id]
+        self.target_pose = scenario.target_pose
+        self.pose = scenario.start_pose
+        self.robot.reset_to_pose(self.pose)
+        p.stepSimulation(physicsClientId=self.physics_client)
+
+        self.control_points = self.robot.control_points
+        self.d6 = self.robot.robot_config.d6
+        _, target_point_2, target_point_3 = get_target_points(self.target_pose, self.d6)
+        self.target_points = np.array([target_point_2, target_point_3])
+        self.positions = read_control_point_positions(self.control_points)
+        self.attractive_forces = np.zeros((3, 3))
+        self.attractive_forces[1:], _ = get_attractive_force_world(self.positions[1:], self.target_points, 10)
+        self.repulsive_forces = get_repulsive_forces_world(self.robot.body_id, np.array(self.control_points),
+                                                           self.obstacle_ids, self.physics_client, 8, 6)
+        self.observation = np.zeros(17, dtype=np.float32)
+        self.engine = RepulsiveForceEngine(self.control_points, scenario.obstacles, repulsive_cutoff_distance=8,
+                                           clip_force=6)
+
+
+def normalized_vector_as_list(vector):
+    norm = np.linalg.norm(vector)
+    if norm < 1:
+        return vector.tolist()
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def simulation(data):
+    for _ in range(10):
+        p.stepSimulation(physicsClientId=data.physics_client)
+
+
+def positions_per_property(data):
+    # _sync_position read the tip three times, _get_observations the wrist and the tip again
+    c1, c2, c3 = data.control_points
+    _ = c3.position[0], c3.position[1], c3.position[2]
+    np.array([c2.position, c3.position], dtype=np.float64)
+
+
+def positions_in_one_call(data):
+    read_control_point_positions(data.control_points, data.positions, compute_forward_kinematics=True)
+
+
+def target_points_every_step(data):
+    _, target_point_2, target_point_3 = get_target_points(data.target_pose, data.d6)
+    np.array([target_point_2, target_point_3], dtype=np.float64)
+
+
+def attractive_forces(data):
+    get_attractive_force_world(data.positions[1:], data.target_points, attractive_cutoff_distance=10)
+
+
+def repulsive_forces_per_obstacle(data):
+    get_repulsive_forces_world(data.robot.body_id, np.array(data.control_points), data.obstacle_ids,
+                               data.physics_client, repulsive_cutoff_distance=8, clip_force=6)
+
+
+def repulsive_forces_from_engine(data):
+    data.engine.get_forces(data.positions)
+
+
+def observation_from_lists(data):
+    total_observation = []
+    total_observation += normalized_vector_as_list(data.attractive_forces[2])
+    for i in range(3):
+        total_observation += normalized_vector_as_list(data.repulsive_forces[i])
+    total_observation += [data.pose.x / 40, data.pose.y / 40, data.pose.z / 40, data.pose.alpha / np.pi,
+                          data.pose.gamma / np.pi]
+    np.array(np.array(total_observation), dtype=np.float32)
+
+
+def observation_in_place(data):
+    fill_observation(data.observation, data.attractive_forces[2], data.repulsive_forces, data.pose).copy()
+
+
+# part of a step: (before, after), None when the part is not done anymore
+STEP_PARTS = {
+    'simulation (10 steps)': (simulation, simulation),
+    'control point positions': (positions_per_property, positions_in_one_call),
+    'target points': (target_points_every_step, None),
+    'attractive forces': (attractive_forces, attractive_forces),
+    'repulsive forces': (repulsive_forces_per_obstacle, repulsive_forces_from_engine),
+    'observation': (observation_from_lists, observation_in_place),
+}
+
+
+def time_per_call(function, data, repeats=5):
+    """Best time out of a number of repeats, in seconds"""
+    if function is None:
+        return 0.0
+    timer = timeit.Timer(lambda: function(data))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeats, number=number)) / number
+
+
+def print_step_parts(data):
+    print('{:<26} {:>12} {:>12}'.format('part', 'before (us)', 'after (us)'))
+    total_before = total_after = 0.0
+    for name, (before, after) in STEP_PARTS.items():
+        time_before = time_per_call(before, data)
+        time_after = time_per_call(after, data)
+        total_before += time_before
+        total_after += time_after
+        print('{:<26} {:>12.1f} {:>12.1f}'.format(name, time_before * 1e6, time_after * 1e6))
+    print('{:<26} {:>12.1f} {:>12.1f}'.format('total', total_before * 1e6, total_after * 1e6))
+
+
+def main(_):
+    warmup_kernels()
+    for name, scenario in [('no obstacles', scenarios_no_obstacles[0]), ('three obstacles', hard_scenarios[-1])]:
+        data = StepData(scenario)
+        print('{}:'.format(name))
+        print_step_parts(data)
+        p.disconnect(data.physics_client)
+
+
+if __name__ == '__main__':
+    app.run(main)
@@ -6,11 +6,13 @@ from absl import flags
 from src import global_constants, server
 
 flags.DEFINE_boolean('use_simulation', False, 'Use the simulation instead of the real robot')
+flags.DEFINE_boolean('use_ik_cache', False, 'Look up the angles of poses that were solved before in an IK cache')
 FLAGS = flags.FLAGS
 
 
 def main(_):
     global_constants.use_simulation = FLAGS.use_simulation
+    global_constants.use_ik_cache = FLAGS.use_ik_cache
     global_constants.root_dir = os.getcwd()
     server.start_server()
 
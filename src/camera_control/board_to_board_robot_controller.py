@@ -1,16 +1,21 @@
+import logging as log
 import threading
 from copy import copy
 from functools import lru_cache
-from time import sleep
 
 import numpy as np
 
 import src.global_constants
 from src import global_constants
 from src.global_objects import get_robot
-from src.kinematics.kinematics_utils import Pose
+from src.kinematics.collision import is_in_collision
+from src.kinematics.jacobian_ik import inverse_kinematics_with_fallback
+from src.kinematics.kinematics_utils import Pose, get_orientation_angles
 from src.utils.decorators import synchronized_with_lock
 from src.utils.movement_utils import from_current_angles_to_pose, pose_to_pose
+from src.utils.online_spline import PoseStreamFilter
+from src.utils.robot_controller_utils import get_recommended_wait_time
+from src.utils.trajectory_executor import TrajectoryExecutor
 
 
 @lru_cache(maxsize=1)
@@ -20,7 +25,8 @@ def get_board_to_board_controller(image_hanlder):
     return controller
 
 
-def apply_workspace_limits(old_x, old_y, old_z, new_x, new_y, new_z):
+def apply_workspace_limits(old_x, old_y, old_z, new_x, new_y, new_z, orientation=None):
+    """:param orientation: euler matrix the end effector gets at the new position, None for the default orientation"""
     limits = global_constants.WorkSpaceLimits
 
     x, y, z = new_x, new_y, new_z
@@ -35,6 +41,13 @@ def apply_workspace_limits(old_x, old_y, old_z, new_x, new_y, new_z):
     if new_z < limits.z_min:
         z = old_z
 
+    # the target of the camera could still be unreachable for the robot, then don't move at all
+    reachability_grid = getattr(limits, 'reachability_grid', None)
+    if reachability_grid is not None:
+        alpha, gamma = get_orientation_angles(orientation) if orientation is not None else (0.0, 0.0)
+        if not reachability_grid.is_reachable(x, y, z, alpha, gamma):
+            return old_x, old_y, old_z
+
     return x, y, z
 
 
@@ -50,9 +63,15 @@ class BoardToBoardRobotController:
         self.startup_pose = Pose(21, 21.0, 4)
         self.neutral_pose = Pose(0, 30, 10)
         self.current_pose = None
+        # the angles that were sent to the robot last
+        self.previous_angles = None
+        # the pose those angles were calculated for
+        self.previous_target_pose = None
         self.done = False
         self.dt = 1.0 / 100
         self.kg = 0.04
+        # smooths the filtered poses of the camera before they are sent to the robot
+        self.pose_filter = PoseStreamFilter()
 
     @synchronized_with_lock("lock")
     def stop(self):
@@ -119,7 +138,7 @@ class BoardToBoardRobotController:
             new_z = z_m
             orientation = m_orientation
 
-        x, y, z = apply_workspace_limits(old_x, old_y, old_z, new_x, new_y, new_z)
+        x, y, z = apply_workspace_limits(old_x, old_y, old_z, new_x, new_y, new_z, orientation)
 
         new_pose = Pose(x, y, z, euler_matrix=orientation)
 
@@ -133,6 +152,29 @@ class BoardToBoardRobotController:
         t[2][0] = m[2][2]; t[2][1] = m[2][0]; t[2][2] = m[2][1]
         return t
 
+    def get_next_angles(self):
+        """
+        One step of the control loop, called by the executor right after the previous angles were sent
+        :return: the angles to send next or None to stop
+        """
+        if self.is_done():
+            return None
+
+        self.current_pose = self.get_new_filtered_pose()
+        target_pose = self.pose_filter.update(self.current_pose)
+        # when the board is out of reach the robot gets as close as it can instead of jumping
+        angles, _ = inverse_kinematics_with_fallback(target_pose, self.robot.robot_config, self.previous_angles)
+        limits = global_constants.WorkSpaceLimits
+        if is_in_collision(angles, self.robot.robot_config, limits.collision_boxes, limits.z_min):
+            # wait until the board moves to a place the robot can follow it to without hitting anything,
+            # the filter starts again from where the robot is instead of from the rejected poses
+            angles = self.previous_angles
+            self.pose_filter.reset(self.previous_target_pose)
+        else:
+            self.previous_target_pose = target_pose
+        self.previous_angles = angles
+        return angles
+
     def __start_internal(self):
         # The robot could be anywhere, first move it from it's current position to the target pose
         from_current_angles_to_pose(self.current_pose, self.robot, 1)
@@ -144,13 +186,11 @@ class BoardToBoardRobotController:
         pose_to_pose(self.current_pose, new_pose, self.robot, time=2)
         self.current_pose = new_pose
 
-        while True:
-            if self.is_done():
-                break
-
-            self.current_pose = self.get_new_filtered_pose()
-            recommended_time, time_taken = self.robot.move_to_pose(self.current_pose)
-            time_to_sleep = np.maximum(np.maximum(recommended_time, self.dt) - time_taken, 0)
-            sleep(time_to_sleep)
+        self.previous_angles = self.robot.pose_to_angles(self.current_pose)
+        self.pose_filter.reset(self.current_pose)
+        self.previous_target_pose = self.current_pose
+        executor = TrajectoryExecutor(self.robot, rate=1.0 / self.dt)
+        stats = executor.run(self.get_next_angles, get_wait_time=get_recommended_wait_time)
+        log.info(stats)
 
         self.stop_robot()
@@ -251,7 +251,8 @@ def start_obstacle_avoidance():
     aruco_image_handler = object_handler.get_aruco_image_handler()
 
     from src.camera_control.obstacle_avoidance import ObstacleAvoidance
-    obstacle_avoidance = ObstacleAvoidance(aruco_image_handler, robot)
+    motion_service = global_objects.get_motion_service(global_constants.dynamixel_robot_arm_port)
+    obstacle_avoidance = ObstacleAvoidance(aruco_image_handler, robot, motion_service)
     object_handler.set_obstacle_avoidance(obstacle_avoidance)
 
     print("obstacle avoidance started")
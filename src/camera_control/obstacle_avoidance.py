@@ -1,4 +1,5 @@
 import threading
+from concurrent.futures import CancelledError
 
 from tf_agents.environments import tf_py_environment
 
@@ -16,15 +17,18 @@ import numpy as np
 from src.reinforcementlearning.softActorCritic.sac_utils import create_agent, initialize_and_restore_train_checkpointer
 from src.reinforcementlearning.softActorCritic.smooth_paths import run_agent, get_usable_poses
 from src.utils.decorators import synchronized_with_lock
+from src.utils.motion_service import MotionService
 from src.utils.movement import SplineMovement
 from src.utils.movement_exception import MovementException
 
 
 class ObstacleAvoidance:
 
-    def __init__(self, aruco_image_handler, robot):
+    def __init__(self, aruco_image_handler, robot, motion_service=None):
         self.aruco_image_handler = aruco_image_handler
         self.robot = robot
+        self.motion_service = motion_service if motion_service is not None else MotionService(robot)
+        self.motion_handle = None
         self.lock = threading.RLock()
         self.stop_lock = threading.RLock()
         self.done = False
@@ -110,20 +114,21 @@ class ObstacleAvoidance:
             print("already stopped")
             return
         self.set_stopped(True)
+        if self.motion_handle is not None:
+            self.motion_handle.cancel()
         self.thread.join()
         self.thread = None
         self.set_stopped(False)
 
     @synchronized_with_lock("lock")
     def obstacle_avoidance_sac(self):
-        if self.thread is not None:
+        if self.thread is not None and self.thread.is_alive():
             print("already have thread running, shut it down first!")
             return
 
-        self.thread = threading.Thread(target=self.__start_sac)
+        # runs in the background, the request that started it returns right away
+        self.thread = threading.Thread(target=self.__start_sac, daemon=True)
         self.thread.start()
-        self.thread.join()
-        self.stop()
 
     def __start_sac(self):
         if self.tf_env is None:
@@ -143,32 +148,42 @@ class ObstacleAvoidance:
         spline_move = SplineMovement(usable_poses, 5, s=smoothing_factor)
 
         # self.robot.reset_to_pose(self.start_pose)
-        try:
-            spline_move.move(self.robot)
-        except MovementException:
+        if not self.__play(spline_move, reverse=False):
             print("unable to perform move")
 
+        if self.is_stopped():
+            return
         ans = input("Move back the way you came? y/n")
         if ans == 'y':
             pass
         else:
             return
 
-        try:
-            spline_move.move_reversed(self.robot)
-        except MovementException:
+        if not self.__play(spline_move, reverse=True):
             print("unable to perform reverse move")
 
+    def __play(self, movement, reverse):
+        """:return: True when the move finished, stop() cancels it"""
+        if self.is_stopped():
+            return False
+        self.motion_handle = self.motion_service.submit(movement, reverse=reverse)
+        try:
+            self.motion_handle.result()
+        except (MovementException, CancelledError):
+            return False
+        finally:
+            self.motion_handle = None
+        return True
+
     @synchronized_with_lock("lock")
     def obstacle_avoidance_gradient_descent(self):
-        if self.thread is not None:
+        if self.thread is not None and self.thread.is_alive():
             print("already have thread running, shut it down first!")
             return
 
-        self.thread = threading.Thread(target=self.__start_gradient_descent)
+        # runs in the background, the request that started it returns right away
+        self.thread = threading.Thread(target=self.__start_gradient_descent, daemon=True)
         self.thread.start()
-        self.thread.join()
-        self.stop()
 
     def __start_gradient_descent(self):
         if self.tf_env is None:
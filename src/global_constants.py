@@ -1,5 +1,7 @@
 import os
 
+import numpy as np
+
 from src.kinematics.kinematics_utils import RobotConfig
 from src.utils.os_utils import is_linux, get_project_root
 
@@ -22,8 +24,12 @@ CURRENT_BASED_POSITION_CONTROL_MODE = 5
 steps_per_second = 100
 recommended_max_servo_speed = 4  # rads/sec
 use_simulation = False
+use_ik_cache = False
 root_dir = None
 
+# built offline with src/kinematics/reachability.py
+reachability_grid_path = os.path.join(get_project_root(), 'kinematics', 'resources', 'reachability_grid')
+
 sac_network_weights = os.path.expanduser(os.path.dirname(get_project_root()) +
                                          '/src/reinforcementlearning/softActorCritic/'
                                          'checkpoints/rs_01_grid_new_network/train')
@@ -34,3 +40,8 @@ class WorkSpaceLimits:
     radius_max = 57
     y_min = d6 + 0.1  # y=0 is bad for the IK calculation, so let's make sure that never happens
     z_min = 0
+    # optional ReachabilityGrid, set on startup when one was built for the robot, see global_objects
+    reachability_grid = None
+    # box obstacles around the real robot that the arm should stay away from, see src/kinematics/collision.py,
+    # the floor is at z_min
+    collision_boxes = np.zeros((0, 7), dtype=np.float64)
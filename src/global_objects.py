@@ -9,20 +9,47 @@ from src.robot_controllers.combined_robot.combined_robot import CombinedRobot
 from src.xbox_control.xbox360controller.XboxController import XboxController
 
 
+@lru_cache(maxsize=1)
+def get_ik_cache():
+    if not global_constants.use_ik_cache:
+        return None
+    from src.kinematics.ik_cache import InverseKinematicsCache
+    return InverseKinematicsCache()
+
+
+@lru_cache(maxsize=1)
+def get_reachability_grid():
+    from src.kinematics.reachability import load_reachability_grid
+    return load_reachability_grid(global_constants.reachability_grid_path, global_constants.dynamixel_robot_config)
+
+
 @lru_cache(maxsize=1)
 def get_robot(port):
     from src.simulation.simulation_utils import start_simulated_robot
-    simulated_robot = start_simulated_robot(use_gui=True)
+    simulated_robot = start_simulated_robot(use_gui=True, ik_cache=get_ik_cache())
     if global_constants.use_simulation:
         from src.simulation.simulation_utils import start_simulated_robot
         return simulated_robot
     else:
         from src.robot_controllers.dynamixel_robot.dynamixel_robot_controller import DynamixelRobotController
-        dynamixel_robot = DynamixelRobotController(port, global_constants.dynamixel_robot_config)
+        dynamixel_robot = DynamixelRobotController(port, global_constants.dynamixel_robot_config,
+                                                   ik_cache=get_ik_cache())
         return CombinedRobot(dynamixel_robot, simulated_robot)
         # return DynamixelRobotController(port, global_constants.dynamixel_robot_config)
 
 
+@lru_cache(maxsize=1)
+def get_motion_service(port):
+    from src.utils.motion_service import MotionService
+    return MotionService(get_robot(port))
+
+
+@lru_cache(maxsize=1)
+def get_preview_renderer(port):
+    from src.utils.trajectory_preview import PreviewRenderer
+    return PreviewRenderer(get_robot(port))
+
+
 def get_servo_config(servo_config_path):
     try:
         with open(servo_config_path, 'r') as servo_config_file:
@@ -0,0 +1,323 @@
+import numpy as np
+from numba import jit, prange
+from numpy import sin, cos
+
+from src.kinematics.kinematics import calculate_link_points_into
+
+# The arm is modelled as 4 capsules (a line segment with a radius) between the points of forward_position_kinematics
+# base (0, 0, 0) -> p1 (shoulder) -> p2 (elbow) -> p4 (wrist) -> p6 (tip of the gripper).
+BASE, UPPER_ARM, FOREARM, GRIPPER = 0, 1, 2, 3
+# radii of the links themselves, used for self-collisions
+link_radii = np.array([4, 3, 3, 3], dtype=np.float64)
+# obstacles are kept further away, the forearm and the gripper use the radii of the control points in
+# generate_control_points that the obstacle avoidance works with
+obstacle_radii = np.array([4, 3, 6, 4], dtype=np.float64)
+
+# capsules that are connected always touch, only these pairs can collide with each other
+self_collision_pairs = np.array([[BASE, FOREARM],
+                                 [BASE, GRIPPER],
+                                 [UPPER_ARM, GRIPPER]], dtype=np.int64)
+
+# the arm may touch the floor, poses at the workspace limit z_min are on it and their forward kinematics can come out
+# a rounding error below it
+floor_tolerance = 1e-9
+
+# columns of the (M, 7) box array: centre x, y, z, half extends x, y, z and the rotation around the z-axis
+no_boxes = np.zeros((0, 7), dtype=np.float64)
+
+
+def get_box_array(box_obstacles):
+    """
+    :param box_obstacles: list of BoxObstacle
+    :return: (M, 7) array with the centre, the half extends and alpha of every box, as used by the kernels
+    """
+    boxes = np.zeros((len(box_obstacles), 7), dtype=np.float64)
+    for i, box in enumerate(box_obstacles):
+        boxes[i, :3] = box.base_center_position
+        boxes[i, 3:6] = box.half_extends
+        boxes[i, 6] = box.alpha
+    return boxes
+
+
+def get_capsule_points(angles, robot_config):
+    """:return: (5, 3) array with the end points of the capsules, capsule i goes from point i to point i + 1"""
+    points = np.zeros((5, 3), dtype=np.float64)
+    calculate_capsule_points_into(np.ascontiguousarray(angles, dtype=np.float64), float(robot_config.d1),
+                                  float(robot_config.a2), float(robot_config.d4), float(robot_config.d6), points)
+    return points
+
+
+def get_clearances(angles, robot_config, boxes=no_boxes, floor_height=0.0):
+    """
+    Distance between the surfaces of the capsules, a negative distance means they overlap
+    :param angles: array of angles, starts at 1
+    :param robot_config: link lengths
+    :param boxes: (M, 7) array of box obstacles, see get_box_array
+    :param floor_height: z of the floor, the base of the robot stands on it and is not checked
+    :return: array of the smallest self-collision, obstacle and floor distance in cm,
+             the obstacle distance is infinite without boxes,
+             the floor distance is the height of the lowest point of the arm
+    """
+    return calculate_clearances(np.ascontiguousarray(angles, dtype=np.float64), float(robot_config.d1),
+                                float(robot_config.a2), float(robot_config.d4), float(robot_config.d6),
+                                link_radii, obstacle_radii, np.ascontiguousarray(boxes, dtype=np.float64),
+                                float(floor_height))
+
+
+def get_trajectory_clearances(trajectory, robot_config, boxes=no_boxes, floor_height=0.0):
+    """
+    get_clearances for every step of a trajectory
+    :param trajectory: (steps, 7) array of angles
+    :return: (steps, 3) array with the self-collision, obstacle and floor distance of every step
+    """
+    return calculate_clearances_batch(np.ascontiguousarray(trajectory, dtype=np.float64), float(robot_config.d1),
+                                      float(robot_config.a2), float(robot_config.d4), float(robot_config.d6),
+                                      link_radii, obstacle_radii, np.ascontiguousarray(boxes, dtype=np.float64),
+                                      float(floor_height))
+
+
+def get_colliding(clearances, margin=0.0, floor_margin=-floor_tolerance):
+    """
+    :param clearances: (..., 3) array of clearances, see get_clearances
+    :return: whether the clearances are too small, per state
+    """
+    return (np.min(clearances[..., :2], axis=-1) < margin) | (clearances[..., 2] < floor_margin)
+
+
+def is_in_collision(angles, robot_config, boxes=no_boxes, floor_height=0.0, margin=0.0, floor_margin=-floor_tolerance):
+    """
+    :param margin: minimum distance in cm that should be left between the surfaces
+    :param floor_margin: minimum height in cm of the arm above the floor, by default it may touch the floor
+    """
+    return bool(get_colliding(get_clearances(angles, robot_config, boxes, floor_height), margin, floor_margin))
+
+
+def find_first_collision(trajectory, robot_config, boxes=no_boxes, floor_height=0.0, margin=0.0,
+                         floor_margin=-floor_tolerance):
+    """:return: index of the first step of the trajectory that collides, or -1 when the whole trajectory is free"""
+    clearances = get_trajectory_clearances(trajectory, robot_config, boxes, floor_height)
+    colliding = np.flatnonzero(get_colliding(clearances, margin, floor_margin))
+    return int(colliding[0]) if len(colliding) > 0 else -1
+
+
+def get_batch_clearances(angles, robot_config, boxes, box_counts, floor_height=0.0):
+    """
+    get_clearances for a batch of robots that each have their own obstacles, i.e. vectorized environments
+    :param angles: (N, 7) array of angles
+    :param boxes: (N, M, 7) array, the first box_counts[i] boxes of row i are the obstacles of robot i
+    :param box_counts: (N,) array with the number of boxes of every robot
+    :return: (N, 3) array with the self-collision, obstacle and floor distance of every robot
+    """
+    return calculate_clearances_per_state(np.ascontiguousarray(angles, dtype=np.float64), float(robot_config.d1),
+                                          float(robot_config.a2), float(robot_config.d4), float(robot_config.d6),
+                                          link_radii, obstacle_radii, np.ascontiguousarray(boxes, dtype=np.float64),
+                                          np.ascontiguousarray(box_counts, dtype=np.int64), float(floor_height))
+
+
+@jit(nopython=True, cache=True)
+def calculate_capsule_points_into(angles, d1, a2, d4, d6, points):
+    # p1, p2, p3, p4, p6 fill the rows 0 to 4, p4 and p6 are in place, overwrite p3 and put the base in front
+    calculate_link_points_into(angles, d1, a2, d4, d6, points)
+    points[2] = points[1]
+    points[1] = points[0]
+    points[0] = 0.0
+
+
+@jit(nopython=True, cache=True)
+def segment_segment_distance(p1, q1, p2, q2):
+    """Distance between the closest points of the segments p1-q1 and p2-q2 (Ericson, Real-Time Collision Detection)"""
+    # written out per coordinate, temporary arrays would cost more than the calculation itself
+    d1x, d1y, d1z = q1[0] - p1[0], q1[1] - p1[1], q1[2] - p1[2]
+    d2x, d2y, d2z = q2[0] - p2[0], q2[1] - p2[1], q2[2] - p2[2]
+    rx, ry, rz = p1[0] - p2[0], p1[1] - p2[1], p1[2] - p2[2]
+    a = d1x * d1x + d1y * d1y + d1z * d1z
+    e = d2x * d2x + d2y * d2y + d2z * d2z
+    f = d2x * rx + d2y * ry + d2z * rz
+    epsilon = 1e-12
+
+    if a <= epsilon and e <= epsilon:
+        s = 0.0
+        t = 0.0
+    elif a <= epsilon:
+        s = 0.0
+        t = min(max(f / e, 0.0), 1.0)
+    else:
+        c = d1x * rx + d1y * ry + d1z * rz
+        if e <= epsilon:
+            t = 0.0
+            s = min(max(-c / a, 0.0), 1.0)
+        else:
+            b = d1x * d2x + d1y * d2y + d1z * d2z
+            denominator = a * e - b * b
+            s = min(max((b * f - c * e) / denominator, 0.0), 1.0) if denominator > epsilon else 0.0
+            t = (b * s + f) / e
+            if t < 0.0:
+                t = 0.0
+                s = min(max(-c / a, 0.0), 1.0)
+            elif t > 1.0:
+                t = 1.0
+                s = min(max((b - c) / a, 0.0), 1.0)
+
+    dx = rx + d1x * s - d2x * t
+    dy = ry + d1y * s - d2y * t
+    dz = rz + d1z * s - d2z * t
+    return np.sqrt(dx * dx + dy * dy + dz * dz)
+
+
+@jit(nopython=True, cache=True)
+def point_box_distance(p, direction, t, half_extends):
+    """
+    Distance from the point p + t * direction (in the frame of the box) to an axis aligned box around the origin,
+    0 when the point is inside the box
+    """
+    distance = 0.0
+    for i in range(3):
+        outside = abs(p[i] + t * direction[i]) - half_extends[i]
+        if outside > 0.0:
+            distance += outside * outside
+    return np.sqrt(distance)
+
+
+@jit(nopython=True, cache=True)
+def to_box_frame(point, box, local):
+    ca = cos(box[6])
+    sa = sin(box[6])
+    dx = point[0] - box[0]
+    dy = point[1] - box[1]
+    local[0] = ca * dx + sa * dy
+    local[1] = -sa * dx + ca * dy
+    local[2] = point[2] - box[2]
+
+
+@jit(nopython=True, cache=True)
+def segment_box_distance(p, q, box):
+    """
+    Distance between the segment p-q and a box that is rotated around the z-axis.
+    The distance from a point on the segment to the box is convex along the segment,
+    so a golden section search finds the closest point.
+    """
+    local_p = np.empty(3, dtype=np.float64)
+    direction = np.empty(3, dtype=np.float64)
+    to_box_frame(p, box, local_p)
+    to_box_frame(q, box, direction)
+    for i in range(3):
+        direction[i] -= local_p[i]
+    half_extends = box[3:6]
+
+    ratio = 0.6180339887498949
+    low, high = 0.0, 1.0
+    t1 = high - ratio * (high - low)
+    t2 = low + ratio * (high - low)
+    distance1 = point_box_distance(local_p, direction, t1, half_extends)
+    distance2 = point_box_distance(local_p, direction, t2, half_extends)
+    # 30 iterations narrow the interval down to 1e-6 of the length of the segment
+    for _ in range(30):
+        if distance1 == 0.0 or distance2 == 0.0:
+            return 0.0
+        if distance1 < distance2:
+            high = t2
+            t2, distance2 = t1, distance1
+            t1 = high - ratio * (high - low)
+            distance1 = point_box_distance(local_p, direction, t1, half_extends)
+        else:
+            low = t1
+            t1, distance1 = t2, distance2
+            t2 = low + ratio * (high - low)
+            distance2 = point_box_distance(local_p, direction, t2, half_extends)
+
+    return min(distance1, distance2, point_box_distance(local_p, direction, 0.0, half_extends),
+               point_box_distance(local_p, direction, 1.0, half_extends))
+
+
+@jit(nopython=True, cache=True)
+def point_box_distance_and_normal(point, box, normal):
+    """
+    Signed distance from a point to a box that is rotated around the z-axis, negative when the point is inside.
+    normal is filled with the world direction in which the point has to move to get away from the box.
+    """
+    local = np.empty(3, dtype=np.float64)
+    to_box_frame(point, box, local)
+    local_normal = np.zeros(3, dtype=np.float64)
+    squared_distance = 0.0
+    for i in range(3):
+        outside = abs(local[i]) - box[3 + i]
+        if outside > 0.0:
+            local_normal[i] = outside if local[i] > 0.0 else -outside
+            squared_distance += outside * outside
+
+    if squared_distance > 0.0:
+        distance = np.sqrt(squared_distance)
+        for i in range(3):
+            local_normal[i] /= distance
+    else:
+        # inside, push out through the closest face
+        closest_axis = 0
+        distance = -np.inf
+        for i in range(3):
+            outside = abs(local[i]) - box[3 + i]
+            if outside > distance:
+                distance = outside
+                closest_axis = i
+        local_normal[closest_axis] = 1.0 if local[closest_axis] >= 0.0 else -1.0
+
+    ca = cos(box[6])
+    sa = sin(box[6])
+    normal[0] = ca * local_normal[0] - sa * local_normal[1]
+    normal[1] = sa * local_normal[0] + ca * local_normal[1]
+    normal[2] = local_normal[2]
+    return distance
+
+
+@jit(nopython=True, cache=True)
+def calculate_clearances_from_points(points, link_radii, obstacle_radii, boxes, floor_height):
+    clearances = np.zeros(3, dtype=np.float64)
+
+    self_clearance = np.inf
+    for pair in range(self_collision_pairs.shape[0]):
+        i = self_collision_pairs[pair, 0]
+        j = self_collision_pairs[pair, 1]
+        distance = segment_segment_distance(points[i], points[i + 1], points[j], points[j + 1]) - \
+            link_radii[i] - link_radii[j]
+        self_clearance = min(self_clearance, distance)
+    clearances[0] = self_clearance
+
+    obstacle_clearance = np.inf
+    for box in range(boxes.shape[0]):
+        for i in range(obstacle_radii.shape[0]):
+            distance = segment_box_distance(points[i], points[i + 1], boxes[box]) - obstacle_radii[i]
+            obstacle_clearance = min(obstacle_clearance, distance)
+    clearances[1] = obstacle_clearance
+
+    # the centre lines are checked against the floor, with the radii the workspace limit z_min would be unreachable
+    floor_clearance = np.inf
+    for i in range(2, points.shape[0]):
+        floor_clearance = min(floor_clearance, points[i, 2] - floor_height)
+    clearances[2] = floor_clearance
+    return clearances
+
+
+@jit(nopython=True, cache=True)
+def calculate_clearances(angles, d1, a2, d4, d6, link_radii, obstacle_radii, boxes, floor_height):
+    points = np.zeros((5, 3), dtype=np.float64)
+    calculate_capsule_points_into(angles, d1, a2, d4, d6, points)
+    return calculate_clearances_from_points(points, link_radii, obstacle_radii, boxes, floor_height)
+
+
+@jit(nopython=True, parallel=True, cache=True)
+def calculate_clearances_batch(trajectory, d1, a2, d4, d6, link_radii, obstacle_radii, boxes, floor_height):
+    number_of_states = trajectory.shape[0]
+    clearances = np.zeros((number_of_states, 3), dtype=np.float64)
+    for i in prange(number_of_states):
+        clearances[i] = calculate_clearances(trajectory[i], d1, a2, d4, d6, link_radii, obstacle_radii, boxes,
+                                             floor_height)
+    return clearances
+
+
+@jit(nopython=True, parallel=True, cache=True)
+def calculate_clearances_per_state(angles, d1, a2, d4, d6, link_radii, obstacle_radii, boxes, box_counts, floor_height):
+    number_of_states = angles.shape[0]
+    clearances = np.zeros((number_of_states, 3), dtype=np.float64)
+    for i in prange(number_of_states):
+        clearances[i] = calculate_clearances(angles[i], d1, a2, d4, d6, link_radii, obstacle_radii,
+                                             boxes[i, :box_counts[i]], floor_height)
+    return clearances
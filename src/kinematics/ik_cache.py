@@ -0,0 +1,82 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from src.kinematics.kinematics import inverse_kinematics
+
+
+class InverseKinematicsCache:
+    """
+    Least recently used cache in front of inverse_kinematics.
+    Poses are quantized before they are used as a key, so poses that only differ by a rounding error
+    (i.e. a recorded move that is played back again, or a robot that is standing still) share the same solution.
+    """
+
+    def __init__(self, max_size=4096, position_resolution=0.001, angle_resolution=0.0001):
+        """
+        :param max_size: maximum number of solutions to keep, the least recently used one is dropped first
+        :param position_resolution: x, y and z are rounded to a multiple of this value (in cm) for the key
+        :param angle_resolution: alpha, beta, gamma (or the euler matrix elements) are rounded to a multiple
+                                 of this value for the key
+        """
+        if max_size < 1:
+            raise ValueError("max_size should be at least 1")
+        self.max_size = max_size
+        self.position_resolution = position_resolution
+        self.angle_resolution = angle_resolution
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def inverse_kinematics(self, pose, robot_config):
+        """Same as inverse_kinematics, but returns the cached solution if the pose has been solved before"""
+        key = self.get_key(pose, robot_config)
+        with self._lock:
+            angles = self._cache.get(key)
+            if angles is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return angles.copy()
+            self.misses += 1
+
+        angles = inverse_kinematics(pose, robot_config)
+
+        with self._lock:
+            self._cache[key] = angles.copy()
+            self._cache.move_to_end(key)
+            if len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        return angles
+
+    def get_key(self, pose, robot_config):
+        position = (self._quantize(pose.x, self.position_resolution),
+                    self._quantize(pose.y, self.position_resolution),
+                    self._quantize(pose.z, self.position_resolution))
+
+        if pose.euler_matrix is not None:
+            orientation = tuple(self._quantize(value, self.angle_resolution)
+                                for value in np.asarray(pose.euler_matrix).ravel())
+        else:
+            orientation = (self._quantize(pose.alpha, self.angle_resolution),
+                           self._quantize(pose.beta, self.angle_resolution),
+                           self._quantize(pose.gamma, self.angle_resolution))
+
+        return position + orientation + (bool(pose.flip), robot_config.fingerprint())
+
+    @staticmethod
+    def _quantize(value, resolution):
+        return int(round(value / resolution))
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._cache)
+
+    def __str__(self):
+        return 'IK CACHE: size={}/{} hits={} misses={}'.format(len(self._cache), self.max_size, self.hits, self.misses)
@@ -0,0 +1,164 @@
+import numpy as np
+from numba import jit
+from numpy import sin, cos, pi
+
+from src.kinematics.kinematics import calculate_ik_solution_into
+from src.kinematics.kinematics_utils import joint_limits
+
+
+def inverse_kinematics_with_fallback(pose, robot_config, previous_angles, max_iterations=30):
+    """
+    Use the closed form inverse kinematics when the pose can be reached within the joint limits,
+    otherwise get as close as possible with the damped least squares solver starting from previous_angles.
+    This way the robot stops at the edge of what it can reach instead of jumping to whatever the clamped
+    closed form solution gives.
+    :param pose: target pose
+    :param robot_config: link lengths
+    :param previous_angles: the angles the robot was sent to last, the array starts at 1
+    :param max_iterations: upper bound on the work done when falling back
+    :return: array of angles (starts at 1) and whether the pose is reached exactly
+    """
+    angles = np.zeros(7, dtype=np.float64)
+    reachable = calculate_ik_solution_into(float(pose.x), float(pose.y), float(pose.z), float(robot_config.d1),
+                                           float(robot_config.d6), float(robot_config.a2), float(robot_config.d4),
+                                           np.ascontiguousarray(pose.get_euler_matrix(), dtype=np.float64),
+                                           bool(pose.flip), True, angles)
+    if reachable and np.all(angles[1:] >= joint_limits[1:, 0]) and np.all(angles[1:] <= joint_limits[1:, 1]):
+        return angles, True
+
+    angles, _ = inverse_kinematics_dls(pose, robot_config, previous_angles, max_iterations=max_iterations)
+    return angles, False
+
+
+def inverse_kinematics_dls(pose, robot_config, initial_angles, damping=0.5, max_iterations=30, tolerance=1e-3,
+                           orientation_weight=10.0, max_step=0.2):
+    """
+    Iterative (Levenberg-Marquardt style) damped least squares inverse kinematics, the angles are kept within
+    the joint limits. Unlike the closed form solution this still gives a sensible answer close to singularities
+    and for poses that are out of reach: the angles that get the end effector as close as possible.
+    :param pose: target pose
+    :param robot_config: link lengths
+    :param initial_angles: angles to start from, i.e. the previous solution, the array starts at 1
+    :param damping: initial damping factor, it is lowered after a good step and raised after a bad one
+    :param max_iterations: maximum number of iterations, bounds the time it takes
+    :param tolerance: stop when the pose error is smaller than this
+    :param orientation_weight: how many cm of position error one radian of orientation error is worth
+    :param max_step: maximum change of a single joint in one iteration in radians
+    :return: array of angles (starts at 1) and the remaining pose error
+    """
+    return calculate_ik_dls(np.array([pose.x, pose.y, pose.z], dtype=np.float64),
+                            np.ascontiguousarray(pose.get_euler_matrix(), dtype=np.float64),
+                            np.ascontiguousarray(initial_angles, dtype=np.float64),
+                            float(robot_config.d1), float(robot_config.a2), float(robot_config.d4),
+                            float(robot_config.d6), joint_limits, float(damping), int(max_iterations),
+                            float(tolerance), float(orientation_weight), float(max_step))
+
+
+def jacobian(angles, robot_config):
+    """
+    :param angles: array of angles, starts at 1
+    :param robot_config: link lengths
+    :return: 6x6 geometric jacobian of the tip of the gripper, the first 3 rows map joint velocities to the linear
+             velocity, the last 3 rows to the angular velocity, column i belongs to joint i + 1
+    """
+    return calculate_jacobian(np.ascontiguousarray(angles, dtype=np.float64), float(robot_config.d1),
+                              float(robot_config.a2), float(robot_config.d4), float(robot_config.d6))
+
+
+@jit(nopython=True, cache=True)
+def calculate_dh_frames(angles, d1, a2, d4, d6):
+    """
+    The DH parameters that belong to forward_position_kinematics and forward_orientation_kinematics
+    :return: (7, 4, 4) array with the transformation of frame 0 (the base) up to frame 6 relative to the base
+    """
+    thetas = angles[1:7]
+    ds = np.array([d1, 0.0, 0.0, d4, 0.0, d6])
+    a_s = np.array([0.0, a2, 0.0, 0.0, 0.0, 0.0])
+    alphas = np.array([pi / 2, 0.0, pi / 2, -pi / 2, pi / 2, 0.0])
+
+    frames = np.zeros((7, 4, 4), dtype=np.float64)
+    frames[0] = np.eye(4)
+    for i in range(6):
+        ct = cos(thetas[i])
+        st = sin(thetas[i])
+        ca = cos(alphas[i])
+        sa = sin(alphas[i])
+        link = np.array([[ct, -st * ca, st * sa, a_s[i] * ct],
+                         [st, ct * ca, -ct * sa, a_s[i] * st],
+                         [0.0, sa, ca, ds[i]],
+                         [0.0, 0.0, 0.0, 1.0]])
+        frames[i + 1] = frames[i] @ link
+    return frames
+
+
+@jit(nopython=True, cache=True)
+def calculate_jacobian(angles, d1, a2, d4, d6):
+    frames = calculate_dh_frames(angles, d1, a2, d4, d6)
+    tip = frames[6, :3, 3]
+
+    result = np.zeros((6, 6), dtype=np.float64)
+    for i in range(6):
+        axis = frames[i, :3, 2]
+        result[:3, i] = np.cross(axis, tip - frames[i, :3, 3])
+        result[3:, i] = axis
+    return result
+
+
+@jit(nopython=True, cache=True)
+def calculate_pose_error(frame, target_position, target_rotation, orientation_weight):
+    """Position error and the (weighted) axis-angle like orientation error between a frame and the target"""
+    error = np.zeros(6, dtype=np.float64)
+    error[:3] = target_position - frame[:3, 3]
+    rotation = frame[:3, :3]
+    for i in range(3):
+        error[3:] += 0.5 * orientation_weight * np.cross(rotation[:, i], target_rotation[:, i])
+    return error
+
+
+@jit(nopython=True, cache=True)
+def calculate_ik_dls(target_position, target_rotation, initial_angles, d1, a2, d4, d6, joint_limits, damping,
+                     max_iterations, tolerance, orientation_weight, max_step):
+    angles = initial_angles.copy()
+    for j in range(1, 7):
+        angles[j] = min(max(angles[j], joint_limits[j, 0]), joint_limits[j, 1])
+
+    frames = calculate_dh_frames(angles, d1, a2, d4, d6)
+    error = calculate_pose_error(frames[6], target_position, target_rotation, orientation_weight)
+    error_norm = np.sqrt(np.sum(error * error))
+
+    weights = np.ones(6, dtype=np.float64)
+    weights[3:] = orientation_weight
+
+    for _ in range(max_iterations):
+        if error_norm < tolerance:
+            break
+
+        weighted_jacobian = calculate_jacobian(angles, d1, a2, d4, d6)
+        for row in range(6):
+            weighted_jacobian[row] *= weights[row]
+
+        # dq = J^T (J J^T + lambda^2 I)^-1 e
+        system = weighted_jacobian @ weighted_jacobian.T + damping * damping * np.eye(6)
+        delta = weighted_jacobian.T @ np.linalg.solve(system, error)
+
+        largest_step = np.max(np.abs(delta))
+        if largest_step > max_step:
+            delta *= max_step / largest_step
+
+        new_angles = angles.copy()
+        for j in range(1, 7):
+            new_angles[j] = min(max(angles[j] + delta[j - 1], joint_limits[j, 0]), joint_limits[j, 1])
+
+        frames = calculate_dh_frames(new_angles, d1, a2, d4, d6)
+        new_error = calculate_pose_error(frames[6], target_position, target_rotation, orientation_weight)
+        new_error_norm = np.sqrt(np.sum(new_error * new_error))
+
+        if new_error_norm < error_norm:
+            angles = new_angles
+            error = new_error
+            error_norm = new_error_norm
+            damping = max(damping * 0.5, 1e-3)
+        else:
+            damping = damping * 2.0
+
+    return angles, error_norm
@@ -0,0 +1,95 @@
+"""
+Registry of the numba kernels that are used while controlling the robot.
+All kernels are decorated with cache=True, so the machine code ends up in an on-disk cache next to the source.
+warmup_kernels() compiles (or loads from that cache) every kernel for the signatures it is called with,
+this way the first move of a controller does not have to wait for the compiler.
+The wrappers around the kernels (inverse_kinematics, get_target_points, ...) convert their arguments to exactly
+these types, keep both in sync when changing a kernel.
+"""
+
+import importlib
+import logging as log
+from time import perf_counter
+
+from numba import types
+
+_float = types.float64
+_vector = types.Array(types.float64, 1, 'C')
+_matrix = types.Array(types.float64, 2, 'C')
+_matrices = types.Array(types.float64, 3, 'C')
+_flags = types.Array(types.boolean, 1, 'C')
+_counts = types.Array(types.int64, 1, 'C')
+_observation = types.Array(types.float32, 1, 'C')
+
+# (module, kernel name, argument types)
+KERNEL_SIGNATURES = [
+    ('src.kinematics.kinematics_utils', 'calculate_euler_matrix_from_angles', (_float, _float, _float)),
+    ('src.kinematics.kinematics_utils', 'calculate_euler_matrices_from_angles', (_vector, _vector, _vector)),
+    ('src.kinematics.kinematics', 'calculate_ik',
+     (_float, _float, _float, _float, _float, _float, _float, _matrix, types.boolean)),
+    ('src.kinematics.kinematics', 'calculate_ik_solution_into',
+     (_float, _float, _float, _float, _float, _float, _float, _matrix, types.boolean, types.boolean, _vector)),
+    ('src.kinematics.kinematics', 'calculate_ik_all_solutions',
+     (_float, _float, _float, _float, _float, _float, _float, _matrix)),
+    ('src.kinematics.kinematics', 'select_closest_solution', (_matrix, _vector, _vector)),
+    ('src.kinematics.kinematics', 'calculate_ik_batch', (_matrix, _matrices, _flags, _float, _float, _float, _float)),
+    ('src.kinematics.kinematics', 'calculate_reachability',
+     (_matrix, _matrices, _float, _float, _float, _float, _matrix)),
+    ('src.kinematics.kinematics', 'forward_position_kinematics_batch', (_matrix, _float, _float, _float, _float)),
+    ('src.kinematics.kinematics', 'forward_orientation_kinematics_batch', (_matrix,)),
+    ('src.kinematics.kinematics', 'jacobian_transpose_on_f_batch',
+     (_matrices, _matrix, _float, _float, _float, _float)),
+    ('src.kinematics.collision', 'calculate_clearances',
+     (_vector, _float, _float, _float, _float, _vector, _vector, _matrix, _float)),
+    ('src.kinematics.collision', 'calculate_clearances_batch',
+     (_matrix, _float, _float, _float, _float, _vector, _vector, _matrix, _float)),
+    ('src.kinematics.collision', 'calculate_clearances_per_state',
+     (_matrix, _float, _float, _float, _float, _vector, _vector, _matrices, _counts, _float)),
+    ('src.kinematics.jacobian_ik', 'calculate_jacobian', (_vector, _float, _float, _float, _float)),
+    ('src.kinematics.jacobian_ik', 'calculate_ik_dls',
+     (_vector, _matrix, _vector, _float, _float, _float, _float, _matrix, _float, types.int64, _float, _float,
+      _float)),
+    ('src.utils.trajectory_timing', 'calculate_topp_profile', (_matrix, _vector, _vector)),
+    ('src.reinforcementlearning.environment.robot_env_utils', 'calculate_target_pose',
+     (_float, _float, _float, _matrix, _float)),
+    ('src.reinforcementlearning.environment.robot_env_utils', 'calculate_forces',
+     (types.int64, _matrix, _matrix, _float, _vector)),
+    ('src.reinforcementlearning.environment.robot_env_utils', 'calculate_repulsive_forces_batch',
+     (_matrices, _vector, _vector, _matrices, _counts, _float, _float, _float)),
+    ('src.reinforcementlearning.environment.robot_env_utils', 'calculate_observation_into',
+     (_observation, _vector, _matrix, _float, _float, _float, _float, _float, types.boolean)),
+    ('src.reinforcementlearning.environment.repulsive_force_engine', 'calculate_closest_obstacles',
+     (_matrix, _vector, _matrix, _matrix, _float, _float, _vector, _matrix)),
+    ('src.reinforcementlearning.environment.repulsive_force_engine', 'calculate_forces_from_distances',
+     (_vector, _matrix, _vector, _float, _float)),
+]
+
+
+def get_kernel(module_name, kernel_name):
+    return getattr(importlib.import_module(module_name), kernel_name)
+
+
+def warmup_kernels(kernel_signatures=None):
+    """
+    Compile every registered kernel for its signature, kernels that are already in the on-disk cache are only loaded.
+    :param kernel_signatures: list of (module, kernel name, argument types), defaults to KERNEL_SIGNATURES
+    :return: dict of kernel name to the time in seconds it took to compile or load it
+    """
+    if kernel_signatures is None:
+        kernel_signatures = KERNEL_SIGNATURES
+
+    compile_times = {}
+    for module_name, kernel_name, signature in kernel_signatures:
+        try:
+            kernel = get_kernel(module_name, kernel_name)
+        except ImportError as e:
+            log.warning('not warming up %s, could not import %s: %s', kernel_name, module_name, e)
+            continue
+
+        start = perf_counter()
+        kernel.compile(signature)
+        compile_times[kernel_name] = perf_counter() - start
+        log.info('warmed up %s in %.3f seconds', kernel_name, compile_times[kernel_name])
+
+    log.info('warmed up %d kernels in %.3f seconds', len(compile_times), sum(compile_times.values()))
+    return compile_times
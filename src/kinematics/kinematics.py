@@ -1,7 +1,7 @@
 import numpy as np
 from numpy import arctan2, sin, cos, pi, power
 from numpy import sqrt
-from numba import jit
+from numba import jit, prange
 
 
 def inverse_kinematics(pose, robot_config):
@@ -12,29 +12,83 @@ def inverse_kinematics(pose, robot_config):
     :param robot_config: link lengths
     :return: array of angles to reach this pose, this array starts at 1.
     """
-    return calculate_ik(pose.x, pose.y, pose.z, robot_config.d1, robot_config.d6, robot_config.a2,
-                        robot_config.d4, pose.get_euler_matrix(), pose.flip)
+    return calculate_ik(float(pose.x), float(pose.y), float(pose.z), float(robot_config.d1), float(robot_config.d6),
+                        float(robot_config.a2), float(robot_config.d4),
+                        np.ascontiguousarray(pose.get_euler_matrix(), dtype=np.float64), bool(pose.flip))
 
 
-@jit()
+def batch_inverse_kinematics(positions, rotation_matrices, flips, robot_config):
+    """
+    Solve the inverse kinematics for N poses in a single call, e.g. every step of a spline trajectory.
+    :param positions: (N, 3) array of x, y, z target positions
+    :param rotation_matrices: (N, 3, 3) array of target orientations, see Pose.get_euler_matrix()
+    :param flips: (N,) array of booleans (or a single bool for all poses), picks the wrist solution
+    :param robot_config: link lengths
+    :return: (N, 7) array of angles, every row starts at 1 like inverse_kinematics
+    """
+    positions = np.ascontiguousarray(positions, dtype=np.float64)
+    rotation_matrices = np.ascontiguousarray(rotation_matrices, dtype=np.float64)
+    # copy, a broadcast array is read-only and would need its own compiled version of the kernel
+    flips = np.array(np.broadcast_to(np.asarray(flips, dtype=np.bool_), (positions.shape[0],)))
+    if positions.ndim != 2 or positions.shape[1] != 3:
+        raise ValueError("positions should be of shape (N, 3)")
+    if rotation_matrices.shape != (positions.shape[0], 3, 3):
+        raise ValueError("rotation_matrices should be of shape (N, 3, 3)")
+
+    return calculate_ik_batch(positions, rotation_matrices, flips, float(robot_config.d1),
+                              float(robot_config.d6), float(robot_config.a2), float(robot_config.d4))
+
+
+@jit(nopython=True, cache=True)
 def calculate_ik(x, y, z, d1, d6, a2, d4, t, flip):
+    angles = np.zeros(7, dtype=np.float64)
+    calculate_ik_into(x, y, z, d1, d6, a2, d4, t, flip, angles)
+    return angles
+
+
+@jit(nopython=True, parallel=True, cache=True)
+def calculate_ik_batch(positions, rotation_matrices, flips, d1, d6, a2, d4):
+    number_of_poses = positions.shape[0]
+    angles = np.zeros((number_of_poses, 7), dtype=np.float64)
+    for i in prange(number_of_poses):
+        calculate_ik_into(positions[i, 0], positions[i, 1], positions[i, 2], d1, d6, a2, d4,
+                          rotation_matrices[i], flips[i], angles[i])
+    return angles
+
+
+@jit(nopython=True, cache=True)
+def calculate_ik_into(x, y, z, d1, d6, a2, d4, t, flip, angles):
+    """Solve the inverse kinematics for a single pose and write the result into angles (starting at index 1)"""
+    calculate_ik_solution_into(x, y, z, d1, d6, a2, d4, t, flip, True, angles)
+
+
+@jit(nopython=True, cache=True)
+def calculate_ik_solution_into(x, y, z, d1, d6, a2, d4, t, flip, elbow_up, angles):
+    """
+    Same as calculate_ik_into, but elbow_up picks the solution for the elbow
+    :return: False when the wrist is out of reach, the angles are then for the arm stretched out towards the wrist
+    """
     # First find the position of the wrist
     xc = x - d6 * t[0, 2]
     yc = y - d6 * t[1, 2]
     zc = z - d6 * t[2, 2]
-    angles = np.zeros(7, dtype=np.float64)
 
     # The first 3 angles only depend on the position of the wrist
     angles[1] = arctan2(yc, xc)
 
     d = (power(xc, 2) + power(yc, 2) + power((zc - d1), 2) - power(a2, 2) - power(d4, 2)) / (2.0 * a2 * d4)
+    reachable = True
     if d >= 1 or d <= -1:
         d = 1
-    angles[3] = arctan2(-sqrt(1 - d ** 2), d)
+        reachable = False
+    if elbow_up:
+        angles[3] = arctan2(-sqrt(1 - d ** 2), d)
+    else:
+        angles[3] = arctan2(sqrt(1 - d ** 2), d)
 
     k1 = a2 + d4 * cos(angles[3])
     k2 = d4 * sin(angles[3])
-    # The positive square root is picked meaning elbow up.
+    # For elbow up the negative square root is picked for angle3, elbow down uses the positive one.
     angles[2] = arctan2((zc - d1), sqrt(power(xc, 2) + power(yc, 2))) - arctan2(k2, k1)
 
     # Because of the DH-parameters used in the forward kinematics angle3 behaves a bit weird.
@@ -79,7 +133,95 @@ def calculate_ik(x, y, z, d1, d6, a2, d4, t, flip):
         angles[5] = arctan2(sqrt(r13 * r13 + r23 * r23), r33)
         angles[6] = arctan2(r32, -r31)
 
-    return angles
+    return reachable
+
+
+@jit(nopython=True, parallel=True, cache=True)
+def calculate_reachability(positions, rotation_matrices, d1, d6, a2, d4, joint_limits):
+    """
+    A pose is reachable when the wrist is within reach and the elbow up solution for one of the two flips
+    stays within the joint limits
+    :param joint_limits: (7, 2) array with the minimum and maximum of every joint, see kinematics_utils.joint_limits
+    :return: (N,) array of booleans
+    """
+    number_of_poses = positions.shape[0]
+    reachable = np.zeros(number_of_poses, dtype=np.bool_)
+    for i in prange(number_of_poses):
+        angles = np.zeros(7, dtype=np.float64)
+        for flip in (False, True):
+            if not calculate_ik_solution_into(positions[i, 0], positions[i, 1], positions[i, 2], d1, d6, a2, d4,
+                                              rotation_matrices[i], flip, True, angles):
+                break
+            within_limits = True
+            for j in range(1, 7):
+                if angles[j] < joint_limits[j, 0] or angles[j] > joint_limits[j, 1]:
+                    within_limits = False
+            if within_limits:
+                reachable[i] = True
+                break
+    return reachable
+
+
+def inverse_kinematics_closest(pose, robot_config, current_angles, joint_speeds=None, allow_elbow_down=True):
+    """
+    Calculate every analytic solution (elbow up/down and both wrist flips) for the pose and pick the one
+    the robot can reach the fastest from current_angles, pose.flip is ignored.
+    :param pose: target pose, encodes both position and orientation
+    :param robot_config: link lengths
+    :param current_angles: array of the current angles of the robot, starts at 1
+    :param joint_speeds: array of the maximum speed of every joint (starts at 1), by default all joints are
+                         assumed to be equally fast like in get_recommended_wait_time
+    :param allow_elbow_down: when False only the elbow up solutions are considered, like inverse_kinematics
+    :return: the angles of the closest solution, and the flip and elbow_up that give this solution
+    """
+    if joint_speeds is None:
+        joint_speeds = np.ones(7, dtype=np.float64)
+
+    solutions = calculate_ik_all_solutions(float(pose.x), float(pose.y), float(pose.z), float(robot_config.d1),
+                                           float(robot_config.d6), float(robot_config.a2), float(robot_config.d4),
+                                           np.ascontiguousarray(pose.get_euler_matrix(), dtype=np.float64))
+    number_of_solutions = 4 if allow_elbow_down else 2
+    index = select_closest_solution(solutions[:number_of_solutions],
+                                    np.ascontiguousarray(current_angles, dtype=np.float64),
+                                    np.ascontiguousarray(joint_speeds, dtype=np.float64))
+    flip, elbow_up = index % 2 == 1, index < 2
+    return solutions[index].copy(), flip, elbow_up
+
+
+@jit(nopython=True, cache=True)
+def calculate_ik_all_solutions(x, y, z, d1, d6, a2, d4, t):
+    """
+    :return: (4, 7) array with the angles of every solution, in the order
+             elbow up, elbow up flipped, elbow down, elbow down flipped
+    """
+    solutions = np.zeros((4, 7), dtype=np.float64)
+    for i in range(4):
+        calculate_ik_solution_into(x, y, z, d1, d6, a2, d4, t, i % 2 == 1, i < 2, solutions[i])
+    return solutions
+
+
+@jit(nopython=True, cache=True)
+def select_closest_solution(solutions, current_angles, joint_speeds):
+    """
+    Pick the solution that takes the least time to move to from current_angles, this is the time of the slowest joint.
+    Ties (i.e. when only the wrist differs) are broken by the total time all joints move.
+    :return: index of the closest solution
+    """
+    best_index = 0
+    best_time = np.inf
+    best_total_time = np.inf
+    for i in range(solutions.shape[0]):
+        time = 0.0
+        total_time = 0.0
+        for j in range(1, 7):
+            joint_time = np.abs(solutions[i, j] - current_angles[j]) / joint_speeds[j]
+            time = max(time, joint_time)
+            total_time += joint_time
+        if time < best_time - 1e-9 or (time < best_time + 1e-9 and total_time < best_total_time):
+            best_index = i
+            best_time = time
+            best_total_time = total_time
+    return best_index
 
 
 def forward_position_kinematics(angles, robot_config):
@@ -199,10 +341,162 @@ def jacobian_transpose_on_f(workspace_force, angles, robot_config, c1_location):
     return joint_forces
 
 
-if __name__ == '__main__':
-    from src.kinematics.kinematics_utils import Pose
-    from src import global_constants
+def batch_forward_position_kinematics(angles, robot_config):
+    """
+    Batch version of forward_position_kinematics
+    :param angles: (N, 7) array of angles, every row starts at 1
+    :param robot_config: link lengths
+    :return: (N, 5, 3) array with for every state the positions p1, p2, p3, p4 and p6
+    """
+    return forward_position_kinematics_batch(np.ascontiguousarray(angles, dtype=np.float64), float(robot_config.d1),
+                                             float(robot_config.a2), float(robot_config.d4), float(robot_config.d6))
+
+
+def batch_forward_orientation_kinematics(angles):
+    """
+    Batch version of forward_orientation_kinematics
+    :param angles: (N, 7) array of angles, every row starts at 1
+    :return: (N, 3, 3) array with the orientation of the end effector for every state
+    """
+    return forward_orientation_kinematics_batch(np.ascontiguousarray(angles, dtype=np.float64))
+
 
-    test_pose = Pose(-10, 25, 10)
-    for _ in range(10):
-        inverse_kinematics(test_pose, global_constants.dynamixel_robot_config)
+def batch_jacobian_transpose_on_f(workspace_forces, angles, robot_config, c1_location):
+    """
+    Batch version of jacobian_transpose_on_f
+    :param workspace_forces: (N, 3, 3) array, for every state the workspace forces on each of the control points
+    :param angles: (N, 7) array of angles, every row starts at 1
+    :param robot_config: robot configuration of link lengths
+    :param c1_location: distance of control point 1 located between frame 3 and 4 of the robot
+    :return: (N, 7) array of joint forces
+    """
+    return jacobian_transpose_on_f_batch(np.ascontiguousarray(workspace_forces, dtype=np.float64),
+                                         np.ascontiguousarray(angles, dtype=np.float64),
+                                         float(robot_config.a2), float(robot_config.d4), float(robot_config.d6),
+                                         float(c1_location))
+
+
+@jit(nopython=True, parallel=True, cache=True)
+def forward_position_kinematics_batch(angles, d1, a2, d4, d6):
+    number_of_states = angles.shape[0]
+    points = np.zeros((number_of_states, 5, 3), dtype=np.float64)
+
+    for i in prange(number_of_states):
+        calculate_link_points_into(angles[i], d1, a2, d4, d6, points[i])
+
+    return points
+
+
+@jit(nopython=True, cache=True)
+def calculate_link_points_into(angles, d1, a2, d4, d6, points):
+    """Fills the (5, 3) array points with p1, p2, p3, p4 and p6 of forward_position_kinematics"""
+    c1, s1 = cos(angles[1]), sin(angles[1])
+    c2, s2 = cos(angles[2]), sin(angles[2])
+    c3, s3 = cos(angles[3]), sin(angles[3])
+    c4, s4 = cos(angles[4]), sin(angles[4])
+    c5, s5 = cos(angles[5]), sin(angles[5])
+    c23, s23 = cos(angles[2] + angles[3]), sin(angles[2] + angles[3])
+
+    # p1
+    points[0, 0] = 0.0
+    points[0, 1] = 0.0
+    points[0, 2] = d1
+
+    # p2
+    points[1, 0] = a2 * c1 * c2
+    points[1, 1] = a2 * c2 * s1
+    points[1, 2] = d1 + a2 * s2
+
+    # p3, halfway between frame 3 and the wrist
+    r3 = a2 * c2 + (d4 / 2.0) * s23
+    points[2, 0] = c1 * r3
+    points[2, 1] = s1 * r3
+    points[2, 2] = d1 - (d4 / 2.0) * c23 + a2 * s2
+
+    # p4, the wrist
+    r4 = a2 * c2 + d4 * s23
+    points[3, 0] = c1 * r4
+    points[3, 1] = s1 * r4
+    points[3, 2] = d1 - d4 * c23 + a2 * s2
+
+    # p6, the tip of the end effector
+    points[4, 0] = d6 * s1 * s4 * s5 + c1 * (a2 * c2 + (d4 + d6 * c5) * s23 + d6 * c23 * c4 * s5)
+    points[4, 1] = c3 * (d4 + d6 * c5) * s1 * s2 - d6 * (c4 * s1 * s2 * s3 + c1 * s4) * s5 + c2 * s1 * (
+            a2 + (d4 + d6 * c5) * s3 + d6 * c3 * c4 * s5)
+    points[4, 2] = d1 - c23 * (d4 + d6 * c5) + a2 * s2 + d6 * c4 * s23 * s5
+
+
+@jit(nopython=True, parallel=True, cache=True)
+def forward_orientation_kinematics_batch(angles):
+    number_of_states = angles.shape[0]
+    orientations = np.zeros((number_of_states, 3, 3), dtype=np.float64)
+
+    for i in prange(number_of_states):
+        c1, s1 = cos(angles[i, 1]), sin(angles[i, 1])
+        c4, s4 = cos(angles[i, 4]), sin(angles[i, 4])
+        c5, s5 = cos(angles[i, 5]), sin(angles[i, 5])
+        c6, s6 = cos(angles[i, 6]), sin(angles[i, 6])
+        c23, s23 = cos(angles[i, 2] + angles[i, 3]), sin(angles[i, 2] + angles[i, 3])
+
+        sx = c6 * (c4 * s1 - c1 * c23 * s4) - (c5 * s1 * s4 + c1 * (c23 * c4 * c5 - s23 * s5)) * s6
+        sy = c1 * (-c4 * c6 + c5 * s4 * s6) - s1 * (-s23 * s5 * s6 + c23 * (c6 * s4 + c4 * c5 * s6))
+        sz = -c6 * s23 * s4 - (c4 * c5 * s23 + c23 * s5) * s6
+
+        ax = s1 * s4 * s5 + c1 * (c5 * s23 + c23 * c4 * s5)
+        ay = c5 * s1 * s23 + (c23 * c4 * s1 - c1 * s4) * s5
+        az = -c23 * c5 + c4 * s23 * s5
+
+        # n = s x a
+        orientations[i, 0, 0] = sy * az - sz * ay
+        orientations[i, 1, 0] = sz * ax - sx * az
+        orientations[i, 2, 0] = sx * ay - sy * ax
+
+        orientations[i, 0, 1] = sx
+        orientations[i, 1, 1] = sy
+        orientations[i, 2, 1] = sz
+
+        orientations[i, 0, 2] = ax
+        orientations[i, 1, 2] = ay
+        orientations[i, 2, 2] = az
+
+    return orientations
+
+
+@jit(nopython=True, parallel=True, cache=True)
+def jacobian_transpose_on_f_batch(workspace_forces, angles, a2, d4, d6, c1_location):
+    number_of_states = angles.shape[0]
+    joint_forces = np.zeros((number_of_states, 7), dtype=np.float64)
+
+    for i in prange(number_of_states):
+        c1, s1 = cos(angles[i, 1]), sin(angles[i, 1])
+        c2, s2 = cos(angles[i, 2]), sin(angles[i, 2])
+        c4, s4 = cos(angles[i, 4]), sin(angles[i, 4])
+        c5, s5 = cos(angles[i, 5]), sin(angles[i, 5])
+        c23, s23 = cos(angles[i, 2] + angles[i, 3]), sin(angles[i, 2] + angles[i, 3])
+
+        # the three control points only differ in their distance from frame 3, see jacobian_transpose_on_f
+        for point_id in range(2):
+            distance = c1_location if point_id == 0 else d4
+            fx, fy, fz = workspace_forces[i, point_id, 0], workspace_forces[i, point_id, 1], \
+                workspace_forces[i, point_id, 2]
+            f_radial = fx * c1 + fy * s1
+            joint_forces[i, 1] += (fy * c1 - fx * s1) * (a2 * c2 + distance * s23)
+            joint_forces[i, 2] += a2 * fz * c2 + (fx * c2 + fy * s1) * (distance * c23 - a2 * s2) \
+                + distance * fz * s23
+            joint_forces[i, 3] += distance * c23 * f_radial + distance * fz * s23
+
+        # third control point, origin of frame 6
+        fx, fy, fz = workspace_forces[i, 2, 0], workspace_forces[i, 2, 1], workspace_forces[i, 2, 2]
+        f_radial = fx * c1 + fy * s1
+        f_tangential = fy * c1 - fx * s1
+        joint_forces[i, 1] += f_tangential * (a2 * c2 + (d4 + d6 * c5) * s23) + d6 * (
+                c23 * c4 * f_tangential + f_radial * s4) * s5
+        joint_forces[i, 2] += a2 * fz * c2 + c23 * (d4 + d6 * c5) * f_radial + fz * (
+                d4 + d6 * c5) * s23 + d6 * fz * c23 * c4 * s5 - f_radial * (a2 * s2 + d6 * c4 * s23 * s5)
+        joint_forces[i, 3] += (d4 + d6 * c5) * (c23 * f_radial + fz * s23) + d6 * c4 * (
+                fz * c23 - f_radial * s23) * s5
+        joint_forces[i, 4] += -d6 * (-fx * c4 * s1 + (fy * c23 * s1 + fz * s23) * s4 + c1 * (fy * c4 + fx * c23 * s4)) * s5
+        joint_forces[i, 5] += d6 * c5 * (c4 * (c23 * f_radial + fz * s23) - f_tangential * s4) + d6 * (
+                fz * c23 - f_radial * s23) * s5
+
+    return joint_forces
@@ -1,9 +1,18 @@
 import numpy as np
 from numba import jit
-from numpy import sin, cos
+from numpy import sin, cos, pi
 
+# minimum and maximum angle of every joint, the array starts at 1 like the angles
+joint_limits = np.array([[0, 0],
+                         [0, pi],
+                         [0, pi],
+                         [-pi / 3, 2 * pi / 3],
+                         [-pi, pi],
+                         [-3 * pi / 4, 3 * pi / 4],
+                         [-pi, pi]], dtype=np.float64)
 
-@jit(nopython=True)
+
+@jit(nopython=True, cache=True)
 def calculate_euler_matrix_from_angles(alpha, beta, gamma):
     orientation = np.eye(3, dtype=np.float64)
 
@@ -27,7 +36,29 @@ def calculate_euler_matrix_from_angles(alpha, beta, gamma):
     return orientation
 
 
+@jit(nopython=True, cache=True)
+def calculate_euler_matrices_from_angles(alphas, betas, gammas):
+    """Batch version of calculate_euler_matrix_from_angles, returns an (N, 3, 3) array of rotation matrices"""
+    number_of_matrices = alphas.shape[0]
+    orientations = np.zeros((number_of_matrices, 3, 3), dtype=np.float64)
+    for i in range(number_of_matrices):
+        orientations[i] = calculate_euler_matrix_from_angles(alphas[i], betas[i], gammas[i])
+    return orientations
+
+
+def get_orientation_angles(orientations):
+    """
+    :param orientations: (3, 3) euler matrix or (..., 3, 3) array of them
+    :return: alpha and gamma of every orientation, the inverse of calculate_euler_matrix_from_angles
+    """
+    orientations = np.asarray(orientations, dtype=np.float64)
+    alphas = np.arctan2(orientations[..., 1, 1], orientations[..., 0, 1])
+    gammas = np.arctan2(orientations[..., 2, 2], orientations[..., 2, 0])
+    return alphas, gammas
+
+
 class Pose:
+    __slots__ = ('x', 'y', 'z', 'flip', 'time', 'euler_matrix', '_alpha', '_beta', '_gamma', '_cached_euler_matrix')
 
     def __init__(self, x, y, z, flip=False, alpha=0.0, beta=0.0, gamma=0.0, time=2.0, euler_matrix=None):
         self.x = float(x)
@@ -36,29 +67,78 @@ class Pose:
         self.time = time
         self.flip = flip
         self.euler_matrix = euler_matrix
-        self.alpha = float(alpha)
-        self.beta = float(beta)
-        self.gamma = float(gamma)
+        self._alpha = float(alpha)
+        self._beta = float(beta)
+        self._gamma = float(gamma)
+        self._cached_euler_matrix = None
+
+    # The euler matrix is cached, changing one of the angles clears that cache
+    @property
+    def alpha(self):
+        return self._alpha
+
+    @alpha.setter
+    def alpha(self, value):
+        self._alpha = float(value)
+        self._cached_euler_matrix = None
+
+    @property
+    def beta(self):
+        return self._beta
+
+    @beta.setter
+    def beta(self, value):
+        self._beta = float(value)
+        self._cached_euler_matrix = None
+
+    @property
+    def gamma(self):
+        return self._gamma
+
+    @gamma.setter
+    def gamma(self, value):
+        self._gamma = float(value)
+        self._cached_euler_matrix = None
 
     def get_euler_matrix(self):
+        """The returned matrix is shared with the pose, don't change it in place"""
         if self.euler_matrix is not None:
             return self.euler_matrix
-        else:
-            return self._get_euler_matrix_from_angles()
+        if self._cached_euler_matrix is None:
+            self._cached_euler_matrix = self._get_euler_matrix_from_angles()
+        return self._cached_euler_matrix
 
     def _get_euler_matrix_from_angles(self):
         """alpha is a turn around the world z-axis"""
         """beta is a turn around the world y-axis"""
         """gamma is a turn around the world x-axis"""
-        return calculate_euler_matrix_from_angles(self.alpha, self.beta, self.gamma)
+        return calculate_euler_matrix_from_angles(self._alpha, self._beta, self._gamma)
 
     def reset_orientation(self):
         self.alpha = 0
         self.gamma = 0
         self.beta = 0
 
+    def to_dict(self):
+        return {'x': self.x, 'y': self.y, 'z': self.z, 'flip': self.flip, 'alpha': self._alpha, 'beta': self._beta,
+                'gamma': self._gamma, 'time': self.time, 'euler_matrix': self.euler_matrix}
+
+    def to_json(self):
+        json_dict = self.to_dict()
+        if self.euler_matrix is not None:
+            json_dict['euler_matrix'] = np.asarray(self.euler_matrix).tolist()
+        return json_dict
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
     def __copy__(self):
-        res = Pose(self.x, self.y, self.z, self.flip, self.alpha, self.beta, self.gamma, self.time)
+        res = Pose(self.x, self.y, self.z, self.flip, self._alpha, self._beta, self._gamma, self.time,
+                   self.euler_matrix)
+        res._cached_euler_matrix = self._cached_euler_matrix
         return res
 
     def __str__(self):
@@ -66,8 +146,132 @@ class Pose:
             .format(self.x, self.y, self.z, self.alpha, self.beta, self.gamma, self.time, self.flip)
 
     def __eq__(self, other: object) -> bool:
-        return (isinstance(other, self.__class__)
-                and self.__dict__ == other.__dict__)
+        if not isinstance(other, self.__class__):
+            return False
+        if self.euler_matrix is None or other.euler_matrix is None:
+            same_matrix = self.euler_matrix is None and other.euler_matrix is None
+        else:
+            same_matrix = np.array_equal(self.euler_matrix, other.euler_matrix)
+        return (same_matrix and (self.x, self.y, self.z, self.flip, self._alpha, self._beta, self._gamma, self.time)
+                == (other.x, other.y, other.z, other.flip, other._alpha, other._beta, other._gamma, other.time))
+
+
+class PoseArray:
+    """
+    A whole trajectory of poses stored in a few arrays instead of a list of Pose objects.
+    Appending is amortized O(1), the columns (x, y, z, alpha, ...) can be used directly in vectorized code and
+    the euler matrices of all poses are kept so they don't have to be calculated again.
+    Indexing with an integer gives a Pose, with a slice a new PoseArray.
+    """
+
+    _X, _Y, _Z, _ALPHA, _BETA, _GAMMA, _TIME = range(7)
+
+    def __init__(self, capacity=16):
+        self._size = 0
+        self._values = np.zeros((max(capacity, 1), 7), dtype=np.float64)
+        self._flips = np.zeros(max(capacity, 1), dtype=np.bool_)
+        # poses that were given an euler matrix instead of angles
+        self._has_euler_matrix = np.zeros(max(capacity, 1), dtype=np.bool_)
+        self._euler_matrices = np.zeros((max(capacity, 1), 3, 3), dtype=np.float64)
+
+    @staticmethod
+    def from_poses(poses):
+        pose_array = PoseArray(len(poses))
+        for pose in poses:
+            pose_array.append(pose)
+        return pose_array
+
+    def append(self, pose):
+        if self._size == len(self._values):
+            self._grow()
+        i = self._size
+        self._values[i] = (pose.x, pose.y, pose.z, pose.alpha, pose.beta, pose.gamma, pose.time)
+        self._flips[i] = pose.flip
+        self._has_euler_matrix[i] = pose.euler_matrix is not None
+        self._euler_matrices[i] = pose.get_euler_matrix()
+        self._size += 1
+
+    def _grow(self):
+        capacity = 2 * len(self._values)
+        self._values = np.resize(self._values, (capacity, 7))
+        self._flips = np.resize(self._flips, capacity)
+        self._has_euler_matrix = np.resize(self._has_euler_matrix, capacity)
+        self._euler_matrices = np.resize(self._euler_matrices, (capacity, 3, 3))
+
+    def clear(self):
+        self._size = 0
+
+    def to_poses(self):
+        return [self[i] for i in range(self._size)]
+
+    @property
+    def x(self):
+        return self._values[:self._size, self._X]
+
+    @property
+    def y(self):
+        return self._values[:self._size, self._Y]
+
+    @property
+    def z(self):
+        return self._values[:self._size, self._Z]
+
+    @property
+    def positions(self):
+        return self._values[:self._size, :3]
+
+    @property
+    def alpha(self):
+        return self._values[:self._size, self._ALPHA]
+
+    @property
+    def beta(self):
+        return self._values[:self._size, self._BETA]
+
+    @property
+    def gamma(self):
+        return self._values[:self._size, self._GAMMA]
+
+    @property
+    def time(self):
+        return self._values[:self._size, self._TIME]
+
+    @property
+    def flip(self):
+        return self._flips[:self._size]
+
+    @property
+    def euler_matrices(self):
+        return self._euler_matrices[:self._size]
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        for i in range(self._size):
+            yield self[i]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            indices = range(self._size)[index]
+            result = PoseArray(len(indices))
+            result._values[:len(indices)] = self._values[:self._size][index]
+            result._flips[:len(indices)] = self._flips[:self._size][index]
+            result._has_euler_matrix[:len(indices)] = self._has_euler_matrix[:self._size][index]
+            result._euler_matrices[:len(indices)] = self._euler_matrices[:self._size][index]
+            result._size = len(indices)
+            return result
+
+        if index < 0:
+            index += self._size
+        if index < 0 or index >= self._size:
+            raise IndexError('pose index out of range')
+        x, y, z, alpha, beta, gamma, time = self._values[index]
+        euler_matrix = self._euler_matrices[index].copy()
+        pose = Pose(x, y, z, bool(self._flips[index]), alpha, beta, gamma, float(time),
+                    euler_matrix if self._has_euler_matrix[index] else None)
+        pose._cached_euler_matrix = euler_matrix
+        return pose
 
 
 class RobotConfig:
@@ -89,6 +293,10 @@ class RobotConfig:
         else:
             self._d6 = length
 
+    def fingerprint(self):
+        """The current link lengths, can be used to check if something calculated for this config is still valid"""
+        return self.d1, self.a2, self.d4, self.d6
+
     def restore_initial_values(self):
         self.d1 = self.initial_d1
         self.a2 = self.initial_a2
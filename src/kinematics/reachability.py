@@ -0,0 +1,142 @@
+import json
+import logging as log
+import os
+
+import numpy as np
+
+from src.kinematics.kinematics import calculate_reachability
+from src.kinematics.kinematics_utils import joint_limits, calculate_euler_matrices_from_angles
+
+
+class ReachabilityGrid:
+    """
+    Voxel grid that tells for every (x, y, z) position, and optionally for a number of alpha/gamma orientations,
+    if the robot can reach it: the inverse kinematics has a solution and it stays within the joint limits.
+    The grid is built offline with build_reachability_grid and stored as a .npy file that is memory mapped when loaded,
+    so a lookup is a single array index no matter how large the grid is.
+    Lookups use the nearest voxel, so close to the border of the workspace the answer is only as good as the resolution.
+    """
+
+    def __init__(self, reachable, origin, resolution, alphas, gammas, fingerprint):
+        """
+        :param reachable: (nx, ny, nz, len(alphas), len(gammas)) array of booleans
+        :param origin: [x, y, z] of the centre of the first voxel
+        :param resolution: size of a voxel in cm
+        :param alphas: sorted orientations that are in the grid, with a single one the orientation is ignored
+        :param gammas: sorted orientations that are in the grid, with a single one the orientation is ignored
+        :param fingerprint: RobotConfig.fingerprint() of the config the grid was built for
+        """
+        self.reachable = reachable
+        self.origin = np.asarray(origin, dtype=np.float64)
+        self.resolution = float(resolution)
+        self.alphas = np.asarray(alphas, dtype=np.float64)
+        self.gammas = np.asarray(gammas, dtype=np.float64)
+        self.fingerprint = tuple(float(length) for length in fingerprint)
+
+    def is_reachable(self, x, y, z, alpha=0.0, gamma=0.0):
+        """
+        Vectorized lookup, every argument can be a scalar or an array (i.e. every step of a trajectory)
+        :return: array of booleans (or a single bool), positions outside of the grid are not reachable
+        """
+        x, y, z, alpha, gamma = np.broadcast_arrays(*[np.asarray(value, dtype=np.float64)
+                                                      for value in (x, y, z, alpha, gamma)])
+        indices = np.rint((np.stack((x, y, z), axis=-1) - self.origin) / self.resolution).astype(np.int64)
+        inside = np.all((indices >= 0) & (indices < self.reachable.shape[:3]), axis=-1)
+        indices[~inside] = 0
+
+        alpha_indices = get_nearest_indices(self.alphas, alpha)
+        gamma_indices = get_nearest_indices(self.gammas, gamma)
+
+        reachable = self.reachable[indices[..., 0], indices[..., 1], indices[..., 2], alpha_indices, gamma_indices]
+        result = np.logical_and(reachable, inside)
+        return bool(result) if result.ndim == 0 else result
+
+    def is_pose_reachable(self, pose):
+        return self.is_reachable(pose.x, pose.y, pose.z, pose.alpha, pose.gamma)
+
+    def matches(self, robot_config):
+        return np.allclose(self.fingerprint, robot_config.fingerprint())
+
+    def save(self, path):
+        """Stores the grid in path.npy and the information needed to index it in path.json"""
+        np.save(path + '.npy', self.reachable)
+        with open(path + '.json', 'w') as file:
+            json.dump({'origin': self.origin.tolist(), 'resolution': self.resolution, 'alphas': self.alphas.tolist(),
+                       'gammas': self.gammas.tolist(), 'fingerprint': list(self.fingerprint)}, file)
+
+    @staticmethod
+    def load(path, mmap_mode='r'):
+        with open(path + '.json', 'r') as file:
+            info = json.load(file)
+        reachable = np.load(path + '.npy', mmap_mode=mmap_mode)
+        return ReachabilityGrid(reachable, info['origin'], info['resolution'], info['alphas'], info['gammas'],
+                                info['fingerprint'])
+
+
+def get_nearest_indices(values, query):
+    if len(values) == 1:
+        return np.zeros(np.shape(query), dtype=np.int64)
+    indices = np.clip(np.searchsorted(values, query), 1, len(values) - 1)
+    left_is_closer = (query - values[indices - 1]) < (values[indices] - query)
+    return indices - left_is_closer
+
+
+def build_reachability_grid(robot_config, workspace_limits, resolution=1.0, alphas=(0.0,), gammas=(0.0,)):
+    """
+    Check every voxel centre within the bounding box of the workspace limits for every orientation
+    :param robot_config: link lengths
+    :param workspace_limits: only used for the size of the grid, see global_constants.WorkSpaceLimits
+    :param resolution: size of a voxel in cm
+    :param alphas: orientations to include in the grid, the default only checks the neutral orientation
+    :param gammas: orientations to include in the grid
+    :return: ReachabilityGrid
+    """
+    radius = workspace_limits.radius_max
+    origin = np.array([-radius, 0, workspace_limits.z_min], dtype=np.float64)
+    xs = np.arange(origin[0], radius + resolution / 2, resolution)
+    ys = np.arange(origin[1], radius + resolution / 2, resolution)
+    zs = np.arange(origin[2], radius + resolution / 2, resolution)
+    alphas = np.sort(np.asarray(alphas, dtype=np.float64))
+    gammas = np.sort(np.asarray(gammas, dtype=np.float64))
+
+    positions = np.stack(np.meshgrid(xs, ys, zs, indexing='ij'), axis=-1).reshape(-1, 3)
+
+    reachable = np.zeros((len(xs), len(ys), len(zs), len(alphas), len(gammas)), dtype=np.bool_)
+    for i, alpha in enumerate(alphas):
+        for j, gamma in enumerate(gammas):
+            orientation = calculate_euler_matrices_from_angles(np.array([alpha]), np.zeros(1), np.array([gamma]))
+            orientations = np.ascontiguousarray(np.broadcast_to(orientation, (len(positions), 3, 3)))
+            reachable[..., i, j] = calculate_reachability(positions, orientations, float(robot_config.d1),
+                                                          float(robot_config.d6), float(robot_config.a2),
+                                                          float(robot_config.d4),
+                                                          joint_limits).reshape(len(xs), len(ys), len(zs))
+
+    log.info('built reachability grid of shape %s, %.1f%% reachable', reachable.shape, 100 * reachable.mean())
+    return ReachabilityGrid(reachable, origin, resolution, alphas, gammas, robot_config.fingerprint())
+
+
+def load_reachability_grid(path, robot_config):
+    """
+    :return: the memory mapped grid, or None when it was not built yet or was built for different link lengths
+    """
+    try:
+        grid = ReachabilityGrid.load(path)
+    except FileNotFoundError:
+        log.warning('no reachability grid found at %s, only the workspace limits are checked', path)
+        return None
+
+    if not grid.matches(robot_config):
+        log.warning('reachability grid at %s was built for another robot config, not using it', path)
+        return None
+    return grid
+
+
+if __name__ == '__main__':
+    from src import global_constants
+
+    log.basicConfig(level=log.INFO)
+    built_grid = build_reachability_grid(global_constants.dynamixel_robot_config, global_constants.WorkSpaceLimits,
+                                         alphas=np.linspace(-np.pi / 2, np.pi / 2, 9),
+                                         gammas=np.linspace(-np.pi / 2, np.pi / 2, 9))
+    os.makedirs(os.path.dirname(global_constants.reachability_grid_path), exist_ok=True)
+    built_grid.save(global_constants.reachability_grid_path)
@@ -1,3 +1,5 @@
+import functools
+
 import numpy as np
 from hilbertcurve.hilbertcurve import HilbertCurve
 
@@ -37,63 +39,123 @@ def get_obstacles_for_point(point_location, obstacles):
     return np.array(res)
 
 
+def get_obstacle_footprints(obstacles):
+    """
+    :return: (M, 2) centers, (M, 2) half extends, (M,) rotations around z and (M,) heights of the obstacles
+    """
+    centers = np.array([obstacle.base_center_position[0:2] for obstacle in obstacles], dtype=np.float64)
+    half_extends = np.array([obstacle.half_extends[0:2] for obstacle in obstacles], dtype=np.float64)
+    alphas = np.array([obstacle.alpha for obstacle in obstacles], dtype=np.float64)
+    heights = np.array([obstacle.dimensions[2] for obstacle in obstacles], dtype=np.float64)
+    return centers.reshape(-1, 2), half_extends.reshape(-1, 2), alphas, heights
+
+
+def get_points_in_obstacle_frames(points, centers, alphas):
+    """
+    :param points: (P, 2) array of x, y coordinates
+    :return: (P, M, 2) array with every point expressed in the coordinate frame of every obstacle
+    """
+    c, s = np.cos(alphas), np.sin(alphas)
+    # columns 2m and 2m + 1 are the rows of the inverse rotation matrix [[c, s], [-s, c]] of obstacle m,
+    # so all points are rotated into all obstacle frames with one matrix multiplication
+    rotations_inv = np.empty((2, 2 * len(alphas)))
+    rotations_inv[0, 0::2], rotations_inv[1, 0::2] = c, s
+    rotations_inv[0, 1::2], rotations_inv[1, 1::2] = -s, c
+    rotated_centers = np.column_stack((c * centers[:, 0] + s * centers[:, 1], c * centers[:, 1] - s * centers[:, 0]))
+    return (points @ rotations_inv).reshape(points.shape[0], len(alphas), 2) - rotated_centers
+
+
+def rasterize_obstacles(obstacles, points, channels=('height',), max_clearance=20):
+    """
+    Evaluates the obstacles at all points at once instead of asking get_obstacles_for_point for every point
+    :param points: (P, 2) array of x, y coordinates, e.g. the centers of the cells of a grid
+    :param channels: names of the values to calculate for every point:
+                     'height': height of the tallest obstacle over the point divided by max_height, at most 1
+                     'clearance': distance to the footprint of the closest obstacle divided by max_clearance, 0 inside
+                     an obstacle and at most 1
+    :return: (P, len(channels)) array
+    """
+    if obstacles is None:
+        obstacles = []
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    centers, half_extends, alphas, heights = get_obstacle_footprints(obstacles)
+    local_points = get_points_in_obstacle_frames(points, centers, alphas)
+    outside = np.abs(local_points) - half_extends
+    outside_x, outside_y = outside[:, :, 0], outside[:, :, 1]
+
+    result = np.zeros((points.shape[0], len(channels)), dtype=np.float64)
+    for i, channel in enumerate(channels):
+        if channel == 'height':
+            inside = (outside_x <= 0) & (outside_y <= 0)
+            tallest = np.max(inside * heights, axis=1, initial=0)
+            result[:, i] = np.minimum(1.0, tallest / max_height)
+        elif channel == 'clearance':
+            distances = np.hypot(np.maximum(outside_x, 0), np.maximum(outside_y, 0))
+            closest = np.min(distances, axis=1, initial=np.inf)
+            result[:, i] = np.minimum(1.0, closest / max_clearance)
+        else:
+            raise ValueError("unknown channel {}, expected 'height' or 'clearance'".format(channel))
+    return result
+
+
+def get_grid_cell_centers(grid_len_x, grid_len_y, cells_x, cells_y):
+    """
+    :return: (cells_x, cells_y, 2) array with the x, y coordinates of the center of every cell, the grid is centered
+             around x = 0 and starts at y = 0
+    """
+    grid_size_x = grid_len_x / cells_x
+    grid_size_y = grid_len_y / cells_y
+    x_coordinates = np.arange(cells_x) * grid_size_x + grid_size_x / 2 - grid_len_x / 2
+    y_coordinates = np.arange(cells_y) * grid_size_y + grid_size_y / 2
+    return np.stack(np.meshgrid(x_coordinates, y_coordinates, indexing='ij'), axis=2)
+
+
+def create_obstacle_maps(obstacles, grid_len_x=60, grid_len_y=40, cells_x=12, cells_y=8,
+                         channels=('height', 'clearance'), max_clearance=20):
+    """
+    :return: (cells_x, cells_y, len(channels)) float32 array with a map per channel, see rasterize_obstacles
+    """
+    cell_centers = get_grid_cell_centers(grid_len_x, grid_len_y, cells_x, cells_y)
+    maps = rasterize_obstacles(obstacles, cell_centers.reshape(-1, 2), channels, max_clearance)
+    return maps.reshape(cells_x, cells_y, len(channels)).astype(np.float32)
+
+
 def create_occupancy_grid_from_obstacles(obstacles, grid_len_x=60, grid_len_y=40, grid_size=5):
     if grid_len_x % grid_size != 0:
         raise ValueError("grid_len_x has to be a multiple of grid_size")
     if grid_len_y % grid_size != 0:
         raise ValueError("grid_len_y has to be a multiple of grid_size")
 
-    scaled_x = np.ceil(grid_len_x/grid_size)
-
-    scaled_y = np.ceil(grid_len_y/grid_size)
+    scaled_x = int(np.ceil(grid_len_x/grid_size))
+    scaled_y = int(np.ceil(grid_len_y/grid_size))
 
-    result = np.zeros((scaled_x.astype(int), scaled_y.astype(int)), dtype=np.float32)
     if obstacles is None:
-        return result
+        return np.zeros((scaled_x, scaled_y), dtype=np.float32)
 
-    for grid_x in range(0, result.shape[0]):
-        for grid_y in range(0, result.shape[1]):
-            x_coordinate = grid_x*grid_size + grid_size/2 - grid_len_x/2
-            y_coordinate = grid_y*grid_size + grid_size/2
-            point_location = np.array([x_coordinate, y_coordinate])
-            intersecting_obstacles = get_obstacles_for_point(point_location, obstacles)
-            if intersecting_obstacles.size != 0:
-                height = get_height_tallest_obstacle(intersecting_obstacles)
-                result[grid_x][grid_y] = min(1.0, height/max_height)
+    return create_obstacle_maps(obstacles, grid_len_x, grid_len_y, scaled_x, scaled_y, channels=('height',))[:, :, 0]
 
-            # print("indices: ({}, {}) coordinates: ({}, {}), intersection_obs: {}".format(grid_x, grid_y, x_coordinate, y_coordinate, intersecting_obstacles))
 
-    return result
+@functools.lru_cache(maxsize=None)
+def get_hilbert_curve_coordinates(iteration, dimension=2):
+    """:return: (2**(dimension*iteration), dimension) array with the coordinates of every point along the curve"""
+    hilbert_curve = HilbertCurve(iteration, dimension)
+    coordinates = np.array([hilbert_curve.coordinates_from_distance(i) for i in range(2**(dimension*iteration))])
+    coordinates.setflags(write=False)
+    return coordinates
 
 
 def create_hilbert_curve_from_obstacles(obstacles, grid_len_x=60, grid_len_y=40, iteration=3):
-    dimension = 2
-    hilbert_curve = HilbertCurve(iteration, dimension)
-
-    curve_total_len = 2**(dimension*iteration)
+    curve_total_len = 2**(2*iteration)
     curve_side_len = 2 ** iteration
 
     # size of the block in the grid
-    grid_size_x = grid_len_x / curve_side_len
-    grid_size_y = grid_len_y / curve_side_len
+    grid_size = np.array([grid_len_x / curve_side_len, grid_len_y / curve_side_len])
 
-    res = np.zeros(curve_total_len)
     if obstacles is None:
-        return res
-
-    for i in range(curve_total_len):
-        coords = hilbert_curve.coordinates_from_distance(i)
-        x_h_coord, y_h_coord = coords[0], coords[1]
-
-        x_coordinate = x_h_coord*grid_size_x + grid_size_x/2 - grid_len_x/2
-        y_coordinate = y_h_coord*grid_size_y + grid_size_y/2
-        point_location = np.array([x_coordinate, y_coordinate])
-        intersecting_obstacles = get_obstacles_for_point(point_location, obstacles)
-        if intersecting_obstacles.size != 0:
-            height = get_height_tallest_obstacle(intersecting_obstacles)
-            res[i] = min(1.0, height/max_height)
+        return np.zeros(curve_total_len)
 
-    return res
+    points = get_hilbert_curve_coordinates(iteration) * grid_size + grid_size / 2 - [grid_len_x / 2, 0]
+    return rasterize_obstacles(obstacles, points, channels=('height',))[:, 0]
 
 
 if __name__ == '__main__':
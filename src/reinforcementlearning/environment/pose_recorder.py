@@ -1,20 +1,19 @@
-from copy import copy
+from src.kinematics.kinematics_utils import PoseArray
 
 
 class PoseRecorder:
 
     def __init__(self):
-        self.poses = []
+        self.poses = PoseArray()
 
     def add_pose(self, pose):
-        copied_pose = copy(pose)
-        self.poses.append(copied_pose)
+        self.poses.append(pose)
 
     def clear_poses(self):
-        self.poses = []
+        self.poses.clear()
 
     def get_recorded_poses(self):
-        return [copy(pose) for pose in self.poses]
+        return self.poses.to_poses()
 
 
 class DummyPoseRecorder(PoseRecorder):
@@ -7,9 +7,10 @@ import pybullet as p
 
 from src.reinforcementlearning.environment.pose_recorder import DummyPoseRecorder
 from src.reinforcementlearning.environment.robot_env_utils import get_attractive_force_world, get_target_points, \
-    draw_debug_lines, get_repulsive_forces_world, \
-    get_clipped_state
+    draw_debug_lines, get_clipped_state, fill_observation
+from src.reinforcementlearning.environment.repulsive_force_engine import RepulsiveForceEngine
 from src.reinforcementlearning.environment.scenario import scenarios_no_obstacles
+from src.robot_controllers.simulated_robot.simulated_robot_controller import read_control_point_positions
 from src.simulation.simulation_utils import start_simulated_robot
 from src.utils.obstacle import BoxObstacle, SphereObstacle
 from tf_agents.environments import py_environment
@@ -59,11 +60,16 @@ class RobotEnv(py_environment.PyEnvironment):
         self._closest_distance_so_far = None
         self._robot_body_id = self._robot_controller.body_id
         self._target_pose = None
+        # the targets of the wrist and the tip of the gripper, they only change when the target pose changes
+        self._target_points = np.zeros((2, 3), dtype=np.float64)
+        self._control_point_positions = np.zeros((3, 3), dtype=np.float64)
+        self._observation = np.zeros(17, dtype=np.float32)
         self._steps_taken = 0
         self._current_angles = None
         self._floor = BoxObstacle([1000, 1000, 1], [0, 0, -1], color=[1, 1, 1, 0])
         self._floor.build(self._physics_client)
         self._obstacles = None
+        self._repulsive_force_engine = None
         self._target_spheres = None
         self._attr_lines = None
         self._rep_lines = None
@@ -214,6 +220,10 @@ class RobotEnv(py_environment.PyEnvironment):
 
         self._obstacles, self._target_pose, self._start_pose = self._generate_obstacles_and_target_pose()
         self.obstacle_ids = [obstacle.obstacle_id for obstacle in self._obstacles] + [self._floor.obstacle_id]
+        self._repulsive_force_engine = RepulsiveForceEngine(
+            self._robot_controller.control_points, self._obstacles,
+            floor_height=self._floor.base_center_position[2] + self._floor.half_extends[2],
+            repulsive_cutoff_distance=8, clip_force=6)
         self._current_pose = copy(self._start_pose)
 
         if self._start_pose.x > self._start_pose.x:
@@ -222,8 +232,12 @@ class RobotEnv(py_environment.PyEnvironment):
 
         # self._create_visual_target_spheres(self._target_pose)
 
+        _, self._target_points[0], self._target_points[1] = get_target_points(
+            self._target_pose, self._robot_controller.robot_config.d6)
+
         self._robot_controller.reset_to_pose(self._start_pose)
         self._advance_simulation(0)
+        self._update_control_point_positions()
 
         self._current_angles = self._robot_controller.get_current_angles()
         observation, self._closest_distance_so_far = self._get_observations()
@@ -310,11 +324,16 @@ class RobotEnv(py_environment.PyEnvironment):
         self._steps_taken += 1
         return self._current_time_step
 
+    def _update_control_point_positions(self):
+        # where the collision shapes are, the repulsive forces are calculated from these positions
+        read_control_point_positions(self._robot_controller.control_points, self._control_point_positions,
+                                     compute_forward_kinematics=True)
+
     def _sync_position(self):
-        c1, c2, c3 = self._robot_controller.control_points
-        self._current_pose.x = c3.position[0]
-        self._current_pose.y = c3.position[1]
-        self._current_pose.z = c3.position[2]
+        self._update_control_point_positions()
+        self._current_pose.x = self._control_point_positions[2, 0]
+        self._current_pose.y = self._control_point_positions[2, 1]
+        self._current_pose.z = self._control_point_positions[2, 2]
 
     @staticmethod
     def _get_reward(extra_distance_closed_this_step, total_distance, delta_distance):
@@ -363,17 +382,18 @@ class RobotEnv(py_environment.PyEnvironment):
         return False
 
     def _get_observations(self):
+        """
+        Uses the control point positions of the last _update_control_point_positions
+        :return: a new observation array and the distance to the target
+        """
         c1, c2, c3 = self._robot_controller.control_points
 
-        _, target_point_2, target_point_3 = get_target_points(self._target_pose, self._robot_controller.robot_config.d6)
         # Control point 1 is not used for the attractive forces
         attractive_cutoff_dis = 10
         attractive_forces = np.zeros((3, 3))
 
         calculated_forces, total_distance = get_attractive_force_world(
-            np.array([c2.position, c3.position], dtype=np.float64),
-            np.array([target_point_2, target_point_3], dtype=np.float64),
-            attractive_cutoff_distance=attractive_cutoff_dis)
+            self._control_point_positions[1:], self._target_points, attractive_cutoff_distance=attractive_cutoff_dis)
 
         attractive_forces[1] = calculated_forces[0]
         attractive_forces[2] = calculated_forces[1]
@@ -382,11 +402,7 @@ class RobotEnv(py_environment.PyEnvironment):
         attractive_forces[1] /= attractive_cutoff_dis
         attractive_forces[2] /= attractive_cutoff_dis
 
-        repulsive_cutoff_distance = 8
-        repulsive_forces = get_repulsive_forces_world(self._robot_body_id, np.array([c1, c2, c3]),
-                                                      self.obstacle_ids, self._physics_client,
-                                                      repulsive_cutoff_distance=repulsive_cutoff_distance,
-                                                      clip_force=6)
+        repulsive_forces = self._repulsive_force_engine.get_forces(self._control_point_positions)
 
         if self._draw_debug_lines:
             self._attr_lines, self._rep_lines = draw_debug_lines(self._physics_client, np.array([c1, c2, c3]),
@@ -394,31 +410,9 @@ class RobotEnv(py_environment.PyEnvironment):
                                                                  self._attr_lines, self._rep_lines,
                                                                  line_size=6)
 
-        total_observation = []
-        total_observation += self._get_normalized_vector_as_list(attractive_forces[2])
-        total_observation += self._get_normalized_vector_as_list(repulsive_forces[0])
-        total_observation += self._get_normalized_vector_as_list(repulsive_forces[1])
-        total_observation += self._get_normalized_vector_as_list(repulsive_forces[2])
-        total_observation += self._get_normalized_pose()
-
-        return np.array(np.array(total_observation), dtype=np.float32), total_distance
-
-    def _get_normalized_vector_as_list(self, vec):
-        if self._raw_obs:
-            return vec.tolist()
-        norm = np.linalg.norm(vec)
-        if norm < 1:  # Only normalize the vector if it's too big
-            return vec.tolist()
-        normalized_vec = vec / np.linalg.norm(vec)
-        return normalized_vec.tolist()
-
-    def _get_normalized_pose(self):
-        normalized_x = self._current_pose.x / 40
-        normalized_y = self._current_pose.y / 40
-        normalized_z = self._current_pose.z / 40
-        normalized_alpha = self._current_pose.alpha / np.pi
-        normalized_gamma = self._current_pose.gamma / np.pi
-        return [normalized_x, normalized_y, normalized_z, normalized_alpha, normalized_gamma]
+        fill_observation(self._observation, attractive_forces[2], repulsive_forces, self._current_pose, self._raw_obs)
+        # a copy, time steps that were handed out should not change with the next step
+        return self._observation.copy(), total_distance
 
     def _advance_simulation(self, recommended_time):
         # for _ in range(self._simulation_steps_per_step):
@@ -3,6 +3,10 @@ from numba import jit
 from numpy import pi
 import pybullet as p
 
+from src.kinematics.collision import point_box_distance_and_normal
+from src.kinematics.kinematics import batch_forward_position_kinematics
+from src.kinematics.kinematics_utils import joint_limits
+
 
 def get_target_points(target_pose, d6):
     """gives the target 3d location for the control points on the robot
@@ -17,10 +21,11 @@ def get_target_points(target_pose, d6):
     Returns:
       a 3 vector [x,y,z] for each control point on the robot
     """
-    return calculate_target_pose(target_pose.x, target_pose.y, target_pose.z, target_pose.get_euler_matrix(), d6)
+    return calculate_target_pose(float(target_pose.x), float(target_pose.y), float(target_pose.z),
+                                 np.ascontiguousarray(target_pose.get_euler_matrix(), dtype=np.float64), float(d6))
 
 
-@jit(nopython=True)
+@jit(nopython=True, cache=True)
 def calculate_target_pose(x_3, y_3, z_3, t, d6):
     point_3 = np.array([x_3, y_3, z_3])
 
@@ -57,10 +62,12 @@ def get_attractive_force_world(control_points, target_points, attractive_cutoff_
 
     if weights is None:
         weights = np.ones(number_of_control_points)
-    return calculate_forces(number_of_control_points, control_points, target_points, attractive_cutoff_distance, weights)
+    return calculate_forces(number_of_control_points, np.ascontiguousarray(control_points, dtype=np.float64),
+                            np.ascontiguousarray(target_points, dtype=np.float64), float(attractive_cutoff_distance),
+                            np.ascontiguousarray(weights, dtype=np.float64))
 
 
-@jit(nopython=True)
+@jit(nopython=True, cache=True)
 def calculate_forces(number_of_control_points, control_points, target_points, attractive_cutoff_distance, weights):
     workspace_forces = np.zeros((number_of_control_points, 3))
 
@@ -138,6 +145,118 @@ def get_repulsive_forces_world(robot_body_id, control_points, obstacle_ids,
     return workspace_forces
 
 
+def fill_observation(observation, attractive_force, repulsive_forces, pose, raw_obs=False):
+    """
+    Write the observation of RobotEnv into a preallocated buffer: the attractive force on the tip of the gripper,
+    the repulsive forces on the three control points and the pose of the gripper scaled to about [-1, 1].
+    Forces with a size of 1 or more are normalized, unless raw_obs.
+    :param observation: float32 array of 17 values
+    :param attractive_force: 3d attractive force on the tip of the gripper
+    :param repulsive_forces: (3, 3) array with the repulsive force on every control point
+    :return: observation
+    """
+    calculate_observation_into(observation, np.ascontiguousarray(attractive_force, dtype=np.float64),
+                               np.ascontiguousarray(repulsive_forces, dtype=np.float64), float(pose.x),
+                               float(pose.y), float(pose.z), float(pose.alpha), float(pose.gamma), bool(raw_obs))
+    return observation
+
+
+@jit(nopython=True, cache=True)
+def set_normalized_vector(observation, start, vector, raw_obs):
+    norm = np.sqrt(vector[0] * vector[0] + vector[1] * vector[1] + vector[2] * vector[2])
+    scale = 1.0
+    if not raw_obs and norm >= 1:  # only normalize the vector if it's too big
+        scale = 1.0 / norm
+    for i in range(3):
+        observation[start + i] = vector[i] * scale
+
+
+@jit(nopython=True, cache=True)
+def calculate_observation_into(observation, attractive_force, repulsive_forces, x, y, z, alpha, gamma, raw_obs):
+    set_normalized_vector(observation, 0, attractive_force, raw_obs)
+    for i in range(3):
+        set_normalized_vector(observation, 3 + 3 * i, repulsive_forces[i], raw_obs)
+    observation[12] = x / 40
+    observation[13] = y / 40
+    observation[14] = z / 40
+    observation[15] = alpha / pi
+    observation[16] = gamma / pi
+
+
+def get_control_point_positions(angles, robot_config, c1_location):
+    """
+    Positions of the control points of generate_control_points, calculated with forward kinematics instead of
+    asking the simulation
+    :param angles: (N, 7) array of angles
+    :param c1_location: distance of control point 1 from frame 3 towards the wrist, see jacobian_transpose_on_f
+    :return: (N, 3, 3) array with for every state control point 1, the wrist and the tip of the gripper
+    """
+    points = batch_forward_position_kinematics(angles, robot_config)
+    control_points = np.empty((points.shape[0], 3, 3), dtype=np.float64)
+    control_points[:, 0] = points[:, 1] + (c1_location / robot_config.d4) * (points[:, 3] - points[:, 1])
+    control_points[:, 1] = points[:, 3]
+    control_points[:, 2] = points[:, 4]
+    return control_points
+
+
+def get_repulsive_forces_batch(control_points, radii, weights, boxes, box_counts, floor_height=0.0,
+                               repulsive_cutoff_distance=2, clip_force=None):
+    """
+    get_repulsive_forces_world without the simulation, the distances to the box obstacles and the floor are
+    calculated analytically
+    :param control_points: (N, P, 3) array with the positions of the control points of every state
+    :param radii: (P,) array with the radius of every control point
+    :param weights: (P,) array with the weight of every control point
+    :param boxes: (N, M, 7) array of box obstacles, see collision.get_box_array, only the first box_counts[i] boxes
+                  of row i are used
+    :param box_counts: (N,) array with the number of obstacles of every state
+    :param floor_height: z of the floor plane
+    :return: (N, P, 3) array of forces pushing every control point away from its closest obstacle
+    """
+    return calculate_repulsive_forces_batch(np.ascontiguousarray(control_points, dtype=np.float64),
+                                            np.ascontiguousarray(radii, dtype=np.float64),
+                                            np.ascontiguousarray(weights, dtype=np.float64),
+                                            np.ascontiguousarray(boxes, dtype=np.float64),
+                                            np.ascontiguousarray(box_counts, dtype=np.int64), float(floor_height),
+                                            float(repulsive_cutoff_distance),
+                                            np.inf if clip_force is None else float(clip_force))
+
+
+@jit(nopython=True, cache=True)
+def calculate_repulsive_forces_batch(control_points, radii, weights, boxes, box_counts, floor_height,
+                                     repulsive_cutoff_distance, clip_force):
+    number_of_states, number_of_points = control_points.shape[0], control_points.shape[1]
+    workspace_forces = np.zeros((number_of_states, number_of_points, 3), dtype=np.float64)
+    normal = np.empty(3, dtype=np.float64)
+
+    for state in range(number_of_states):
+        for i in range(number_of_points):
+            point = control_points[state, i]
+            # the floor is a plane, its normal always points up
+            smallest_distance = point[2] - floor_height - radii[i]
+            if smallest_distance < 0:
+                smallest_distance = 0.1
+            nx, ny, nz = 0.0, 0.0, 1.0
+
+            for box in range(box_counts[state]):
+                distance = point_box_distance_and_normal(point, boxes[state, box], normal) - radii[i]
+                if distance < 0:  # control point overlaps with the obstacle
+                    distance = 0.1
+                if distance < smallest_distance:
+                    smallest_distance = distance
+                    nx, ny, nz = normal[0], normal[1], normal[2]
+
+            if smallest_distance < repulsive_cutoff_distance:
+                distance = smallest_distance
+                constant_term = weights[i] * (1 / distance - 1 / repulsive_cutoff_distance) * (1 / (distance * distance))
+                constant_term = min(max(constant_term, 0.0), clip_force)
+                workspace_forces[state, i, 0] = constant_term * nx
+                workspace_forces[state, i, 1] = constant_term * ny
+                workspace_forces[state, i, 2] = constant_term * nz
+
+    return workspace_forces
+
+
 def get_control_point_pos(robot_body_id, point_id):
     """Get the 3d position of a control point on the robot
 
@@ -180,12 +299,7 @@ def draw_debug_lines(physics_client_id, control_points, attr_forces, rep_forces,
 
 def get_clipped_state(angles):
     res = np.zeros(len(angles), dtype=np.float64)
-    res[1] = np.clip(angles[1], 0, pi)
-    res[2] = np.clip(angles[2], 0, pi)
-    res[3] = np.clip(angles[3], -pi / 3, 2 * pi / 3)
-    res[4] = np.clip(angles[4], -pi, pi)
-    res[5] = np.clip(angles[5], -3 * pi / 4, 3 * pi / 4)
-    res[6] = np.clip(angles[6], -pi, pi)
+    res[1:7] = np.clip(angles[1:7], joint_limits[1:, 0], joint_limits[1:, 1])
     return res
 
 
@@ -228,11 +342,3 @@ def get_de_normalized_current_angles(normalized_angles):
     if array_length > 5:
         res.append(pi * normalized_angles[5])
     return res
-
-
-if __name__ == '__main__':
-    from src.kinematics.kinematics_utils import Pose
-    pose = Pose(-10, 25, 10)
-
-    for _ in range(10):
-        get_target_points(pose, 10)
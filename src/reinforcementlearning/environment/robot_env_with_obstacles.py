@@ -43,7 +43,7 @@ class RobotEnvWithObstacles(RobotEnv):
         grid = self._grid
 
         total_observation = {
-            'observation': np.array(no_obstacle_obs, dtype=np.float32),
+            'observation': no_obstacle_obs,
             'grid': np.expand_dims(grid, axis=2)
         }
 
@@ -25,6 +25,20 @@ class Scenario:
         return Scenario(obstacles_copy, self.start_pose, self.target_pose)
 
 
+def split_scenarios(scenarios, number_of_parts):
+    """
+    Divide scenarios over parallel environments, round robin so every part gets easy and hard ones.
+    When there are fewer scenarios than parts, scenarios are used by more than one part.
+    :return: list of number_of_parts lists of scenarios, none of them empty
+    """
+    if len(scenarios) == 0:
+        raise ValueError("no scenarios to split")
+    parts = [[] for _ in range(number_of_parts)]
+    for i in range(max(len(scenarios), number_of_parts)):
+        parts[i % number_of_parts].append(scenarios[i % len(scenarios)])
+    return parts
+
+
 scenarios_no_obstacles = [
     Scenario([],
              Pose(-25, 35, 10), Pose(25, 35, 10)),
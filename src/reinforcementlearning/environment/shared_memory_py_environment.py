@@ -0,0 +1,197 @@
+"""
+A batched environment that runs every environment in its own process, like ParallelPyEnvironment, but the actions
+and time steps are exchanged through shared memory. The pipe of a worker only carries a short command and its
+reply, the worker writes its time step into its row of the shared arrays and the trainer reads the whole batch
+from there, so no numpy arrays are pickled per step.
+"""
+
+import multiprocessing
+import traceback
+from multiprocessing import shared_memory
+
+import numpy as np
+import tensorflow as tf
+from tf_agents.environments import py_environment
+
+_ATTACH = 'attach'
+_RESET = 'reset'
+_STEP = 'step'
+_CLOSE = 'close'
+
+_RESULT = 'result'
+_EXCEPTION = 'exception'
+
+
+class SharedArrays:
+    """One numpy array per spec with a leading batch dimension, each in its own block of shared memory"""
+
+    def __init__(self, specs, batch_size, names=None):
+        """
+        :param specs: flat list of array specs
+        :param names: names of existing blocks to attach to, new blocks are created when None
+        """
+        self._blocks = []
+        self.arrays = []
+        for i, spec in enumerate(specs):
+            shape = (batch_size,) + tuple(spec.shape)
+            if names is None:
+                size = max(int(np.prod(shape)) * np.dtype(spec.dtype).itemsize, 1)
+                block = shared_memory.SharedMemory(create=True, size=size)
+            else:
+                block = shared_memory.SharedMemory(name=names[i])
+            self._blocks.append(block)
+            self.arrays.append(np.ndarray(shape, dtype=spec.dtype, buffer=block.buf))
+
+    @property
+    def names(self):
+        return [block.name for block in self._blocks]
+
+    def close(self, unlink=False):
+        """:param unlink: free the memory, only the process that created the blocks should do this"""
+        self.arrays = []
+        for block in self._blocks:
+            block.close()
+            if unlink:
+                block.unlink()
+        self._blocks = []
+
+
+def _run_worker(connection, env_constructor, index):
+    time_steps = None
+    actions = None
+    env = None
+    try:
+        env = env_constructor()
+        connection.send((_RESULT, (env.time_step_spec(), env.action_spec())))
+        action_spec = env.action_spec()
+        while True:
+            command, payload = connection.recv()
+            if command == _ATTACH:
+                batch_size, time_step_names, action_names = payload
+                time_steps = SharedArrays(tf.nest.flatten(env.time_step_spec()), batch_size, time_step_names)
+                actions = SharedArrays(tf.nest.flatten(action_spec), batch_size, action_names)
+            elif command == _RESET or command == _STEP:
+                if command == _RESET:
+                    time_step = env.reset()
+                else:
+                    action = [array[index].copy() for array in actions.arrays]
+                    time_step = env.step(tf.nest.pack_sequence_as(action_spec, action))
+                for array, value in zip(time_steps.arrays, tf.nest.flatten(time_step)):
+                    array[index] = value
+            elif command == _CLOSE:
+                break
+            connection.send((_RESULT, None))
+    except (KeyboardInterrupt, EOFError):
+        pass
+    except Exception:
+        connection.send((_EXCEPTION, traceback.format_exc()))
+    finally:
+        for arrays in (time_steps, actions):
+            if arrays is not None:
+                arrays.close()
+        if env is not None:
+            env.close()
+        connection.close()
+
+
+class SharedMemoryPyEnvironment(py_environment.PyEnvironment):
+    """
+    Steps the environments in parallel processes, the i'th environment of the batch is created by
+    env_constructors[i] in worker i. The environments reset themselves when they are done, like RobotEnv does.
+    """
+
+    def __init__(self, env_constructors, start_method='spawn'):
+        """
+        :param env_constructors: list of picklable functions that each create an environment,
+                                 e.g. functools.partial(RobotEnvWithObstacles, scenarios=...)
+        :param start_method: of the worker processes, spawn does not copy the state of tensorflow and pybullet
+        """
+        super().__init__()
+        self._batch_size = len(env_constructors)
+        self._connections = []
+        self._processes = []
+        self._time_steps = None
+        self._actions = None
+        context = multiprocessing.get_context(start_method)
+        try:
+            for index, env_constructor in enumerate(env_constructors):
+                parent_connection, child_connection = context.Pipe()
+                process = context.Process(target=_run_worker, args=(child_connection, env_constructor, index),
+                                          name='environment-{}'.format(index), daemon=True)
+                process.start()
+                child_connection.close()
+                self._connections.append(parent_connection)
+                self._processes.append(process)
+
+            specs = [self._receive(connection) for connection in self._connections]
+            self._time_step_spec, self._action_spec = specs[0]
+            self._time_steps = SharedArrays(tf.nest.flatten(self._time_step_spec), self._batch_size)
+            self._actions = SharedArrays(tf.nest.flatten(self._action_spec), self._batch_size)
+            self._send_to_all(_ATTACH, (self._batch_size, self._time_steps.names, self._actions.names))
+        except Exception:
+            self.close()
+            raise
+
+    @property
+    def batched(self):
+        return True
+
+    @property
+    def batch_size(self):
+        return self._batch_size
+
+    def observation_spec(self):
+        return self._time_step_spec.observation
+
+    def action_spec(self):
+        return self._action_spec
+
+    def time_step_spec(self):
+        return self._time_step_spec
+
+    def _reset(self):
+        self._send_to_all(_RESET)
+        return self._read_time_step()
+
+    def _step(self, action):
+        for array, value in zip(self._actions.arrays, tf.nest.flatten(action)):
+            array[:] = value
+        self._send_to_all(_STEP)
+        return self._read_time_step()
+
+    def _read_time_step(self):
+        # copies, the workers overwrite the shared arrays in the next step
+        return tf.nest.pack_sequence_as(self._time_step_spec, [array.copy() for array in self._time_steps.arrays])
+
+    def _send_to_all(self, command, payload=None):
+        for connection in self._connections:
+            connection.send((command, payload))
+        for connection in self._connections:
+            self._receive(connection)
+
+    @staticmethod
+    def _receive(connection):
+        message, payload = connection.recv()
+        if message == _EXCEPTION:
+            raise RuntimeError("environment worker failed:\n{}".format(payload))
+        return payload
+
+    def close(self):
+        for connection in self._connections:
+            try:
+                connection.send((_CLOSE, None))
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self._processes:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+        for connection in self._connections:
+            connection.close()
+        self._connections = []
+        self._processes = []
+        for arrays in (self._time_steps, self._actions):
+            if arrays is not None:
+                arrays.close(unlink=True)
+        self._time_steps = None
+        self._actions = None
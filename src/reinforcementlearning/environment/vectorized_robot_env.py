@@ -0,0 +1,270 @@
+import random
+
+import numpy as np
+from tf_agents.environments import py_environment
+from tf_agents.specs import array_spec
+from tf_agents.trajectories import time_step as ts
+
+from src import global_constants
+from src.kinematics.collision import get_box_array, get_batch_clearances
+from src.kinematics.kinematics import batch_inverse_kinematics
+from src.kinematics.kinematics_utils import calculate_euler_matrices_from_angles
+from src.reinforcementlearning.environment.occupancy_grid_util import create_occupancy_grid_from_obstacles
+from src.reinforcementlearning.environment.robot_env_utils import get_target_points, get_control_point_positions, \
+    get_repulsive_forces_batch
+from src.reinforcementlearning.environment.scenario import scenarios_no_obstacles
+
+# radius and weight of control point 1, the wrist and the tip of the gripper, like generate_control_points,
+# pybullet measures the distance from the surface of their spheres in the urdf, so those radii are added
+control_point_radii = np.array([6 + 1, 6 + 1, 4 + 0.5], dtype=np.float64)
+control_point_weights = np.array([1, 2, 1], dtype=np.float64)
+
+
+class VectorizedRobotEnv(py_environment.PyEnvironment):
+    """
+    batch_size copies of RobotEnv (with pose control) in arrays, without a physics simulation.
+    RobotEnv teleports the joints to the inverse kinematics of the new pose anyway, here the control points follow
+    from forward kinematics, the repulsive forces from the analytic distances between the control points and the
+    box obstacles and the floor, and collisions from the capsule model of collision.py.
+    Environments that are done are reset in the next step, that step returns their first time step,
+    the way tf_agents expects from a batched environment.
+    With use_occupancy_grid the observations are those of RobotEnvWithObstacles, with the grid of the obstacles.
+    """
+
+    def __init__(self, batch_size=32, raw_obs=False, scenarios=None, is_eval=False, robot_config=None,
+                 use_occupancy_grid=False):
+        super().__init__()
+        self._batch_size = batch_size
+        self._raw_obs = raw_obs
+        self._is_eval = is_eval
+        self._robot_config = global_constants.simulated_robot_config if robot_config is None else robot_config
+        self._action_spec = array_spec.BoundedArraySpec(
+            shape=(5,), dtype=np.float32, minimum=-1, maximum=1, name='action')
+        self._use_occupancy_grid = use_occupancy_grid
+        if use_occupancy_grid:
+            self._observation_spec = {
+                'observation': array_spec.BoundedArraySpec(shape=(17,), dtype=np.float32, minimum=-2, maximum=2),
+                'grid': array_spec.BoundedArraySpec((10, 10, 1), np.float32, minimum=0, maximum=1)
+            }
+        else:
+            self._observation_spec = array_spec.BoundedArraySpec(
+                shape=(17,), dtype=np.float32, minimum=-2, maximum=2, name='observation')
+        self._grid_len_x = 40
+        self._grid_len_y = 40
+        self._grid_size = 4
+
+        scenarios = scenarios_no_obstacles if scenarios is None else scenarios
+        self._non_completed_scenarios = [scenario.copy() for scenario in scenarios]
+        self._completed_scenarios = []
+        self._eval_scenario_id = 0
+        max_obstacles = max([len(scenario.obstacles) for scenario in scenarios] + [1])
+
+        self._xyz_update_step_size = 3
+        self._alpha_beta_gamma_update_step_size = 0.1
+        self._max_steps_to_take_before_failure = 100
+        self._target_reached_distance = 25
+        # where the sphere of control point 1 is in the urdf, measured from frame 3 towards the wrist
+        self._control_point_1_position = 15.08
+        self._attractive_cutoff_distance = 10
+        self._repulsive_cutoff_distance = 8
+        self._clip_force = 6
+
+        # x, y, z, alpha and gamma of every environment
+        self._poses = np.zeros((batch_size, 5), dtype=np.float64)
+        self._flips = np.zeros(batch_size, dtype=bool)
+        self._angles = np.zeros((batch_size, 7), dtype=np.float64)
+        # the targets of the wrist and the tip of the gripper, fixed for an episode
+        self._target_points = np.zeros((batch_size, 2, 3), dtype=np.float64)
+        self._boxes = np.zeros((batch_size, max_obstacles, 7), dtype=np.float64)
+        self._box_counts = np.zeros(batch_size, dtype=np.int64)
+        self._closest_distances = np.zeros(batch_size, dtype=np.float64)
+        self._steps_taken = np.zeros(batch_size, dtype=np.int64)
+        self._done = np.ones(batch_size, dtype=bool)
+        self._scenarios = [None] * batch_size
+        self._doing_already_completed_scenario = np.zeros(batch_size, dtype=bool)
+        self._grids = np.zeros((batch_size, 10, 10, 1), dtype=np.float32)
+        # the scenarios are played many times, their grids are only made once
+        self._scenario_grids = {}
+
+    @property
+    def batched(self):
+        return True
+
+    @property
+    def batch_size(self):
+        return self._batch_size
+
+    @property
+    def current_angles(self):
+        return self._angles
+
+    def set_target_reached_distance(self, val):
+        self._target_reached_distance = val
+
+    def set_step_size(self, xyz, abg, steps):
+        self._xyz_update_step_size = xyz
+        self._alpha_beta_gamma_update_step_size = abg
+        self._max_steps_to_take_before_failure = steps
+
+    def action_spec(self):
+        return self._action_spec
+
+    def observation_spec(self):
+        return self._observation_spec
+
+    def render(self, mode='rgb_array'):
+        pass
+
+    def get_info(self):
+        return None
+
+    def _pick_scenario(self):
+        """:return: a scenario and whether it was already completed, see RobotEnv._pick_scenario"""
+        if self._is_eval:
+            scenario = self._non_completed_scenarios[self._eval_scenario_id % len(self._non_completed_scenarios)]
+            self._eval_scenario_id += 1
+            return scenario, False
+
+        if len(self._completed_scenarios) == 0:
+            return random.choice(self._non_completed_scenarios), False
+        if len(self._non_completed_scenarios) == 0:
+            return random.choice(self._completed_scenarios), True
+        # pick unsolved scenarios 80% of the time, only train on the completed scenarios in 20% of the time
+        if random.random() < 0.8:
+            return random.choice(self._non_completed_scenarios), False
+        return random.choice(self._completed_scenarios), True
+
+    def _reset_environments(self, indices):
+        for i in indices:
+            scenario, already_completed = self._pick_scenario()
+            self._scenarios[i] = scenario
+            self._doing_already_completed_scenario[i] = already_completed
+            start_pose = scenario.start_pose
+            self._poses[i] = start_pose.x, start_pose.y, start_pose.z, start_pose.alpha, start_pose.gamma
+            self._flips[i] = start_pose.flip
+            _, target_point_2, target_point_3 = get_target_points(scenario.target_pose, self._robot_config.d6)
+            self._target_points[i, 0] = target_point_2
+            self._target_points[i, 1] = target_point_3
+            self._box_counts[i] = len(scenario.obstacles)
+            self._boxes[i, :len(scenario.obstacles)] = get_box_array(scenario.obstacles)
+            if self._use_occupancy_grid:
+                self._grids[i, :, :, 0] = self._get_grid(scenario)
+
+        self._angles[indices] = self._get_angles(self._poses[indices], self._flips[indices])
+        self._steps_taken[indices] = 0
+        self._done[indices] = False
+
+    def _get_grid(self, scenario):
+        grid = self._scenario_grids.get(id(scenario))
+        if grid is None:
+            grid = create_occupancy_grid_from_obstacles(scenario.obstacles, grid_len_x=self._grid_len_x,
+                                                        grid_len_y=self._grid_len_y, grid_size=self._grid_size)
+            self._scenario_grids[id(scenario)] = grid
+        return grid
+
+    def _get_angles(self, poses, flips):
+        orientations = calculate_euler_matrices_from_angles(poses[:, 3], np.zeros(len(poses)), poses[:, 4])
+        return batch_inverse_kinematics(poses[:, :3], orientations, flips, self._robot_config)
+
+    def _reset(self):
+        self._reset_environments(np.arange(self._batch_size))
+        observations, self._closest_distances = self._get_observations()
+        return ts.restart(observations, batch_size=self._batch_size)
+
+    def _update_poses_and_clip(self, actions, moving):
+        xyz_step = self._xyz_update_step_size
+        rot_step = self._alpha_beta_gamma_update_step_size
+        poses = self._poses[moving]
+        poses[:, :3] += xyz_step * actions[moving, :3]
+        poses[:, 3:] += rot_step * actions[moving, 3:]
+        poses[:, 0] = np.clip(poses[:, 0], -35, 35)
+        poses[:, 1] = np.clip(poses[:, 1], 20, 50)
+        poses[:, 2] = np.clip(poses[:, 2], 9, 50)
+        poses[:, 3:] = np.clip(poses[:, 3:], -0.45 * np.pi, 0.45 * np.pi)
+
+        angles = self._get_angles(poses, self._flips[moving])
+        # a pose without an inverse kinematics solution is not taken, like a robot that can't get there
+        reachable = np.all(np.isfinite(angles), axis=1)
+        indices = np.flatnonzero(moving)[reachable]
+        self._poses[indices] = poses[reachable]
+        self._angles[indices] = angles[reachable]
+
+    def _step(self, action):
+        actions = np.asarray(action, dtype=np.float64).reshape(self._batch_size, 5)
+        restarting = self._done.copy()
+        moving = ~restarting
+
+        if np.any(moving):
+            self._update_poses_and_clip(actions, moving)
+        if np.any(restarting):
+            self._reset_environments(np.flatnonzero(restarting))
+
+        observations, total_distances = self._get_observations()
+        clearances = get_batch_clearances(self._angles, self._robot_config, self._boxes, self._box_counts)
+        collisions = (clearances[:, 1] < 0) | (clearances[:, 2] < 0)
+
+        closed_distances = np.maximum(self._closest_distances - total_distances, 0)
+        self._closest_distances = np.minimum(self._closest_distances, total_distances)
+        self._closest_distances[restarting] = total_distances[restarting]
+        rewards = closed_distances
+
+        timed_out = self._steps_taken > self._max_steps_to_take_before_failure
+        collided = ~timed_out & collisions
+        reached = ~timed_out & ~collided & (total_distances < self._target_reached_distance)
+        max_speed_bonus = 50
+        speed_bonuses = (-max_speed_bonus / self._max_steps_to_take_before_failure) * self._steps_taken \
+            + max_speed_bonus
+        rewards = np.where(timed_out, 0.0, rewards)
+        rewards = np.where(collided, -50.0, rewards)
+        rewards = np.where(reached, 50 + speed_bonuses, rewards)
+
+        last = moving & (timed_out | collided | reached)
+        for i in np.flatnonzero(moving & reached):
+            self._switch_scenario_to_done(i)
+        self._steps_taken[moving] += 1
+        self._done = last
+
+        step_types = np.where(last, ts.StepType.LAST, ts.StepType.MID).astype(np.int32)
+        step_types[restarting] = ts.StepType.FIRST
+        rewards[restarting] = 0.0
+        discounts = np.where(last, 0.0, 1.0)
+        return ts.TimeStep(step_types, rewards.astype(np.float32), discounts.astype(np.float32), observations)
+
+    def _switch_scenario_to_done(self, i):
+        scenario = self._scenarios[i]
+        if self._is_eval or self._doing_already_completed_scenario[i] or scenario not in self._non_completed_scenarios:
+            return
+        self._non_completed_scenarios.remove(scenario)
+        self._completed_scenarios.append(scenario)
+
+    def _get_observations(self):
+        control_points = get_control_point_positions(self._angles, self._robot_config,
+                                                     self._control_point_1_position)
+
+        # control point 1 is not used for the attractive forces, see get_attractive_force_world
+        vectors = control_points[:, 1:] - self._target_points
+        distances = np.sqrt(np.sum(vectors * vectors, axis=2))
+        cutoff = self._attractive_cutoff_distance
+        scale = np.where(distances > cutoff, cutoff / np.maximum(distances, 1e-12), 1.0)
+        attractive_forces = -vectors[:, 1] * scale[:, 1, np.newaxis]
+        total_distances = np.sum(distances, axis=1)
+
+        repulsive_forces = get_repulsive_forces_batch(control_points, control_point_radii, control_point_weights,
+                                                      self._boxes, self._box_counts,
+                                                      repulsive_cutoff_distance=self._repulsive_cutoff_distance,
+                                                      clip_force=self._clip_force)
+
+        # the attractive force goes from 1 down to 0 within the cutoff distance of the target
+        forces = np.concatenate((attractive_forces[:, np.newaxis] / cutoff, repulsive_forces), axis=1)
+        if not self._raw_obs:
+            # only normalize the vectors that are too big
+            norms = np.sqrt(np.sum(forces * forces, axis=2, keepdims=True))
+            forces = np.where(norms < 1, forces, forces / np.maximum(norms, 1e-12))
+
+        observations = np.empty((self._batch_size, 17), dtype=np.float32)
+        observations[:, :12] = forces.reshape(self._batch_size, 12)
+        observations[:, 12:15] = self._poses[:, :3] / 40
+        observations[:, 15:] = self._poses[:, 3:] / np.pi
+        if self._use_occupancy_grid:
+            return {'observation': observations, 'grid': self._grids.copy()}, total_distances
+        return observations, total_distances
@@ -1,7 +1,6 @@
 import functools
 import inspect
 import os
-from multiprocessing import Pool
 
 import numpy as np
 import tensorflow as tf
@@ -12,55 +11,52 @@ from tf_agents.trajectories import trajectory, policy_step
 from tf_agents.utils import common
 
 from src import global_constants
-from src.kinematics.kinematics import jacobian_transpose_on_f
+from src.kinematics.kinematics import batch_jacobian_transpose_on_f
 from src.reinforcementlearning.environment import robot_env_utils
 from src.reinforcementlearning.softActorCritic.IntervalManager import IntervalManager
 from src.reinforcementlearning.softActorCritic.sac_utils import create_agent, create_envs
 from src.utils.decorators import timer
 
 
-def get_forces(raw_observation):
-    if isinstance(raw_observation, tuple):
-        observation = raw_observation[0]
-    else:
-        observation = raw_observation
-
-    c1_attr = np.zeros(3)
-    c2_attr = np.zeros(3)
-    c3_attr = observation[0:3]
+def get_forces(observations):
+    """Turn an (N, 17) batch of observations into an (N, 3, 3) batch of workspace forces on the control points"""
+    forces = np.zeros((observations.shape[0], 3, 3), dtype=np.float64)
 
-    c1_rep = 3 * observation[3:6]
-    c2_rep = 3 * observation[6:9]
-    c3_rep = 3 * observation[9:12]
+    # c1 and c2 have no attractive force
+    forces[:, 2] = observations[:, 0:3]
 
-    attractive_forces = np.stack((c1_attr, c2_attr, c3_attr))
-    repulsive_forces = np.stack((c1_rep, c2_rep, c3_rep))
+    forces[:, 0] += 3 * observations[:, 3:6]
+    forces[:, 1] += 3 * observations[:, 6:9]
+    forces[:, 2] += 3 * observations[:, 9:12]
 
-    return attractive_forces + repulsive_forces
+    return forces
 
 
-def handle_observation(raw_observation):
-    forces = get_forces(raw_observation)
+def handle_observations(observations):
+    forces = get_forces(observations)
 
-    current_angles = robot_env_utils.get_de_normalized_current_angles(raw_observation[12:17])
+    current_angles = np.zeros((observations.shape[0], 7), dtype=np.float64)
+    current_angles[:, 1:6] = np.column_stack(
+        robot_env_utils.get_de_normalized_current_angles(observations[:, 12:17].T))
 
-    joint_forces = jacobian_transpose_on_f(forces, np.append([0], current_angles),
-                                           global_constants.simulated_robot_config, 11.2)
+    joint_forces = batch_jacobian_transpose_on_f(forces, current_angles,
+                                                 global_constants.simulated_robot_config, 11.2)
 
-    absolute_force = np.linalg.norm(joint_forces)
+    absolute_force = np.linalg.norm(joint_forces, axis=1, keepdims=True)
 
-    action_ = (joint_forces / absolute_force)
+    actions = joint_forces / absolute_force
 
-    return action_[1:6]
+    return actions[:, 1:6]
 
 
-def gradient_descent_action(raw_observations, pool, robot_env_no_obstacles):
+def gradient_descent_action(raw_observations, robot_env_no_obstacles):
     if robot_env_no_obstacles:
         observations = raw_observations
     else:
         observations = raw_observations[0]
 
-    total_action = np.array(pool.map(handle_observation, observations))
+    observations = np.asarray(observations, dtype=np.float64)
+    total_action = handle_observations(observations)
     tf_action = tf.constant(total_action, shape=(observations.shape[0], 5), dtype=tf.float32)
     return policy_step.PolicyStep(tf_action, (), ())
 
@@ -74,20 +70,19 @@ def fill_replay_buffer_with_gradient_descent(tf_env, total_collect_steps, replay
 
     replay_buffer_interval_manager = IntervalManager(1000)
 
-    with Pool(tf_env.batch_size) as pool:
-        while replay_buffer.num_frames().numpy() < total_collect_steps:
-            action_step = gradient_descent_action(current_time_step.observation, pool, robot_env_no_obstacles)
+    while replay_buffer.num_frames().numpy() < total_collect_steps:
+        action_step = gradient_descent_action(current_time_step.observation, robot_env_no_obstacles)
 
-            next_time_step = tf_env.step(action_step.action)
+        next_time_step = tf_env.step(action_step.action)
 
-            traj = trajectory.from_transition(current_time_step, action_step, next_time_step)
-            replay_buffer.add_batch(traj)
+        traj = trajectory.from_transition(current_time_step, action_step, next_time_step)
+        replay_buffer.add_batch(traj)
 
-            current_time_step = next_time_step
+        current_time_step = next_time_step
 
-            if replay_buffer_interval_manager.should_trigger(replay_buffer.num_frames().numpy()):
-                rb_checkpointer.save(replay_buffer.num_frames().numpy())
-                print("saved")
+        if replay_buffer_interval_manager.should_trigger(replay_buffer.num_frames().numpy()):
+            rb_checkpointer.save(replay_buffer.num_frames().numpy())
+            print("saved")
 
     return traj_array
 
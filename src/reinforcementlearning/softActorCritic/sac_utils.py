@@ -2,18 +2,22 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import functools
 import logging
 import os
 import time
 
 import tensorflow as tf
-from tf_agents.environments import suite_gym, parallel_py_environment, tf_py_environment
+from tf_agents.environments import suite_gym, tf_py_environment
 from tf_agents.eval import metric_utils
 from tf_agents.networks import value_network
 from tf_agents.utils import common
 
 from src.reinforcementlearning.environment.robot_env import RobotEnv
 from src.reinforcementlearning.environment.robot_env_with_obstacles import RobotEnvWithObstacles
+from src.reinforcementlearning.environment.scenario import split_scenarios
+from src.reinforcementlearning.environment.shared_memory_py_environment import SharedMemoryPyEnvironment
+from src.reinforcementlearning.environment.vectorized_robot_env import VectorizedRobotEnv
 from src.reinforcementlearning.softActorCritic.custom_objects.actor_distribution_network_trainable import \
     ActorDistributionNetworkTrainable
 from src.reinforcementlearning.softActorCritic.custom_objects.custom_sac_agent import CustomSacAgent
@@ -152,7 +156,25 @@ def get_cirit_input_spec_and_preprocessing_layer(robot_env_no_obstacles,
         return preprocessing_layer
 
 
-def create_envs(robot_env_no_obstacles, num_parallel_environments, scenarios=None, train_scenarios=None):
+def create_envs(robot_env_no_obstacles, num_parallel_environments, scenarios=None, train_scenarios=None,
+                vectorized_batch_size=None):
+    """
+    :param num_parallel_environments: number of worker processes that each run an environment, the scenarios are
+                                      divided over them
+    :param vectorized_batch_size: when given the training environment is a VectorizedRobotEnv of this many
+                                  environments without a simulation, evaluation is still done in the simulation
+    """
+    if vectorized_batch_size is not None:
+        if robot_env_no_obstacles:
+            tf_env = tf_py_environment.TFPyEnvironment(VectorizedRobotEnv(batch_size=vectorized_batch_size))
+            eval_tf_env = tf_py_environment.TFPyEnvironment(RobotEnv(is_eval=True))
+        else:
+            tf_env = tf_py_environment.TFPyEnvironment(
+                VectorizedRobotEnv(batch_size=vectorized_batch_size, scenarios=scenarios + train_scenarios,
+                                   use_occupancy_grid=True))
+            eval_tf_env = tf_py_environment.TFPyEnvironment(RobotEnvWithObstacles(scenarios=scenarios, is_eval=True))
+        return tf_env, eval_tf_env
+
     if not is_linux() or num_parallel_environments == 1:  # Windows does not handle multiprocessing well
         if robot_env_no_obstacles:
             tf_env = tf_py_environment.TFPyEnvironment(RobotEnv())
@@ -164,17 +186,14 @@ def create_envs(robot_env_no_obstacles, num_parallel_environments, scenarios=Non
         return tf_env, eval_tf_env
 
     if robot_env_no_obstacles:
-        tf_env = tf_py_environment.TFPyEnvironment(
-            parallel_py_environment.ParallelPyEnvironment(
-                [lambda: RobotEnv()] * num_parallel_environments))
-
+        env_constructors = [RobotEnv] * num_parallel_environments
         eval_tf_env = tf_py_environment.TFPyEnvironment(RobotEnv(is_eval=True))
     else:
-        tf_env = tf_py_environment.TFPyEnvironment(
-            parallel_py_environment.ParallelPyEnvironment(
-                [lambda: RobotEnvWithObstacles()] * num_parallel_environments))
-
-        eval_tf_env = tf_py_environment.TFPyEnvironment(RobotEnvWithObstacles(is_eval=True))
+        env_constructors = [functools.partial(RobotEnvWithObstacles, scenarios=worker_scenarios)
+                            for worker_scenarios in split_scenarios(scenarios + train_scenarios,
+                                                                    num_parallel_environments)]
+        eval_tf_env = tf_py_environment.TFPyEnvironment(RobotEnvWithObstacles(scenarios=scenarios, is_eval=True))
+    tf_env = tf_py_environment.TFPyEnvironment(SharedMemoryPyEnvironment(env_constructors))
 
     return tf_env, eval_tf_env
 
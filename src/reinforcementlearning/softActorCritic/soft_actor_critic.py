@@ -36,6 +36,10 @@ flags.DEFINE_string('behavioral_cloning_checkpoint_dir', None,
 
 flags.DEFINE_string('difficulty', None,
                     'Difficulty to start at')
+flags.DEFINE_integer('vectorized_batch_size', None,
+                     'Collect with this many environments without a simulation, see VectorizedRobotEnv')
+flags.DEFINE_integer('num_parallel_environments', 1,
+                     'Worker processes that collect in the simulation, 0 uses one per core')
 
 
 flags.DEFINE_float('reward_scaling', None, 'reward scaling')
@@ -76,7 +80,8 @@ def train_eval(checkpoint_dir,
                num_parallel_environments=NUM_PARALLEL,
                reward_scaling=0.1,
                entropy=None,
-               difficulty=None):
+               difficulty=None,
+               vectorized_batch_size=None):
     current_dir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
 
     root_dir = os.path.expanduser(current_dir + '/checkpoints/' + checkpoint_dir)
@@ -100,7 +105,10 @@ def train_eval(checkpoint_dir,
             lambda: tf.math.equal(global_step % summary_interval, 0)):
 
         tf_env, eval_tf_env = create_envs(robot_env_no_obstacles, num_parallel_environments,
-                                          scenarios=sensible_scenarios, train_scenarios=train_scenarios)
+                                          scenarios=sensible_scenarios, train_scenarios=train_scenarios,
+                                          vectorized_batch_size=vectorized_batch_size)
+        # every environment of the batch takes a step in every collect
+        collect_steps_per_iteration = max(collect_steps_per_iteration, tf_env.batch_size)
 
         tf_agent = create_agent(tf_env, global_step, robot_env_no_obstacles,
                                 reward_scale_factor=reward_scaling, entropy=entropy)
@@ -293,8 +301,13 @@ def main(_):
     if reward_scaling is None:
         reward_scaling = 1.0
 
+    num_parallel_environments = FLAGS.num_parallel_environments
+    if num_parallel_environments == 0:
+        num_parallel_environments = mp.cpu_count()
+
     train_eval(FLAGS.root_dir, FLAGS.behavioral_cloning_checkpoint_dir, reward_scaling=reward_scaling,
-               entropy=FLAGS.entropy_target, difficulty=difficulty)
+               entropy=FLAGS.entropy_target, difficulty=difficulty, num_parallel_environments=num_parallel_environments,
+               vectorized_batch_size=FLAGS.vectorized_batch_size)
 
 
 # PYTHONUNBUFFERED=1;LD_LIBRARY_PATH=/usr/local/cuda-10.0/lib64
@@ -1,4 +1,3 @@
-from src.kinematics.kinematics import inverse_kinematics
 from src.robot_controllers.abstract_robot_controller import AbstractRobotController
 
 
@@ -37,7 +36,7 @@ class CombinedRobot(AbstractRobotController):
         return self.dynamixel_robot.get_current_angles()
 
     def pose_to_angles(self, pose):
-        return inverse_kinematics(pose, self.dynamixel_robot.robot_config)
+        return self.dynamixel_robot.pose_to_angles(pose)
 
     def set_gripper(self, new_gripper_state):
         self.dynamixel_robot.set_gripper(new_gripper_state)
@@ -18,13 +18,15 @@ from src.utils.robot_controller_utils import get_recommended_wait_time, servo_2_
 # Facade for the robot as a whole, abstracting away the servo handling
 class DynamixelRobotController(AbstractRobotController):
 
-    def __init__(self, port, robot_config, servos=servo_configs, perform_safety_checks=True):
+    def __init__(self, port, robot_config, servos=servo_configs, perform_safety_checks=True, ik_cache=None):
         """
         :param port: a string representing the usb port the robot is connected to
         :param robot_config: a RobotConfig object
         :param servos: (dict of str:json) servo name and servo config
+        :param ik_cache: optional InverseKinematicsCache used to solve the inverse kinematics
         """
         self.robot_config = robot_config
+        self.ik_cache = ik_cache
         self.perform_safety_checks = perform_safety_checks
 
         self.servo1 = servos[0]
@@ -92,13 +94,13 @@ class DynamixelRobotController(AbstractRobotController):
         self.gripper_servo_handler.set_torque(enable=False)
 
     def move_to_pose(self, pose):
-        angles = inverse_kinematics(pose, self.robot_config)
+        angles = self.pose_to_angles(pose)
         recommended_time = get_recommended_wait_time(self._current_angles, angles)
         time_taken = self.move_servos(angles)
         return recommended_time, time_taken
 
     def move_to_pose_and_give_new_angles(self, pose):
-        angles = inverse_kinematics(pose, self.robot_config)
+        angles = self.pose_to_angles(pose)
         self.move_servos(angles)
         return angles
 
@@ -226,6 +228,8 @@ class DynamixelRobotController(AbstractRobotController):
         return positions
 
     def pose_to_angles(self, pose):
+        if self.ik_cache is not None:
+            return self.ik_cache.inverse_kinematics(pose, self.robot_config)
         return inverse_kinematics(pose, self.robot_config)
 
     @synchronized_with_lock("lock")
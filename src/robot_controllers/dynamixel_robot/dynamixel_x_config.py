@@ -13,6 +13,11 @@ ADDR_D                  = 80
 ADDR_GOAL_CURRENT       = 102
 ADDR_OPERATING_MODE     = 11
 
+# Units of the control table values
+PROFILE_VELOCITY_UNIT   = 0.229            # rev/min
+PROFILE_ACCELERATION_UNIT = 214.577        # rev/min^2
+POSITIONS_PER_REVOLUTION = 4096
+
 # Data Byte Length
 LEN_LED_RED             = 1
 LEN_PROFILE_ACCELERATION= 4
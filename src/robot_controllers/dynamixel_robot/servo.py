@@ -6,6 +6,8 @@ import logging
 import json
 from numpy import pi
 
+from src.robot_controllers.dynamixel_robot import dynamixel_x_config as cfg
+
 
 class ServoEncoder(json.JSONEncoder):
 
@@ -85,6 +87,22 @@ class Servo:
                     self.operating_mode, self.profile_velocity, self.profile_acceleration, self.constant_offset,
                     self.goal_current)
 
+    def get_max_joint_velocity(self):
+        """:return: the profile velocity as the speed of the joint in rad/s"""
+        motor_velocity = self.profile_velocity * cfg.PROFILE_VELOCITY_UNIT * 2 * pi / 60
+        return motor_velocity * self.get_gear_ratio()
+
+    def get_max_joint_acceleration(self):
+        """:return: the profile acceleration as the acceleration of the joint in rad/s^2"""
+        motor_acceleration = self.profile_acceleration * cfg.PROFILE_ACCELERATION_UNIT * 2 * pi / 3600
+        return motor_acceleration * self.get_gear_ratio()
+
+    def get_gear_ratio(self):
+        """:return: radians the joint turns for every radian of the motor, follows from the positions and angles"""
+        joint_angle_per_position = abs(self.max_angle - self.min_angle) / abs(self.max_position - self.min_position)
+        motor_angle_per_position = 2 * pi / cfg.POSITIONS_PER_REVOLUTION
+        return joint_angle_per_position / motor_angle_per_position
+
     # updates the target position of this servo
     def set_target_position_from_angle(self, angle, all_angles=None):
         if angle > self.max_angle:
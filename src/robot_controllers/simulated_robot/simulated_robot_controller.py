@@ -29,6 +29,28 @@ class ControlPoint:
         self._position = np.array(pos) * 100  # convert from meters to centimeters
 
 
+def read_control_point_positions(control_points, positions=None, compute_forward_kinematics=False):
+    """
+    The positions of all control points with a single call to the simulation, the position property of
+    ControlPoint asks the simulation for every point separately
+    :param control_points: control points that are all on the same body
+    :param positions: (len(control_points), 3) array to fill, a new one is made when None
+    :param compute_forward_kinematics: otherwise the positions are those of before the last step of the
+                                       simulation, not where the collision shapes are now
+    :return: positions, in centimeters
+    """
+    if positions is None:
+        positions = np.empty((len(control_points), 3), dtype=np.float64)
+    first = control_points[0]
+    link_states = p.getLinkStates(first.body_id, [control_point.point_id for control_point in control_points],
+                                  computeForwardKinematics=compute_forward_kinematics,
+                                  physicsClientId=first._physics_client)
+    for i, link_state in enumerate(link_states):
+        positions[i] = link_state[4]
+    positions *= 100  # convert from meters to centimeters
+    return positions
+
+
 def generate_control_points(body_id, physics_client):
     c1 = ControlPoint(8, 6, body_id, physics_client)   # in between frame 3 and the wrist
     c2 = ControlPoint(7, 6, body_id, physics_client, weight=2)  # wrist (frame 4)
@@ -38,8 +60,9 @@ def generate_control_points(body_id, physics_client):
 
 class SimulatedRobotController(AbstractRobotController):
 
-    def __init__(self, robot_config, physics_client, body_id):
+    def __init__(self, robot_config, physics_client, body_id, ik_cache=None):
         self.robot_config = robot_config
+        self.ik_cache = ik_cache
         self.body_id = body_id
         self.physics_client = physics_client
 
@@ -60,7 +83,7 @@ class SimulatedRobotController(AbstractRobotController):
         pass
 
     def reset_to_pose(self, pose):
-        angles = inverse_kinematics(pose, self.robot_config)
+        angles = self.pose_to_angles(pose)
         self.reset_servos(angles)
 
     def reset_to_angels(self, angles):
@@ -79,13 +102,13 @@ class SimulatedRobotController(AbstractRobotController):
             p.resetJointState(self.body_id, i-1, angles[i], physicsClientId=self.physics_client, targetVelocity=0)
 
     def move_to_pose(self, pose):
-        angles = inverse_kinematics(pose, self.robot_config)
+        angles = self.pose_to_angles(pose)
         self.move_servos(angles)
         recommended_time = 0
         return recommended_time, 0
 
     def move_to_pose_and_give_new_angles(self, pose):
-        angles = inverse_kinematics(pose, self.robot_config)
+        angles = self.pose_to_angles(pose)
         self.move_servos(angles)
         return angles
 
@@ -117,6 +140,8 @@ class SimulatedRobotController(AbstractRobotController):
         return angles
 
     def pose_to_angles(self, pose):
+        if self.ik_cache is not None:
+            return self.ik_cache.inverse_kinematics(pose, self.robot_config)
         return inverse_kinematics(pose, self.robot_config)
 
     def get_status(self):
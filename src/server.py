@@ -5,6 +5,7 @@ from flask import Flask, render_template, request, Response
 from src import global_objects, global_constants
 from src.global_constants import dynamixel_robot_arm_port
 from src.global_objects import get_robot
+from src.kinematics.jit_warmup import warmup_kernels
 from src.xbox_control.xbox_control_resource import xbox_api
 from src.camera_control.camera_control_resource import camera_api
 
@@ -83,6 +84,9 @@ def stop_camera():
 
 
 def start_server():
+    # compile the kinematics before any controller thread needs them, so the first move does not hitch
+    warmup_kernels()
+    global_constants.WorkSpaceLimits.reachability_grid = global_objects.get_reachability_grid()
     app.run(debug=False, host='0.0.0.0')
 
 
@@ -9,7 +9,7 @@ from src.robot_controllers.simulated_robot.simulated_robot_controller import Sim
 from numpy import pi
 
 
-def start_simulated_robot(use_gui=False, robot_config=global_constants.simulated_robot_config):
+def start_simulated_robot(use_gui=False, robot_config=global_constants.simulated_robot_config, ik_cache=None):
     current_dir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
 
     if use_gui:
@@ -31,4 +31,4 @@ def start_simulated_robot(use_gui=False, robot_config=global_constants.simulated
     robot = SimulatedRobotController(robot_config, physics_client, body_id)
     robot.reset_to_angels([0, pi/2, pi/2, 0, 0, 0, 0])
 
-    return SimulatedRobotController(robot_config, physics_client, body_id)
\ No newline at end of file
+    return SimulatedRobotController(robot_config, physics_client, body_id, ik_cache=ik_cache)
\ No newline at end of file
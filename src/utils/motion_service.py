@@ -0,0 +1,225 @@
+"""
+Moves are submitted to a MotionService instead of being executed on the thread of the caller. One worker thread
+owns the servos and plays the moves one after the other, submit returns a MotionHandle right away. The handle
+is a future: it can be waited for with result() or awaited from asyncio code, shows how far the move got and can
+cancel it. A cancelled move stops at the next setpoint, the servos come to a halt at the last angles that were
+sent. Submitting with preempt=True cancels the move that is playing and everything that was queued before it.
+
+The robot does not have to be at the start of a move, it first moves there in joint space. So a move that is
+submitted after another one was cancelled halfway still starts where it should.
+"""
+
+import asyncio
+import logging as log
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, CancelledError
+
+import numpy as np
+
+from src.utils.move_library import get_transition_path
+from src.utils.robot_controller_utils import get_servo_joint_limits
+from src.utils.trajectory_executor import TrajectoryExecutor
+from src.utils.trajectory_timing import get_time_optimal_trajectory
+
+
+class MotionHandle:
+    """A move that was submitted to a MotionService"""
+
+    def __init__(self, movement, reverse=False):
+        self.movement = movement
+        self.reverse = reverse
+        self.future = Future()
+        self._cancel_requested = threading.Event()
+        self._progress = 0.0
+
+    @property
+    def progress(self):
+        """Fraction of the setpoints of the move itself that were sent, from 0 to 1"""
+        return self._progress
+
+    def cancel(self):
+        """
+        Stop the move, a move that is still queued is never started
+        :return: False when the move already finished
+        """
+        if self.future.done():
+            return False
+        self._cancel_requested.set()
+        # only succeeds when the worker did not pick it up yet
+        self.future.cancel()
+        return True
+
+    def is_cancel_requested(self):
+        return self._cancel_requested.is_set()
+
+    def cancelled(self):
+        """:return: True when the move was cancelled before it could finish"""
+        if not self.future.done():
+            return False
+        return self.future.cancelled() or isinstance(self.future.exception(), CancelledError)
+
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout=None):
+        """
+        Wait for the move to finish
+        :return: the pose where the move stopped
+        :raises CancelledError: when the move was cancelled
+        :raises MovementException: when the move could not be executed
+        """
+        return self.future.result(timeout)
+
+    def add_done_callback(self, callback):
+        """:param callback: function(handle), called on the worker thread when the move is done"""
+        self.future.add_done_callback(lambda _: callback(self))
+
+    def __await__(self):
+        return asyncio.wrap_future(self.future).__await__()
+
+
+class MotionService:
+    """Plays submitted moves one after the other on a single worker thread"""
+
+    def __init__(self, servo_controller, rate=None, clock=time.monotonic, sleep=time.sleep):
+        """
+        :param servo_controller: the robot the moves are played on
+        :param rate, clock, sleep: see TrajectoryExecutor
+        """
+        self.servo_controller = servo_controller
+        self.rate = rate
+        self.clock = clock
+        self.sleep = sleep
+        self.condition = threading.Condition()
+        self.queue = deque()
+        self.current = None
+        self.closed = False
+        self.thread = None
+
+    def submit(self, movement, reverse=False, preempt=False):
+        """
+        Queue a move, it is compiled on the worker thread when it is needed
+        :param reverse: play the move backwards
+        :param preempt: cancel the move that is playing and the queued moves, this one goes first
+        :return: MotionHandle
+        """
+        handle = MotionHandle(movement, reverse)
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("the motion service is shut down")
+            if preempt:
+                self._cancel_all()
+            self.queue.append(handle)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='motion-service', daemon=True)
+                self.thread.start()
+            self.condition.notify()
+        return handle
+
+    def cancel_all(self):
+        """Cancel the move that is playing and all queued moves"""
+        with self.condition:
+            self._cancel_all()
+
+    def _cancel_all(self):
+        for handle in self.queue:
+            handle.cancel()
+        self.queue.clear()
+        if self.current is not None:
+            self.current.cancel()
+
+    def get_pending(self):
+        """:return: list of the handles of the move that is playing and the queued moves"""
+        with self.condition:
+            return ([self.current] if self.current is not None else []) + list(self.queue)
+
+    def is_idle(self):
+        with self.condition:
+            return self.current is None and len(self.queue) == 0
+
+    def shutdown(self, cancel=True, timeout=None):
+        """
+        Stop the worker thread, no moves can be submitted anymore
+        :param cancel: cancel the remaining moves, otherwise they are played first
+        """
+        with self.condition:
+            self.closed = True
+            if cancel:
+                self._cancel_all()
+            self.condition.notify()
+            thread = self.thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while len(self.queue) == 0 and not self.closed:
+                    self.condition.wait()
+                if len(self.queue) == 0:
+                    return
+                self.current = self.queue.popleft()
+            try:
+                self._execute(self.current)
+            finally:
+                with self.condition:
+                    self.current = None
+
+    def _execute(self, handle):
+        if not handle.future.set_running_or_notify_cancel():
+            return
+        try:
+            stop_pose = self._play(handle)
+        except Exception as e:
+            log.warning("motion service could not execute move: %s", e)
+            handle.future.set_exception(e)
+            return
+        if handle.is_cancel_requested():
+            handle.future.set_exception(CancelledError())
+        else:
+            handle.future.set_result(stop_pose)
+
+    def _play(self, handle):
+        compiled_trajectory = handle.movement.get_compiled_trajectory(self.servo_controller)
+        if handle.reverse:
+            angles, timestamps = compiled_trajectory.reversed_angles(), compiled_trajectory.reversed_timestamps()
+            stop_pose = handle.movement.poses[0]
+        else:
+            angles, timestamps = compiled_trajectory.angles, compiled_trajectory.timestamps
+            stop_pose = compiled_trajectory.stop_pose
+        if len(angles) == 0:
+            handle._progress = 1.0
+            return stop_pose
+
+        current_angles = np.asarray(self.servo_controller.get_current_angles(), dtype=np.float64)
+        if not np.allclose(current_angles[1:], angles[0][1:], atol=1e-3):
+            velocity_limits, acceleration_limits = get_servo_joint_limits()
+            transition_angles, transition_timestamps = get_time_optimal_trajectory(
+                get_transition_path(current_angles, angles[0]), velocity_limits, acceleration_limits)
+            self._follow(handle, transition_angles, transition_timestamps, track_progress=False)
+
+        self._follow(handle, angles, timestamps, track_progress=True)
+        return stop_pose
+
+    def _follow(self, handle, angles, timestamps, track_progress):
+        wait_times = np.diff(timestamps)
+        next_index = 0
+
+        def get_next_setpoint():
+            nonlocal next_index
+            if handle.is_cancel_requested() or next_index >= len(angles):
+                return None
+            setpoint = angles[next_index]
+            next_index += 1
+            if track_progress:
+                handle._progress = next_index / len(angles)
+            return setpoint
+
+        def get_wait_time(previous_angles, current_angles):
+            sent_index = next_index - 1
+            return wait_times[sent_index] if sent_index < len(wait_times) else 0.0
+
+        TrajectoryExecutor(self.servo_controller, self.rate, self.clock, self.sleep).run(get_next_setpoint,
+                                                                                       get_wait_time)
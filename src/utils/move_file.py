@@ -0,0 +1,174 @@
+"""
+File format for recorded moves.
+A library of moves is stored as a small json header and a few .npy files next to it:
+
+path.json             version, and per move its type, time, center, smoothing factor and where its rows are
+path.poses.npy        (poses, 18) every pose of every move, see POSE_COLUMNS
+path.angles.npy       (steps, 7) the compiled trajectories of all moves after each other
+path.timestamps.npy   (steps,) their timestamps
+
+The .npy files are memory mapped when loading, the compiled trajectories of a large library are only read from disk
+when a move is actually played. Only the movement classes in MOVEMENT_TYPES can be restored, unlike the jsonpickle
+files that were used before, which can reconstruct any class. load_moves refuses those, convert trusted ones offline,
+the original file is kept as recorded_moves.json.bak:
+
+python -m src.utils.move_file recorded_moves.json
+"""
+
+import json
+import os
+import sys
+
+import jsonpickle
+import numpy as np
+
+from src.global_constants import WorkSpaceLimits
+from src.kinematics.kinematics_utils import Pose
+from src.utils.movement import SplineMovement, PoseToPoseMovement, LinearMovement, CircularMovement, \
+    CompiledTrajectory
+
+FORMAT_VERSION = 1
+MOVEMENT_TYPES = {'spline': SplineMovement, 'pose_to_pose': PoseToPoseMovement, 'linear': LinearMovement,
+                  'circular': CircularMovement}
+# x, y, z, alpha, beta, gamma, time, flip, has euler matrix and the 9 entries of the euler matrix
+POSE_COLUMNS = 18
+
+
+def strip_extension(path):
+    return path[:-len('.json')] if path.endswith('.json') else path
+
+
+def pose_to_row(pose):
+    row = np.zeros(POSE_COLUMNS, dtype=np.float64)
+    row[:9] = (pose.x, pose.y, pose.z, pose.alpha, pose.beta, pose.gamma, pose.time, pose.flip,
+               pose.euler_matrix is not None)
+    if pose.euler_matrix is not None:
+        row[9:] = np.asarray(pose.euler_matrix, dtype=np.float64).ravel()
+    return row
+
+
+def row_to_pose(row):
+    euler_matrix = np.array(row[9:], dtype=np.float64).reshape(3, 3) if row[8] else None
+    return Pose(row[0], row[1], row[2], flip=bool(row[7]), alpha=row[3], beta=row[4], gamma=row[5], time=row[6],
+                euler_matrix=euler_matrix)
+
+
+def get_movement_type(move):
+    for name, movement_class in MOVEMENT_TYPES.items():
+        if type(move) is movement_class:
+            return name
+    raise ValueError("can't store a move of type {}".format(type(move).__name__))
+
+
+def get_smoothing_factor(move):
+    s = getattr(move, '_s', None)
+    return None if s is None else float(s)
+
+
+def save_moves(path, moves):
+    """
+    :param path: path without extension, a .json extension is ignored
+    :param moves: list of Movement, their compiled trajectories are stored as well
+    """
+    path = strip_extension(path)
+    pose_rows, angles, timestamps, headers = [], [], [], []
+    pose_count, step_count = 0, 0
+
+    for move in moves:
+        header = {'type': get_movement_type(move), 'time': move.time, 'center': move.center,
+                  's': get_smoothing_factor(move), 'uses_workspace_limits': move.workspace_limits is not None,
+                  'poses': [pose_count, pose_count + len(move.poses)], 'trajectory': None}
+        pose_rows.extend(pose_to_row(pose) for pose in move.poses)
+        pose_count += len(move.poses)
+
+        compiled_trajectory = move.__dict__.get('compiled_trajectory')
+        if compiled_trajectory is not None:
+            header['trajectory'] = {'steps': [step_count, step_count + len(compiled_trajectory)],
+                                    'stop_pose': pose_to_row(compiled_trajectory.stop_pose).tolist(),
+                                    'fingerprint': list(compiled_trajectory.fingerprint)}
+            angles.append(compiled_trajectory.angles)
+            timestamps.append(compiled_trajectory.timestamps)
+            step_count += len(compiled_trajectory)
+        headers.append(header)
+
+    np.save(path + '.poses.npy', np.array(pose_rows, dtype=np.float64).reshape(-1, POSE_COLUMNS))
+    np.save(path + '.angles.npy', np.concatenate(angles) if angles else np.zeros((0, 7), dtype=np.float64))
+    np.save(path + '.timestamps.npy', np.concatenate(timestamps) if timestamps else np.zeros(0, dtype=np.float64))
+    # the header last, a library is only complete once it is written
+    with open(path + '.json', 'w') as file:
+        json.dump({'version': FORMAT_VERSION, 'moves': headers}, file, indent=2)
+
+
+def load_moves(path, mmap_mode='r'):
+    """
+    :param path: path without extension, a .json extension is ignored
+    :param mmap_mode: see np.load, None reads the compiled trajectories into memory right away
+    :return: list of Movement
+    """
+    path = strip_extension(path)
+    with open(path + '.json', 'r') as file:
+        header = json.load(file)
+    if not isinstance(header, dict) or 'version' not in header:
+        raise ValueError('{0}.json is an old jsonpickle file, convert it with python -m src.utils.move_file {0}.json'
+                         .format(path))
+    if header['version'] > FORMAT_VERSION:
+        raise ValueError('{}.json has version {}, only up to {} is supported'.format(path, header['version'],
+                                                                                      FORMAT_VERSION))
+
+    pose_rows = np.load(path + '.poses.npy')
+    angles = np.load(path + '.angles.npy', mmap_mode=mmap_mode)
+    timestamps = np.load(path + '.timestamps.npy', mmap_mode=mmap_mode)
+
+    moves = []
+    for move_header in header['moves']:
+        start, stop = move_header['poses']
+        poses = [row_to_pose(row) for row in pose_rows[start:stop]]
+        workspace_limits = WorkSpaceLimits if move_header['uses_workspace_limits'] else None
+        movement_class = MOVEMENT_TYPES[move_header['type']]
+        if movement_class is SplineMovement:
+            move = SplineMovement(poses, move_header['time'], move_header['center'], workspace_limits,
+                                  s=move_header['s'])
+        else:
+            move = movement_class(poses, move_header['time'], move_header['center'], workspace_limits)
+
+        trajectory = move_header['trajectory']
+        if trajectory is not None:
+            start, stop = trajectory['steps']
+            move.compiled_trajectory = CompiledTrajectory(angles[start:stop], timestamps[start:stop],
+                                                          row_to_pose(trajectory['stop_pose']),
+                                                          trajectory['fingerprint'])
+        moves.append(move)
+    return moves
+
+
+def load_json_moves(filename):
+    """Read the jsonpickle files save_recorded_moves_to_file used to write, this can create any class"""
+    with open(filename, 'r') as file:
+        return jsonpickle.decode(file.read())
+
+
+def get_backup_filename(filename):
+    return filename + '.bak'
+
+
+def convert_json_moves(filename, path=None):
+    """
+    Convert a jsonpickle file to the binary format, only for files from a trusted source
+    :param path: where to store the moves, defaults to next to the json file under the same name, the json file is
+                 renamed to get_backup_filename first so the recorded moves are never lost
+    """
+    moves = load_json_moves(filename)
+    for move in moves:
+        get_movement_type(move)  # raises before anything is written for a move that can't be stored
+    if path is None:
+        path = strip_extension(filename)
+        os.replace(filename, get_backup_filename(filename))
+    save_moves(path, moves)
+    return moves
+
+
+if __name__ == '__main__':
+    for json_filename in sys.argv[1:]:
+        converted_moves = convert_json_moves(json_filename)
+        print('converted {} moves in {}, the original file is kept as {}'.format(
+            len(converted_moves), os.path.abspath(json_filename), os.path.abspath(get_backup_filename(json_filename))))
@@ -0,0 +1,192 @@
+"""
+A library of named moves that can be chained in any order.
+The start and end positions of the moves are kept in a k-d tree, so the moves that start close to where another one
+ends can be looked up without going through the whole library.
+
+A chain is played as one trajectory: the joint paths of the moves are put after each other, with a transition
+segment in joint space where a move does not start where the previous one stopped, the corners at the junctions are
+rounded off with a parabolic blend and the whole path is timed at once (see trajectory_timing). The robot does not
+stop at the junctions, it only slows down as much as the blend requires.
+"""
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from src.utils.movement_exception import MovementException
+from src.utils.movement_utils import check_collisions
+from src.utils.robot_controller_utils import get_servo_joint_limits
+from src.utils.trajectory_executor import TrajectoryExecutor
+from src.utils.trajectory_timing import get_time_optimal_trajectory
+
+
+def get_arc_lengths(path):
+    """:return: the cumulative length of a (steps, 7) joint path, starting at 0"""
+    return np.concatenate(([0.0], np.cumsum(np.linalg.norm(np.diff(path[:, 1:], axis=0), axis=1))))
+
+
+def get_transition_path(start_angles, stop_angles, step=0.01):
+    """:return: straight joint path from start_angles to stop_angles, with points at most step radians apart"""
+    start_angles = np.asarray(start_angles, dtype=np.float64)
+    stop_angles = np.asarray(stop_angles, dtype=np.float64)
+    steps = max(int(np.ceil(np.max(np.abs(stop_angles[1:] - start_angles[1:])) / step)), 1)
+    fractions = np.linspace(0, 1, steps + 1)[:, np.newaxis]
+    return start_angles + fractions * (stop_angles - start_angles)
+
+
+def blend_junctions(path, junctions, blend_radius, points_per_blend=20):
+    """
+    Replace the path within blend_radius (arc length in radians) of every junction by a quadratic Bezier curve,
+    it starts and ends tangent to the path, so the corner is gone
+    :param junctions: indices of the path where two segments meet
+    :return: the blended (steps, 7) path
+    """
+    if blend_radius <= 0 or len(junctions) == 0:
+        return path
+    arc_lengths = get_arc_lengths(path)
+    junction_lengths = arc_lengths[np.asarray(junctions)]
+    # neighbouring blends may not overlap and the path keeps its first and last point
+    bounds = np.concatenate(([0.0], junction_lengths, [arc_lengths[-1]]))
+
+    pieces = []
+    previous_stop = 0
+    for i, junction in enumerate(junctions):
+        radius = min(blend_radius, (bounds[i + 1] - bounds[i]) / 2, (bounds[i + 2] - bounds[i + 1]) / 2)
+        if radius <= 0:
+            continue
+        start_length, stop_length = junction_lengths[i] - radius, junction_lengths[i] + radius
+        start = np.array([np.interp(start_length, arc_lengths, path[:, j]) for j in range(path.shape[1])])
+        stop = np.array([np.interp(stop_length, arc_lengths, path[:, j]) for j in range(path.shape[1])])
+
+        t = np.linspace(0, 1, points_per_blend)[:, np.newaxis]
+        bezier = (1 - t) ** 2 * start + 2 * (1 - t) * t * path[junction] + t ** 2 * stop
+
+        pieces.append(path[previous_stop:np.searchsorted(arc_lengths, start_length, side='right')])
+        pieces.append(bezier)
+        previous_stop = np.searchsorted(arc_lengths, stop_length, side='right')
+    pieces.append(path[previous_stop:])
+    return np.concatenate(pieces)
+
+
+def get_chained_path(paths, transition_step=0.01, tolerance=1e-3):
+    """
+    Put joint paths after each other, with a transition segment between paths that don't connect
+    :return: the (steps, 7) path and the indices of the junctions
+    """
+    pieces = [paths[0]]
+    junctions = []
+    length = len(paths[0])
+    for path in paths[1:]:
+        if np.max(np.abs(path[0, 1:] - pieces[-1][-1, 1:])) > tolerance:
+            transition = get_transition_path(pieces[-1][-1], path[0], transition_step)[1:-1]
+            junctions.append(length - 1)
+            pieces.append(transition)
+            length += len(transition)
+            junctions.append(length)
+            pieces.append(path)
+            length += len(path)
+        else:
+            junctions.append(length - 1)
+            pieces.append(path[1:])
+            length += len(path) - 1
+    return np.concatenate(pieces), junctions
+
+
+def get_blended_trajectory(moves, servo_controller, workspace_limits=None, blend_radius=0.1, start_angles=None):
+    """
+    One trajectory that goes through all moves without stopping in between
+    :param moves: list of Movement, they are compiled for the servo controller when needed
+    :param workspace_limits: when given the transitions and blends are checked for collisions
+    :param blend_radius: how far (in radians along the joint path) the corners at the junctions are rounded off
+    :param start_angles: optional angles to start from with a transition to the first move, i.e. the current angles
+    :return: (steps, 7) array of angles and the (steps,) array of their timestamps
+    :raises MovementException: when a move can't be compiled or the chain collides
+    """
+    paths = [move.get_joint_trajectory(servo_controller)[0] for move in moves]
+    if start_angles is not None:
+        paths.insert(0, np.asarray(start_angles, dtype=np.float64)[np.newaxis, :])
+    path, junctions = get_chained_path(paths)
+    path = blend_junctions(path, junctions, blend_radius)
+
+    if workspace_limits is not None and not check_collisions(path, servo_controller.robot_config, workspace_limits):
+        raise MovementException('the chained moves make the robot collide with itself, an obstacle or the floor!')
+
+    velocity_limits, acceleration_limits = get_servo_joint_limits()
+    return get_time_optimal_trajectory(path, velocity_limits, acceleration_limits)
+
+
+class MoveLibrary:
+    """Named moves with a spatial index on the positions they start and end at"""
+
+    def __init__(self, moves=None):
+        """:param moves: optional dict of name to Movement"""
+        self.moves = {}
+        self._names = []
+        self._start_tree = None
+        self._end_tree = None
+        for name, move in (moves or {}).items():
+            self.add(name, move)
+
+    def __len__(self):
+        return len(self.moves)
+
+    def __contains__(self, name):
+        return name in self.moves
+
+    def __getitem__(self, name):
+        return self.moves[name]
+
+    def add(self, name, move):
+        """Add a move, a move with the same name is replaced"""
+        self.moves[name] = move
+        self._start_tree = None
+
+    def remove(self, name):
+        del self.moves[name]
+        self._start_tree = None
+
+    def _get_trees(self):
+        # rebuilt lazily, moves are added one by one but looked up many times
+        if self._start_tree is None:
+            self._names = list(self.moves.keys())
+            starts = [[move.poses[0].x, move.poses[0].y, move.poses[0].z] for move in self.moves.values()]
+            ends = [[move.poses[-1].x, move.poses[-1].y, move.poses[-1].z] for move in self.moves.values()]
+            self._start_tree = cKDTree(np.array(starts, dtype=np.float64).reshape(-1, 3))
+            self._end_tree = cKDTree(np.array(ends, dtype=np.float64).reshape(-1, 3))
+        return self._start_tree, self._end_tree
+
+    def _query(self, tree, position, k, max_distance):
+        if len(self.moves) == 0:
+            return []
+        distances, indices = tree.query(position, k=min(k, len(self.moves)), distance_upper_bound=max_distance)
+        return [(self._names[index], float(distance))
+                for distance, index in zip(np.atleast_1d(distances), np.atleast_1d(indices)) if np.isfinite(distance)]
+
+    def find_moves_starting_near(self, position, k=1, max_distance=np.inf):
+        """:return: list of (name, distance) of the k moves that start closest to the [x, y, z] position"""
+        start_tree, _ = self._get_trees()
+        return self._query(start_tree, position, k, max_distance)
+
+    def find_moves_ending_near(self, position, k=1, max_distance=np.inf):
+        """:return: list of (name, distance) of the k moves that end closest to the [x, y, z] position"""
+        _, end_tree = self._get_trees()
+        return self._query(end_tree, position, k, max_distance)
+
+    def find_next_moves(self, name, k=1, max_distance=np.inf):
+        """:return: list of (name, distance) of the moves that start closest to where the named move ends"""
+        end = self.moves[name].poses[-1]
+        return [(other, distance) for other, distance in
+                self.find_moves_starting_near([end.x, end.y, end.z], k + 1, max_distance) if other != name][:k]
+
+    def get_chain(self, names, servo_controller, workspace_limits=None, blend_radius=0.1, start_angles=None):
+        """The moves with these names blended into one trajectory, see get_blended_trajectory"""
+        return get_blended_trajectory([self.moves[name] for name in names], servo_controller, workspace_limits,
+                                      blend_radius, start_angles)
+
+    def play(self, names, servo_controller, workspace_limits=None, blend_radius=0.1):
+        """
+        Play the named moves one after the other without stopping in between, starting from the current angles
+        :return: ExecutionStats
+        """
+        angles, timestamps = self.get_chain(names, servo_controller, workspace_limits, blend_radius,
+                                            start_angles=servo_controller.get_current_angles())
+        return TrajectoryExecutor(servo_controller).follow_timed(angles, timestamps)
@@ -1,11 +1,17 @@
 import json
 from abc import ABC, abstractmethod
+from copy import copy
 import logging as log
 import numpy as np
 
+from src.kinematics.kinematics_utils import calculate_euler_matrices_from_angles
 from src.utils.movement_exception import MovementException
-from src.utils.movement_utils import b_spline_curve, pose_to_pose, from_current_angles_to_pose, \
-    b_spline_curve_calculate_only
+from src.utils.movement_utils import from_current_angles_to_pose, get_b_spline_joint_trajectory, \
+    b_spline_curve_calculate_only, fix_initial_orientation, get_pose_to_pose_joint_trajectory, get_angles_center, \
+    get_linear_joint_trajectory, get_circular_joint_trajectory, get_b_spline_path, get_linear_path, get_circular_path
+from src.utils.robot_controller_utils import get_servo_joint_limits
+from src.utils.trajectory_executor import TrajectoryExecutor
+from src.utils.trajectory_timing import get_time_optimal_trajectory
 
 
 def convert_center_to_float(center):
@@ -14,6 +20,66 @@ def convert_center_to_float(center):
     return [float(x) for x in center]
 
 
+def orient_towards_center(poses, center):
+    """:return: copies of the poses that point towards the center, or the poses themselves without a center"""
+    if center is None:
+        return poses
+    oriented_poses = []
+    for pose in poses:
+        oriented_pose = copy(pose)
+        oriented_pose.alpha, oriented_pose.beta, oriented_pose.gamma = get_angles_center(pose.x, pose.y, pose.z,
+                                                                                         center)
+        oriented_pose.euler_matrix = None
+        oriented_poses.append(oriented_pose)
+    return oriented_poses
+
+
+class CompiledTrajectory:
+    """
+    Every step of a movement in joint space, calculated once and played back as is.
+    It is stored together with the movement, so a movement that is restored from a file does not need
+    to be calculated again either.
+    """
+
+    def __init__(self, angles, timestamps, stop_pose, fingerprint):
+        """
+        :param angles: (steps, 7) array of angles
+        :param timestamps: (steps,) array with the time in seconds every step is sent at, starting at 0
+        :param stop_pose: pose where the movement actually stops
+        :param fingerprint: RobotConfig.fingerprint() of the config the angles were calculated for
+        """
+        self.angles = np.ascontiguousarray(angles, dtype=np.float64)
+        self.timestamps = np.ascontiguousarray(timestamps, dtype=np.float64)
+        self.stop_pose = stop_pose
+        self.fingerprint = tuple(float(length) for length in fingerprint)
+
+    def matches(self, robot_config):
+        return np.allclose(self.fingerprint, robot_config.fingerprint())
+
+    def reversed_angles(self):
+        return self.angles[::-1]
+
+    def reversed_timestamps(self):
+        if len(self.timestamps) == 0:
+            return self.timestamps
+        return self.timestamps[-1] - self.timestamps[::-1]
+
+    @property
+    def duration(self):
+        return float(self.timestamps[-1]) if len(self.timestamps) > 0 else 0.0
+
+    def __len__(self):
+        return len(self.angles)
+
+    def __getstate__(self):
+        # plain lists, so the saved moves stay readable json
+        return {'angles': self.angles.tolist(), 'timestamps': self.timestamps.tolist(), 'stop_pose': self.stop_pose,
+                'fingerprint': list(self.fingerprint)}
+
+    def __setstate__(self, state):
+        self.__init__(state['angles'], state['timestamps'], state['stop_pose'], state['fingerprint'])
+
+
 class Movement(ABC):
 
     def __init__(self, poses, time, center=None, workspace_limits=None) -> None:
@@ -23,6 +89,7 @@ class Movement(ABC):
         self.time = float(time)
         self.center = convert_center_to_float(center)
         self.workspace_limits = workspace_limits
+        self.compiled_trajectory = None
 
     def go_to_start_of_move(self, servo_controller, time=None):
         if time is None:
@@ -32,21 +99,77 @@ class Movement(ABC):
     def move(self, servo_controller):
         if not self.is_robot_at_start_pose(self.poses[0], servo_controller):
             raise MovementException("robot is not at the start pose, not executing move")
-        return self._move_internal(self.poses, servo_controller)
+        return self._move_internal(self.poses, servo_controller, reverse=False)
 
     def move_reversed(self, servo_controller):
         if not self.is_robot_at_start_pose(self.poses[-1], servo_controller):
             raise MovementException("robot is not at the start pose, not executing move")
-        return self._move_internal(self.poses[::-1], servo_controller)
+        return self._move_internal(self.poses[::-1], servo_controller, reverse=True)
+
+    def compile(self, servo_controller):
+        """
+        Calculate the angles of every step of this move for the robot config of the servo controller,
+        playing the move back afterwards only sends the stored angles to the servos.
+        The path is retimed to go as fast as the velocity and acceleration limits of the servos allow,
+        the time of the move only sets how many points along the path are calculated.
+        :return: CompiledTrajectory
+        :raises MovementException: when the move can't be executed, i.e. it goes outside of the workspace limits
+        """
+        path, stop_pose = self._calculate_joint_trajectory(self.poses, servo_controller)
+        velocity_limits, acceleration_limits = get_servo_joint_limits()
+        angles, timestamps = get_time_optimal_trajectory(path, velocity_limits, acceleration_limits)
+        self.compiled_trajectory = CompiledTrajectory(angles, timestamps, stop_pose,
+                                                      servo_controller.robot_config.fingerprint())
+        return self.compiled_trajectory
+
+    def get_compiled_trajectory(self, servo_controller):
+        """The compiled trajectory, it is only compiled (again) when it is missing or made for another robot config"""
+        # moves restored from a file that was saved before they were compiled don't have the attribute yet
+        compiled_trajectory = self.__dict__.get('compiled_trajectory')
+        if compiled_trajectory is None or not compiled_trajectory.matches(servo_controller.robot_config):
+            compiled_trajectory = self.compile(servo_controller)
+        return compiled_trajectory
+
+    def get_joint_trajectory(self, servo_controller, reverse=False):
+        """
+        :return: (steps, 7) array of angles and the pose where the move stops, reversed the compiled trajectory is
+                 read backwards and stops at the first pose
+        """
+        compiled_trajectory = self.get_compiled_trajectory(servo_controller)
+        if reverse:
+            return compiled_trajectory.reversed_angles(), self.poses[0]
+        return compiled_trajectory.angles, compiled_trajectory.stop_pose
+
+    def follow_compiled_trajectory(self, servo_controller, reverse=False):
+        """Stream the compiled angles to the servos at their timestamps"""
+        compiled_trajectory = self.get_compiled_trajectory(servo_controller)
+        executor = TrajectoryExecutor(servo_controller)
+        if reverse:
+            executor.follow_timed(compiled_trajectory.reversed_angles(), compiled_trajectory.reversed_timestamps())
+            return self.poses[0]
+        executor.follow_timed(compiled_trajectory.angles, compiled_trajectory.timestamps)
+        return compiled_trajectory.stop_pose
+
+    @abstractmethod
+    def _calculate_joint_trajectory(self, poses, servo_controller):
+        pass
 
     @abstractmethod
-    def _move_internal(self, poses, servo_controller):
+    def _move_internal(self, poses, servo_controller, reverse):
         pass
 
     @abstractmethod
     def check_workspace_limits(self, servo_controller, workspace_limits):
         pass
 
+    def get_cartesian_path(self):
+        """
+        The path the end effector is asked to follow, one step per row of _calculate_joint_trajectory
+        :return: (steps, 3) array of positions and (steps, 3, 3) array of euler matrices,
+                 or None for a move that interpolates the angles instead
+        """
+        return None
+
     def to_json(self):
         json_poses = [pose.to_json() for pose in self.poses]
         dump_dict = {'poses': json_poses}
@@ -65,13 +188,32 @@ class SplineMovement(Movement):
         super().__init__(poses, time, center, workspace_limits)
         self._s = s
 
-    def _move_internal(self, poses, servo_controller):
-        return b_spline_curve(poses, self.time, servo_controller,
-                              workspace_limits=self.workspace_limits, center=self.center, s=self._s)
+    def _calculate_joint_trajectory(self, poses, servo_controller):
+        return get_b_spline_joint_trajectory(poses, self.time, servo_controller.robot_config,
+                                             workspace_limits=self.workspace_limits, center=self.center, s=self._s)
+
+    def get_cartesian_path(self):
+        positions, alpha, gamma, _ = get_b_spline_path(self.poses, self.time, self.center, self._s)
+        return positions, calculate_euler_matrices_from_angles(alpha, np.zeros(len(positions)), gamma)
+
+    def _move_internal(self, poses, servo_controller, reverse):
+        start_pose = poses[0]
+        if self.center is not None:
+            fix_initial_orientation(start_pose.alpha, start_pose.beta, self.center, start_pose.gamma,
+                                    servo_controller, start_pose)
+
+        return self.follow_compiled_trajectory(servo_controller, reverse)
 
     def check_workspace_limits(self, servo_controller, workspace_limits):
+        """
+        With the workspace limits of the move itself this compiles the move,
+        so the spline is not fitted again when the move is played back afterwards
+        """
         try:
-            b_spline_curve_calculate_only(self.poses, self.time, workspace_limits)
+            if workspace_limits is self.workspace_limits:
+                self.compile(servo_controller)
+            else:
+                b_spline_curve_calculate_only(self.poses, self.time, workspace_limits)
         except MovementException:
             return False
         return True
@@ -85,8 +227,73 @@ class PoseToPoseMovement(Movement):
             log.warning("more than 2 poses provided for a pose to pose movement, "
                         "using the first and the last pose given")
 
-    def _move_internal(self, poses, servo_controller):
-        return pose_to_pose(poses[0], poses[-1], servo_controller, time=self.time)
+    def _calculate_joint_trajectory(self, poses, servo_controller):
+        trajectory = get_pose_to_pose_joint_trajectory(poses[0], poses[-1], self.time, servo_controller.pose_to_angles)
+        return trajectory, poses[-1]
+
+    def _move_internal(self, poses, servo_controller, reverse):
+        return self.follow_compiled_trajectory(servo_controller, reverse)
 
     def check_workspace_limits(self, servo_controller, workspace_limits):
         return True
+
+
+class CartesianMovement(Movement, ABC):
+    """
+    A movement along a path in Cartesian space that is solved with the inverse kinematics in one batch when it is
+    compiled. With a center the poses are turned towards it when the movement is made, so the robot already has
+    the right orientation at the start pose and does not need to turn first (see fix_initial_orientation).
+    """
+
+    def __init__(self, poses, time, center=None, workspace_limits=None) -> None:
+        super().__init__(orient_towards_center(poses, center), time, center, workspace_limits)
+
+    def _move_internal(self, poses, servo_controller, reverse):
+        return self.follow_compiled_trajectory(servo_controller, reverse)
+
+    def check_workspace_limits(self, servo_controller, workspace_limits):
+        try:
+            if workspace_limits is self.workspace_limits:
+                self.compile(servo_controller)
+            else:
+                self._calculate_path(servo_controller, workspace_limits)
+        except MovementException:
+            return False
+        return True
+
+    def _calculate_joint_trajectory(self, poses, servo_controller):
+        return self._calculate_path(servo_controller, self.workspace_limits)
+
+    @abstractmethod
+    def _calculate_path(self, servo_controller, workspace_limits):
+        pass
+
+
+class LinearMovement(CartesianMovement):
+    """The end effector moves along a straight line from the first to the last pose"""
+
+    def _calculate_path(self, servo_controller, workspace_limits):
+        return get_linear_joint_trajectory(self.poses[0], self.poses[-1], self.time, servo_controller.robot_config,
+                                           workspace_limits, self.center)
+
+    def get_cartesian_path(self):
+        return get_linear_path(self.poses[0], self.poses[-1], self.time, self.center)
+
+
+class CircularMovement(CartesianMovement):
+    """
+    The end effector moves along a circular arc, through the first, middle and last pose when there are at least 3,
+    otherwise around the center (i.e. from get_center) from the first to the last pose
+    """
+
+    def __init__(self, poses, time, center=None, workspace_limits=None) -> None:
+        if len(poses) < 3 and center is None:
+            raise ValueError("a circular movement needs at least 3 poses or a center")
+        super().__init__(poses, time, center, workspace_limits)
+
+    def _calculate_path(self, servo_controller, workspace_limits):
+        return get_circular_joint_trajectory(self.poses, self.time, servo_controller.robot_config, workspace_limits,
+                                             self.center)
+
+    def get_cartesian_path(self):
+        return get_circular_path(self.poses, self.time, self.center)
@@ -2,50 +2,67 @@ from __future__ import division
 
 from copy import copy
 from math import ceil
-from time import sleep
 
 import numpy as np
 from scipy.interpolate import splev, splprep
+from scipy.spatial.transform import Rotation, Slerp
 
 import src.global_constants
-from src.kinematics.kinematics import inverse_kinematics
-from src.kinematics.kinematics_utils import Pose
+from src.kinematics.collision import find_first_collision
+from src.kinematics.kinematics import batch_inverse_kinematics
+from src.kinematics.kinematics_utils import calculate_euler_matrices_from_angles, PoseArray, joint_limits
 from src.utils.movement_exception import MovementException
+from src.utils.robot_controller_utils import get_recommended_wait_time
+from src.utils.trajectory_executor import TrajectoryExecutor
 
 
 def pose_to_pose(start_pose, stop_pose, servo_controller, time=None):
-    robot_config = servo_controller.robot_config
-    start_angles = inverse_kinematics(start_pose, robot_config)
-    stop_angles = inverse_kinematics(stop_pose, robot_config)
     if time is None:
         time = stop_pose.time
-
-    angles_to_angles(start_angles, stop_angles, time, servo_controller)
+    trajectory = get_pose_to_pose_joint_trajectory(start_pose, stop_pose, time, servo_controller.pose_to_angles)
+    follow_angles_trajectory(trajectory, servo_controller)
     return stop_pose
 
 
+def get_pose_to_pose_joint_trajectory(start_pose, stop_pose, time, pose_to_angles):
+    """
+    :param pose_to_angles: function that solves the inverse kinematics for a single pose
+    :return: (steps, 7) array of angles going from start_pose to stop_pose in time amount of seconds
+    """
+    start_angles = pose_to_angles(start_pose)
+    stop_angles = pose_to_angles(stop_pose)
+    return get_angles_to_angles_trajectory(start_angles, stop_angles, time)
+
+
 def angles_to_angles(start_angles, stop_angles, time, servo_controller):
     """go from start to stop angles in time amount of seconds"""
-    delta_angle = np.zeros(7, dtype=np.float64)
+    trajectory = get_angles_to_angles_trajectory(start_angles, stop_angles, time)
+    follow_angles_trajectory(trajectory, servo_controller)
 
-    for i in range(1, 7):
-        delta_angle[i] = stop_angles[i] - start_angles[i]
 
-    current_angles = start_angles.copy()
+def get_angles_to_angles_trajectory(start_angles, stop_angles, time):
+    """
+    Calculate every step of a smooth (quintic) movement from start to stop angles in time amount of seconds
+    :return: (total_steps + 1, 7) array of angles, one row per step
+    """
+    start_angles = np.asarray(start_angles, dtype=np.float64)
+    delta_angle = np.zeros(7, dtype=np.float64)
+    delta_angle[1:7] = np.asarray(stop_angles, dtype=np.float64)[1:7] - start_angles[1:7]
 
     steps = src.global_constants.steps_per_second
-    total_steps = ceil(time * steps)  # 50 steps per second
-    dt = 1.0 / steps
+    total_steps = ceil(time * steps)
 
-    for i in range(total_steps + 1):
-        t = i / total_steps
+    t = np.linspace(0, 1, total_steps + 1)
+    curve_value = get_curve_val(t)
+    return start_angles + curve_value[:, np.newaxis] * delta_angle
 
-        curve_value = (6 * np.power(t, 5) - 15 * np.power(t, 4) + 10 * np.power(t, 3))
-        for j in range(1, 7):
-            current_angles[j] = start_angles[j] + delta_angle[j] * curve_value
 
-        sleep(dt)
-        servo_controller.move_servos(current_angles)
+def follow_angles_trajectory(trajectory, servo_controller):
+    """
+    Send every row of a (steps, 7) array of angles to the servos at a fixed rate
+    :return: ExecutionStats
+    """
+    return TrajectoryExecutor(servo_controller).follow(trajectory)
 
 
 def already_at_target_angles(current_angles, target_angles):
@@ -111,7 +128,28 @@ def b_spline_curve(poses, time, servo_controller, workspace_limits=None, center=
     :param center: [x, y, z] the end effector will always be oriented towards this center point
     :return: final pose
     """
-    x_steps, y_steps, z_steps, total_steps, alpha_steps, gamma_steps, path_parameter = get_spline_step_arrays(poses, time, s)
+    trajectory, actual_stop_pose = get_b_spline_joint_trajectory(poses, time, servo_controller.robot_config,
+                                                                 workspace_limits=workspace_limits,
+                                                                 center=center, s=s)
+
+    start_pose = poses[0]
+    if center is not None:
+        fix_initial_orientation(start_pose.alpha, start_pose.beta, center, start_pose.gamma, servo_controller,
+                                start_pose)
+
+    follow_joint_trajectory(trajectory, servo_controller)
+    return actual_stop_pose
+
+
+def get_b_spline_path(poses, time, center=None, s=None):
+    """
+    Sample the B-spline defined by the poses, the path the end effector is asked to follow
+    :param center: [x, y, z] the end effector will always be oriented towards this center point
+    :return: (total_steps, 3) array of positions, the alpha and gamma of every step and the pose where the curve
+             actually stops
+    """
+    x_steps, y_steps, z_steps, total_steps, alpha_steps, gamma_steps, path_parameter = get_spline_step_arrays(poses,
+                                                                                                              time, s)
 
     start_pose = poses[0]
     stop_pose = poses[-1]
@@ -119,42 +157,64 @@ def b_spline_curve(poses, time, servo_controller, workspace_limits=None, center=
     # by shifting the spline and calculate where it actually ends
     dx, dy, dz, actual_stop_pose = get_adjustments_and_stop_pose(start_pose, stop_pose, x_steps, y_steps, z_steps)
 
-    d_alpha, d_beta, d_gamma = get_delta_angles(start_pose, stop_pose)
+    x = np.asarray(x_steps) - dx
+    y = np.asarray(y_steps) - dy
+    z = np.asarray(z_steps) - dz
 
-    flip = stop_pose.flip
+    if center is not None:
+        alpha, _, gamma = get_angles_center(x, y, z, center)
+    else:
+        alpha, gamma = np.asarray(alpha_steps), np.asarray(gamma_steps)
 
-    if workspace_limits is not None and not check_workspace_limits(x_steps, y_steps, z_steps, total_steps, workspace_limits):
-        raise MovementException('curve goes outside of workspace limits!')
+    if center is not None and total_steps > 0:
+        actual_stop_pose.alpha = alpha[-1]
+        actual_stop_pose.beta = 0
+        actual_stop_pose.gamma = gamma[-1]
+    elif center is not None:
+        actual_stop_pose.alpha = start_pose.alpha
+        actual_stop_pose.beta = start_pose.beta
+        actual_stop_pose.gamma = start_pose.gamma
+
+    positions = np.column_stack((x, y, z)).reshape(-1, 3)
+    return positions, np.asarray(alpha, dtype=np.float64), np.asarray(gamma, dtype=np.float64), actual_stop_pose
 
-    alpha, beta, gamma = start_pose.alpha, start_pose.beta, start_pose.gamma
-    if center is not None:
-        fix_initial_orientation(alpha, beta, center, gamma, servo_controller, start_pose)
 
-    dt = 1.0 / src.global_constants.steps_per_second
-    for i in range(total_steps):
-        x = x_steps[i] - dx
-        y = y_steps[i] - dy
-        z = z_steps[i] - dz
+def get_b_spline_joint_trajectory(poses, time, robot_config, workspace_limits=None, center=None, s=None):
+    """
+    Sample the B-spline defined by the poses and solve the inverse kinematics for every step in a single batch
+    :param poses: array of Pose, knot points for the B-spline
+    :param time: total time for the movement
+    :param robot_config: link lengths used for the inverse kinematics
+    :param workspace_limits:
+    :param center: [x, y, z] the end effector will always be oriented towards this center point
+    :param s: desired value for the smoothing factor s
+    :return: (total_steps, 7) array of angles, one row per step, and the pose where the curve actually stops
+    """
+    positions, alpha, gamma, actual_stop_pose = get_b_spline_path(poses, time, center, s)
+    total_steps = len(positions)
 
-        if center is not None:
-            alpha, beta, gamma = get_angles_center(x, y, z, center)
-        else:
-            alpha, beta, gamma = alpha_steps[i], 0, gamma_steps[i]
+    if workspace_limits is not None and not check_workspace_limits(positions[:, 0], positions[:, 1], positions[:, 2],
+                                                                   total_steps, workspace_limits, alpha, gamma):
+        raise MovementException('curve goes outside of workspace limits!')
 
-        temp_pose = Pose(x, y, z, flip, alpha, beta, gamma)
+    orientations = calculate_euler_matrices_from_angles(alpha, np.zeros(total_steps, dtype=np.float64), gamma)
+    trajectory = batch_inverse_kinematics(positions, orientations, poses[-1].flip, robot_config)
 
-        rec_time, time_taken = servo_controller.move_to_pose(temp_pose)
+    if workspace_limits is not None and find_first_joint_limit_violation(trajectory) >= 0:
+        raise MovementException('curve goes outside of the joint limits!')
+    if workspace_limits is not None and not check_collisions(trajectory, robot_config, workspace_limits):
+        raise MovementException('curve makes the robot collide with itself, an obstacle or the floor!')
 
-        # print("rec time: {}, dt: {}".format(rec_time, dt))
-        sleep_time = np.maximum(dt, rec_time)
-        sleep(sleep_time)
+    return trajectory, actual_stop_pose
 
-    if center is not None:
-        actual_stop_pose.alpha = alpha
-        actual_stop_pose.beta = beta
-        actual_stop_pose.gamma = gamma
 
-    return actual_stop_pose
+def follow_joint_trajectory(trajectory, servo_controller):
+    """
+    Send every row of a (steps, 7) array of angles to the servos, waiting at least one step in between,
+    longer when the servos need more time to get to the angles
+    :return: ExecutionStats
+    """
+    return TrajectoryExecutor(servo_controller).follow(trajectory, get_wait_time=get_recommended_wait_time)
 
 
 def b_spline_plot(poses, s=None):
@@ -165,7 +225,7 @@ def b_spline_plot(poses, s=None):
 def b_spline_curve_calculate_only(poses, time, workspace_limits, s=None):
     x_steps, y_steps, z_steps, total_steps, alpha_steps, gamma_steps, path_parameter = get_spline_step_arrays(poses,
                                                                                                               time, s)
-    if not check_workspace_limits(x_steps, y_steps, z_steps, total_steps, workspace_limits):
+    if not check_workspace_limits(x_steps, y_steps, z_steps, total_steps, workspace_limits, alpha_steps, gamma_steps):
         raise MovementException('curve goes outside of workspace limits!')
 
     start_pose = poses[0]
@@ -181,11 +241,12 @@ def get_spline_step_arrays(poses, time, s=None):
 
     k_val = min(data_points - 1, 5)
 
-    x_poses = [pose.x for pose in poses]
-    y_poses = [pose.y for pose in poses]
-    z_poses = [pose.z for pose in poses]
-    alphas = [pose.alpha for pose in poses]
-    gammas = [pose.gamma for pose in poses]
+    pose_array = poses if isinstance(poses, PoseArray) else PoseArray.from_poses(poses)
+    x_poses = pose_array.x
+    y_poses = pose_array.y
+    z_poses = pose_array.z
+    alphas = pose_array.alpha
+    gammas = pose_array.gamma
 
     if s is None:
         s = data_points + np.sqrt(2 * data_points)
@@ -194,24 +255,74 @@ def get_spline_step_arrays(poses, time, s=None):
     tck, u = splprep([x_poses, y_poses, z_poses, alphas, gammas], k=k_val, s=s)
 
     total_steps = ceil(time * src.global_constants.steps_per_second)
-    lin = np.linspace(0, 1, total_steps)
-    path_parameter = [get_curve_val(t) for t in lin]
+    path_parameter = get_curve_val(np.linspace(0, 1, total_steps))
 
     x_steps, y_steps, z_steps, alpha_steps, gamma_steps = splev(path_parameter, tck)
 
     return x_steps, y_steps, z_steps, total_steps, alpha_steps, gamma_steps, path_parameter
 
 
-def check_workspace_limits(x_steps, y_steps, z_steps, total_steps, workspace_limits):
+def check_workspace_limits(x_steps, y_steps, z_steps, total_steps, workspace_limits, alpha_steps=0.0,
+                           gamma_steps=0.0):
+    return find_first_workspace_violation(x_steps[:total_steps], y_steps[:total_steps], z_steps[:total_steps],
+                                          workspace_limits, alpha_steps, gamma_steps) < 0
+
+
+def find_first_workspace_violation(x_steps, y_steps, z_steps, workspace_limits, alpha_steps=0.0, gamma_steps=0.0):
+    """
+    Check every step of a path against the radius, y_min, z_min and the reachability grid of the workspace limits
+    :return: index of the first step that is outside of the workspace limits, or -1 when the whole path is inside
+    """
     if workspace_limits is None:
-        return True
-    for i in range(total_steps):
-        r = np.sqrt(x_steps[i]*x_steps[i] + y_steps[i]*y_steps[i] + z_steps[i]*z_steps[i])
-        if r < workspace_limits.radius_min or r > workspace_limits.radius_max:
-            return False
-        if z_steps[i] < workspace_limits.z_min:
-            return False
-    return True
+        return -1
+    return first_index(get_workspace_violations(x_steps, y_steps, z_steps, workspace_limits, alpha_steps,
+                                                gamma_steps))
+
+
+def get_workspace_violations(x_steps, y_steps, z_steps, workspace_limits, alpha_steps=0.0, gamma_steps=0.0):
+    """:return: array of booleans, True for every step of the path that is outside of the workspace limits"""
+    x_steps = np.asarray(x_steps, dtype=np.float64)
+    y_steps = np.asarray(y_steps, dtype=np.float64)
+    z_steps = np.asarray(z_steps, dtype=np.float64)
+    if len(x_steps) == 0:
+        return np.zeros(0, dtype=bool)
+
+    r = np.sqrt(x_steps * x_steps + y_steps * y_steps + z_steps * z_steps)
+    outside = (r < workspace_limits.radius_min) | (r > workspace_limits.radius_max) | \
+        (y_steps < workspace_limits.y_min) | (z_steps < workspace_limits.z_min)
+
+    reachability_grid = getattr(workspace_limits, 'reachability_grid', None)
+    if reachability_grid is not None:
+        outside |= ~np.asarray(reachability_grid.is_reachable(x_steps, y_steps, z_steps, alpha_steps, gamma_steps))
+    return outside
+
+
+def find_first_joint_limit_violation(trajectory, limits=joint_limits):
+    """
+    :param trajectory: (steps, 7) array of angles
+    :param limits: (7, 2) array with the minimum and maximum angle of every joint, starts at 1
+    :return: index of the first step with an angle outside of its limits (or no solution at all), or -1
+    """
+    angles = np.asarray(trajectory, dtype=np.float64)[:, 1:7]
+    # comparisons with nan are False, so steps without an inverse kinematics solution count as outside
+    inside = (angles >= limits[1:7, 0]) & (angles <= limits[1:7, 1])
+    return first_index(~np.all(inside, axis=1))
+
+
+def first_index(flags):
+    """:return: index of the first True in a boolean array, or -1 when there is none"""
+    if len(flags) == 0:
+        return -1
+    index = int(np.argmax(flags))
+    return index if flags[index] else -1
+
+
+def check_collisions(trajectory, robot_config, workspace_limits):
+    """:return: False when any step of the (steps, 7) array of angles collides"""
+    boxes = getattr(workspace_limits, 'collision_boxes', None)
+    if boxes is None:
+        boxes = np.zeros((0, 7), dtype=np.float64)
+    return find_first_collision(trajectory, robot_config, boxes, workspace_limits.z_min) < 0
 
 
 def get_delta_angles(start_pose, stop_pose):
@@ -251,3 +362,136 @@ def fix_initial_orientation(alpha, beta, center, gamma, servo_controller, start_
         adjusted_start_pose.gamma = start_gamma
         pose_to_pose(start_pose, adjusted_start_pose, servo_controller, 0.5)
 
+
+def get_linear_positions(start, stop, fractions):
+    """:return: (steps, 3) array of points on the straight line from start to stop"""
+    start = np.asarray(start, dtype=np.float64)
+    return start + fractions[:, np.newaxis] * (np.asarray(stop, dtype=np.float64) - start)
+
+
+def get_circle_through_points(p0, p1, p2):
+    """:return: centre and the unit normal of the circle through 3 points, the normal follows the order p0, p1, p2"""
+    a = p1 - p0
+    b = p2 - p1
+    normal = np.cross(a, b)
+    norm = np.linalg.norm(normal)
+    if np.isclose(norm, 0.0):
+        raise MovementException('the poses of a circular movement should not be on a line')
+    normal = normal / norm
+    # the centre is equally far from all 3 points and lies in their plane
+    matrix = np.array([a, b, normal])
+    rhs = np.array([np.dot(a, p1 + p0) / 2, np.dot(b, p2 + p1) / 2, np.dot(normal, p0)])
+    return np.linalg.solve(matrix, rhs), normal
+
+
+def get_arc_positions(start, stop, center, normal, fractions):
+    """
+    :param normal: unit vector the arc turns around (right hand rule) from start to stop
+    :return: (steps, 3) array of points on the arc, the radius changes linearly when start and stop are not
+             equally far from the center
+    """
+    start_radius_vector = start - center
+    stop_radius_vector = stop - center
+    start_radius = np.linalg.norm(start_radius_vector)
+    stop_radius = np.linalg.norm(stop_radius_vector - np.dot(stop_radius_vector, normal) * normal)
+    u = start_radius_vector / start_radius
+    v = np.cross(normal, u)
+    total_angle = np.arctan2(np.dot(stop_radius_vector, v), np.dot(stop_radius_vector, u)) % (2 * np.pi)
+
+    angles = fractions * total_angle
+    radii = start_radius + fractions * (stop_radius - start_radius)
+    return center + radii[:, np.newaxis] * (np.cos(angles)[:, np.newaxis] * u + np.sin(angles)[:, np.newaxis] * v)
+
+
+def slerp_orientations(start_matrix, stop_matrix, fractions):
+    """:return: (steps, 3, 3) array of orientations turning from start to stop at a constant rate (quaternion slerp)"""
+    rotations = Rotation.from_matrix(np.array([start_matrix, stop_matrix], dtype=np.float64))
+    return Slerp([0.0, 1.0], rotations)(fractions).as_matrix()
+
+
+def get_cartesian_orientations(start_pose, stop_pose, positions, fractions, center=None):
+    """The orientation of every step, towards the center when given, otherwise slerped from start to stop pose"""
+    if center is not None:
+        alpha, _, gamma = get_angles_center(positions[:, 0], positions[:, 1], positions[:, 2], center)
+        return calculate_euler_matrices_from_angles(alpha, np.zeros(len(positions)), gamma)
+    return slerp_orientations(start_pose.get_euler_matrix(), stop_pose.get_euler_matrix(), fractions)
+
+
+def get_cartesian_joint_trajectory(positions, orientations, flip, robot_config, workspace_limits=None):
+    """
+    Solve the inverse kinematics for every step of a path in Cartesian space in a single batch
+    :param positions: (steps, 3) array of x, y, z
+    :param orientations: (steps, 3, 3) array of euler matrices
+    :return: (steps, 7) array of angles
+    :raises MovementException: when the path leaves the workspace or joint limits, or collides
+    """
+    if workspace_limits is not None and \
+            find_first_workspace_violation(positions[:, 0], positions[:, 1], positions[:, 2], workspace_limits) >= 0:
+        raise MovementException('path goes outside of workspace limits!')
+
+    trajectory = batch_inverse_kinematics(positions, orientations, flip, robot_config)
+
+    if workspace_limits is not None and find_first_joint_limit_violation(trajectory) >= 0:
+        raise MovementException('path goes outside of the joint limits!')
+    if workspace_limits is not None and not check_collisions(trajectory, robot_config, workspace_limits):
+        raise MovementException('path makes the robot collide with itself, an obstacle or the floor!')
+    return trajectory
+
+
+def get_linear_path(start_pose, stop_pose, time, center=None):
+    """
+    A straight line from the start to the stop pose, the orientation turns from the start to the stop pose
+    :return: (steps, 3) array of positions and (steps, 3, 3) array of euler matrices
+    """
+    fractions = np.linspace(0, 1, max(ceil(time * src.global_constants.steps_per_second), 2))
+    positions = get_linear_positions([start_pose.x, start_pose.y, start_pose.z],
+                                     [stop_pose.x, stop_pose.y, stop_pose.z], fractions)
+    return positions, get_cartesian_orientations(start_pose, stop_pose, positions, fractions, center)
+
+
+def get_linear_joint_trajectory(start_pose, stop_pose, time, robot_config, workspace_limits=None, center=None):
+    """
+    Move the end effector along a straight line, the orientation turns from the start to the stop pose
+    :return: (steps, 7) array of angles and the pose where the movement stops
+    """
+    positions, orientations = get_linear_path(start_pose, stop_pose, time, center)
+    trajectory = get_cartesian_joint_trajectory(positions, orientations, stop_pose.flip, robot_config,
+                                                workspace_limits)
+    return trajectory, stop_pose
+
+
+def get_circular_path(poses, time, center=None):
+    """
+    A circular arc through the first, middle and last pose when there are 3 or more, otherwise around the center
+    from the first to the last pose (the short way)
+    :return: (steps, 3) array of positions and (steps, 3, 3) array of euler matrices
+    """
+    start_pose, stop_pose = poses[0], poses[-1]
+    start = np.array([start_pose.x, start_pose.y, start_pose.z])
+    stop = np.array([stop_pose.x, stop_pose.y, stop_pose.z])
+    if len(poses) >= 3:
+        via_pose = poses[len(poses) // 2]
+        circle_center, normal = get_circle_through_points(start, np.array([via_pose.x, via_pose.y, via_pose.z]), stop)
+    elif center is not None:
+        circle_center = np.asarray(center, dtype=np.float64)
+        normal = np.cross(start - circle_center, stop - circle_center)
+        if np.isclose(np.linalg.norm(normal), 0.0):
+            raise MovementException('the poses and the center of a circular movement should not be on a line')
+        normal = normal / np.linalg.norm(normal)
+    else:
+        raise MovementException('a circular movement needs 3 poses or a center')
+
+    fractions = np.linspace(0, 1, max(ceil(time * src.global_constants.steps_per_second), 2))
+    positions = get_arc_positions(start, stop, circle_center, normal, fractions)
+    return positions, get_cartesian_orientations(start_pose, stop_pose, positions, fractions, center)
+
+
+def get_circular_joint_trajectory(poses, time, robot_config, workspace_limits=None, center=None):
+    """
+    Move the end effector along a circular arc, see get_circular_path
+    :return: (steps, 7) array of angles and the pose where the movement stops
+    """
+    positions, orientations = get_circular_path(poses, time, center)
+    trajectory = get_cartesian_joint_trajectory(positions, orientations, poses[-1].flip, robot_config,
+                                                workspace_limits)
+    return trajectory, poses[-1]
@@ -0,0 +1,101 @@
+import numpy as np
+
+from src.kinematics.kinematics_utils import Pose
+
+
+def get_cubic_b_spline_weights(u):
+    """Weights of the 4 control points of a uniform cubic B-spline segment at 0 <= u <= 1"""
+    return np.array([(1 - u) ** 3, 3 * u ** 3 - 6 * u ** 2 + 4, -3 * u ** 3 + 3 * u ** 2 + 3 * u + 1, u ** 3]) / 6
+
+
+class FixedLagSplineFilter:
+    """
+    Smooths a stream of samples (i.e. the target position at every step of a control loop) with a uniform cubic
+    B-spline, like b_spline_curve does for a whole move, but without knowing the samples that are still to come.
+    Every samples_per_knot samples are averaged into a new control point, in between the segment of the last 4 control
+    points is followed. Only those 4 points are kept, so every sample costs the same no matter how long the stream is.
+    The output is twice continuously differentiable and lags behind the input by a fixed number of samples, see lag.
+    """
+
+    def __init__(self, samples_per_knot=3):
+        if samples_per_knot < 1:
+            raise ValueError("samples_per_knot should be at least 1")
+        self.samples_per_knot = samples_per_knot
+        # weights for the samples 1 to samples_per_knot after the last control point
+        self.weights = np.array([get_cubic_b_spline_weights(count / samples_per_knot)
+                                 for count in range(1, samples_per_knot + 1)])
+        self.control_points = None
+        self.window_sum = None
+        self.window_count = 0
+
+    @property
+    def lag(self):
+        """Number of samples the output is behind a steadily moving input"""
+        return 2.5 * self.samples_per_knot - 0.5
+
+    def reset(self, sample):
+        """Start a new stream that is at rest at sample, the first outputs equal it"""
+        sample = np.asarray(sample, dtype=np.float64)
+        self.control_points = np.tile(sample, (4, 1))
+        self.window_sum = np.zeros_like(sample)
+        self.window_count = 0
+
+    def update(self, sample):
+        """
+        :param sample: array with the latest input, the same length for the whole stream
+        :return: the smoothed value for this step
+        """
+        sample = np.asarray(sample, dtype=np.float64)
+        if self.control_points is None or self.control_points.shape[1:] != sample.shape:
+            self.reset(sample)
+
+        self.window_sum += sample
+        self.window_count += 1
+        smoothed = self.weights[self.window_count - 1] @ self.control_points
+
+        if self.window_count == self.samples_per_knot:
+            # the end of this segment is the start of the next one, so the output stays smooth
+            self.control_points[:-1] = self.control_points[1:]
+            self.control_points[-1] = self.window_sum / self.samples_per_knot
+            self.window_sum[:] = 0.0
+            self.window_count = 0
+        return smoothed
+
+
+class PoseStreamFilter:
+    """
+    FixedLagSplineFilter for poses, the position and the orientation are smoothed together.
+    Poses with alpha, beta and gamma are smoothed on those angles, poses with an euler_matrix (i.e. from the camera)
+    on the entries of the matrix, which is made a rotation again afterwards.
+    """
+
+    def __init__(self, samples_per_knot=3):
+        self.spline_filter = FixedLagSplineFilter(samples_per_knot)
+        self.uses_euler_matrix = None
+
+    @property
+    def lag(self):
+        return self.spline_filter.lag
+
+    def reset(self, pose):
+        self.uses_euler_matrix = pose.euler_matrix is not None
+        self.spline_filter.reset(self.pose_to_sample(pose))
+
+    def update(self, pose):
+        """:return: a new smoothed pose, with the flip of the given pose"""
+        if self.uses_euler_matrix != (pose.euler_matrix is not None):
+            self.reset(pose)
+
+        smoothed = self.spline_filter.update(self.pose_to_sample(pose))
+        if self.uses_euler_matrix:
+            # the closest rotation matrix to the smoothed entries
+            u, _, vt = np.linalg.svd(smoothed[3:].reshape(3, 3))
+            return Pose(smoothed[0], smoothed[1], smoothed[2], flip=pose.flip, time=pose.time,
+                        euler_matrix=u @ vt)
+        return Pose(smoothed[0], smoothed[1], smoothed[2], flip=pose.flip, alpha=smoothed[3], beta=smoothed[4],
+                    gamma=smoothed[5], time=pose.time)
+
+    def pose_to_sample(self, pose):
+        if self.uses_euler_matrix:
+            return np.concatenate(([pose.x, pose.y, pose.z], np.asarray(pose.euler_matrix).ravel()))
+        return np.array([pose.x, pose.y, pose.z, pose.alpha, pose.beta, pose.gamma])
@@ -1,9 +1,12 @@
 from src.global_constants import recommended_max_servo_speed
+from src.robot_controllers.dynamixel_robot.servo_configurations import servo_configs
 import numpy as np
 
 
 def get_recommended_wait_time(current_angles, new_angles):
     recommended_time = 0
+    if current_angles is None:
+        return recommended_time
     for current_angle, new_angle in zip(current_angles, new_angles):
         delta_angle = current_angle - new_angle
         if delta_angle == 0:
@@ -15,6 +18,28 @@ def get_recommended_wait_time(current_angles, new_angles):
     return recommended_time
 
 
+def get_servo_joint_limits(servos=None):
+    """
+    The limits the servos of joint 1 to 6 are configured with (profile velocity and profile acceleration)
+    :param servos: list of Servo for joint 1 to 6 (more are ignored), defaults to the servos of the dynamixel robot
+    :return: arrays with the maximum velocity in rad/s and acceleration in rad/s^2 of every joint, starting at 1
+    """
+    if servos is None:
+        servos = servo_configs
+
+    velocity_limits = np.zeros(7, dtype=np.float64)
+    acceleration_limits = np.zeros(7, dtype=np.float64)
+    for joint, servo in enumerate(servos[:6], start=1):
+        velocity_limits[joint] = servo.get_max_joint_velocity()
+        acceleration_limits[joint] = servo.get_max_joint_acceleration()
+    return velocity_limits, acceleration_limits
+
+
+def get_joint_speed_limits():
+    """The speed every joint is assumed to move at in get_recommended_wait_time, the array starts at 1"""
+    return np.full(7, recommended_max_servo_speed, dtype=np.float64)
+
+
 def servo_1_check(positions):
     if positions[1] > 2500 or positions[1] < 0:
         print()
@@ -0,0 +1,145 @@
+import logging as log
+import time
+
+import numpy as np
+
+import src.global_constants
+
+
+class ExecutionStats:
+    """Timing of a single run of a TrajectoryExecutor, all times are in seconds"""
+
+    def __init__(self, period):
+        self.period = period
+        self.setpoints = 0
+        self.overruns = 0
+        self.first_send_time = None
+        self.last_send_time = None
+        self.max_jitter = 0.0
+        self._total_jitter = 0.0
+
+    def record(self, deadline, send_time, overrun):
+        """:param overrun: the setpoint was so late that the schedule was restarted from send_time"""
+        jitter = send_time - deadline
+        self.setpoints += 1
+        self.overruns += int(overrun)
+        self.max_jitter = max(self.max_jitter, jitter)
+        self._total_jitter += jitter
+        if self.first_send_time is None:
+            self.first_send_time = send_time
+        self.last_send_time = send_time
+
+    @property
+    def mean_jitter(self):
+        return self._total_jitter / self.setpoints if self.setpoints > 0 else 0.0
+
+    @property
+    def duration(self):
+        """Time between sending the first and the last setpoint"""
+        if self.setpoints == 0:
+            return 0.0
+        return self.last_send_time - self.first_send_time
+
+    @property
+    def achieved_rate(self):
+        """Setpoints per second that were actually sent"""
+        duration = self.duration
+        return (self.setpoints - 1) / duration if duration > 0 else 0.0
+
+    def __str__(self):
+        return 'EXECUTION: setpoints={} duration={:.3f}s rate={:.1f}Hz (target {:.1f}Hz) ' \
+               'jitter mean={:.2f}ms max={:.2f}ms overruns={}'.format(self.setpoints, self.duration,
+                                                                     self.achieved_rate, 1 / self.period,
+                                                                     self.mean_jitter * 1000, self.max_jitter * 1000,
+                                                                     self.overruns)
+
+
+class TrajectoryExecutor:
+    """
+    Sends setpoints to the servos at absolute deadlines on a monotonic clock. Setpoint k is due at the start plus the
+    sum of the waiting times before it, the time spent calculating a setpoint or writing it to the servos is taken out
+    of the wait instead of being added to it, so a move of 4 seconds takes 4 seconds.
+    The next setpoint is calculated right after the current one is sent, while the servos are moving.
+    When a setpoint is more than a period late it counts as an overrun and the schedule continues from that moment,
+    the setpoints that were missed are not sent in a burst to catch up.
+    """
+
+    def __init__(self, servo_controller, rate=None, clock=time.monotonic, sleep=time.sleep):
+        """
+        :param servo_controller: receives the setpoints with move_servos
+        :param rate: setpoints per second, defaults to global_constants.steps_per_second
+        :param clock: monotonic clock in seconds, only replaced in tests
+        :param sleep: function that sleeps a number of seconds, only replaced in tests
+        """
+        if rate is None:
+            rate = src.global_constants.steps_per_second
+        if rate <= 0:
+            raise ValueError("rate should be positive")
+        self.servo_controller = servo_controller
+        self.period = 1.0 / rate
+        self.clock = clock
+        self.sleep = sleep
+
+    def follow(self, trajectory, get_wait_time=None):
+        """
+        Send every row of a (steps, 7) array of angles, or every angles a generator yields
+        :param get_wait_time: optional function(previous_angles, angles) that returns the minimum time to wait after
+                              sending angles, i.e. get_recommended_wait_time, previous_angles is None for the first
+                              setpoint, never less than one period is waited
+        :return: ExecutionStats
+        """
+        setpoints = iter(trajectory)
+        return self.run(lambda: next(setpoints, None), get_wait_time)
+
+    def follow_timed(self, trajectory, timestamps):
+        """
+        Send every row of a (steps, 7) array of angles at its timestamp
+        :param timestamps: (steps,) array of seconds, relative to the first one, steps closer than one period
+                           are sent one period apart
+        :return: ExecutionStats
+        """
+        wait_times = iter(np.diff(timestamps))
+        return self.follow(trajectory, get_wait_time=lambda previous_angles, angles: next(wait_times, 0.0))
+
+    def run(self, get_next_setpoint, get_wait_time=None):
+        """
+        Keep sending setpoints until get_next_setpoint returns None, used by the control loops that calculate
+        the next angles from the latest input
+        :param get_next_setpoint: function that returns the next angles (array starts at 1) or None to stop
+        :param get_wait_time: see follow
+        :return: ExecutionStats
+        """
+        stats = ExecutionStats(self.period)
+        previous_angles = None
+        angles = get_next_setpoint()
+        deadline = self.clock()
+
+        while angles is not None:
+            now = self.clock()
+            if now < deadline:
+                self.sleep(deadline - now)
+                now = self.clock()
+
+            overrun = now - deadline > self.period
+            self.servo_controller.move_servos(angles)
+            stats.record(deadline, now, overrun)
+            if overrun:
+                deadline = now
+
+            wait_time = self.period
+            if get_wait_time is not None:
+                requested_wait_time = get_wait_time(previous_angles, angles)
+                # after an overrun the robot was standing still for a while, or was moved by something else in
+                # between (i.e. a recorded move that was played back), only wait one period then
+                if not overrun:
+                    wait_time = np.maximum(wait_time, requested_wait_time)
+            deadline += wait_time
+            previous_angles = angles
+
+            angles = get_next_setpoint()
+
+        if stats.overruns > 0:
+            log.warning(stats)
+        else:
+            log.debug(stats)
+        return stats
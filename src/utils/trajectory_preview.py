@@ -0,0 +1,196 @@
+"""
+Renders a preview of a move to a png or svg image without opening a window: the knots, the path of the end
+effector, the steps that are outside of the workspace limits and the angles of every joint over time.
+Rendering is done with the Agg backend of matplotlib on a background thread and the images are cached by the hash
+of the move, so showing the same recorded move again costs nothing and the control loops never wait for a plot.
+"""
+
+import copy
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.global_constants import WorkSpaceLimits
+from src.kinematics.kinematics import batch_forward_position_kinematics, batch_forward_orientation_kinematics
+from src.kinematics.kinematics_utils import get_orientation_angles
+from src.utils.movement_exception import MovementException
+from src.utils.movement_utils import get_workspace_violations
+from src.utils.robot_controller_utils import get_servo_joint_limits
+from src.utils.trajectory_timing import get_time_optimal_trajectory
+
+PREVIEW_VERSION = 1
+# largest distance in cm between a step of the requested path and where its angles put the end effector
+reach_tolerance = 0.01
+MIME_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+
+def get_move_hash(move, robot_config):
+    """:return: hex digest that changes whenever the move, or the robot config it is shown for, changes"""
+    header = {'version': PREVIEW_VERSION, 'type': type(move).__name__, 'time': move.time, 'center': move.center,
+              's': getattr(move, '_s', None), 'uses_workspace_limits': move.workspace_limits is not None,
+              'fingerprint': list(robot_config.fingerprint())}
+    digest = hashlib.sha1(json.dumps(header, sort_keys=True, default=float).encode('utf-8'))
+    for pose in move.poses:
+        digest.update(np.array([pose.x, pose.y, pose.z, pose.alpha, pose.beta, pose.gamma, pose.flip],
+                               dtype=np.float64).tobytes())
+        if pose.euler_matrix is not None:
+            digest.update(np.asarray(pose.euler_matrix, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def get_requested_path(move, angles, robot_config):
+    """
+    :param angles: (steps, 7) array of the angles of move._calculate_joint_trajectory
+    :return: (steps, 3) array of the positions the end effector is asked to reach and (steps, 3, 3) array of its
+             orientations, a move that interpolates the angles only asks for its first and last pose
+    """
+    path = move.get_cartesian_path()
+    if path is not None:
+        return path
+    positions = batch_forward_position_kinematics(angles, robot_config)[:, 4]
+    positions[0] = [move.poses[0].x, move.poses[0].y, move.poses[0].z]
+    positions[-1] = [move.poses[-1].x, move.poses[-1].y, move.poses[-1].z]
+    return positions, batch_forward_orientation_kinematics(angles)
+
+
+def get_preview_data(move, servo_controller, workspace_limits=WorkSpaceLimits):
+    """
+    Everything a preview shows, the path is calculated without the workspace limits of the move, so a move that
+    can't be compiled because it leaves the workspace can still be shown
+    :return: dict with knots (poses, 3), angles (steps, 7), timestamps (steps,) or None when the path can't be timed,
+             positions (steps, 3) of the end effector, the requested path (path steps, 3), violations (path steps,) of
+             booleans and error, a message or None.
+             A step of the requested path is a violation when it is outside of the workspace limits or when the
+             inverse kinematics could not reach it, which clamps the targets it can't reach to reachable angles
+    """
+    knots = np.array([[pose.x, pose.y, pose.z] for pose in move.poses], dtype=np.float64).reshape(-1, 3)
+    data = {'knots': knots, 'angles': np.zeros((0, 7)), 'timestamps': None, 'positions': np.zeros((0, 3)),
+            'requested_path': np.zeros((0, 3)), 'violations': np.zeros(0, dtype=bool), 'error': None}
+
+    robot_config = servo_controller.robot_config
+    compiled_trajectory = move.__dict__.get('compiled_trajectory')
+    try:
+        unlimited_move = copy.copy(move)
+        unlimited_move.workspace_limits = None
+        requested_angles, _ = unlimited_move._calculate_joint_trajectory(move.poses, servo_controller)
+        requested_angles = np.asarray(requested_angles, dtype=np.float64)
+        requested_positions, requested_orientations = get_requested_path(unlimited_move, requested_angles,
+                                                                         robot_config)
+        if compiled_trajectory is not None and compiled_trajectory.matches(robot_config):
+            angles, timestamps = compiled_trajectory.angles, compiled_trajectory.timestamps
+        else:
+            try:
+                angles, timestamps = get_time_optimal_trajectory(requested_angles, *get_servo_joint_limits())
+            except MovementException:
+                angles, timestamps = requested_angles, None
+    except MovementException as e:
+        data['error'] = str(e)
+        return data
+
+    angles = np.asarray(angles, dtype=np.float64)
+    positions = batch_forward_position_kinematics(angles, robot_config)[:, 4]
+    reached_positions = batch_forward_position_kinematics(requested_angles, robot_config)[:, 4]
+    violations = np.linalg.norm(reached_positions - requested_positions, axis=1) > reach_tolerance
+    if workspace_limits is not None and len(requested_positions) > 0:
+        alphas, gammas = get_orientation_angles(requested_orientations)
+        violations |= get_workspace_violations(requested_positions[:, 0], requested_positions[:, 1],
+                                               requested_positions[:, 2], workspace_limits, alphas, gammas)
+    data.update(angles=angles, timestamps=timestamps, positions=positions, requested_path=requested_positions,
+                violations=violations)
+    return data
+
+
+def render_preview(data, file_format='png', dpi=100):
+    """
+    :param data: see get_preview_data
+    :param file_format: png or svg
+    :return: the image as bytes
+    """
+    from io import BytesIO
+    # only the figure classes, pyplot would pick an interactive backend and keep track of the figures
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(10, 5), dpi=dpi)
+    FigureCanvasAgg(figure)
+    ax3d = figure.add_subplot(1, 2, 1, projection='3d')
+    ax3d.set_xlim3d(-40, 40)
+    ax3d.set_ylim3d(0, 40)
+    ax3d.set_zlim3d(0, 40)
+    knots = data['knots']
+    ax3d.plot(knots[:, 0], knots[:, 1], knots[:, 2], 'r*', label='poses')
+    positions = data['positions']
+    if len(positions) > 0:
+        ax3d.plot(positions[:, 0], positions[:, 1], positions[:, 2], 'g', label='path')
+    requested_path = data['requested_path']
+    violations = requested_path[data['violations']]
+    if len(violations) > 0:
+        ax3d.plot(requested_path[:, 0], requested_path[:, 1], requested_path[:, 2], 'k:', label='requested path')
+        ax3d.plot(violations[:, 0], violations[:, 1], violations[:, 2], 'rx', label='outside workspace or unreachable')
+    ax3d.legend(loc='upper left', fontsize='small')
+
+    ax_joints = figure.add_subplot(1, 2, 2)
+    angles = data['angles']
+    if len(angles) > 0:
+        timestamps = data['timestamps']
+        x_values = timestamps if timestamps is not None else np.arange(len(angles))
+        for joint in range(1, 7):
+            ax_joints.plot(x_values, angles[:, joint], label='joint {}'.format(joint))
+        ax_joints.set_xlabel('time (s)' if timestamps is not None else 'step')
+        ax_joints.set_ylabel('angle (rad)')
+        ax_joints.legend(loc='upper right', fontsize='small')
+    if data['error'] is not None:
+        ax_joints.text(0.5, 0.5, data['error'], ha='center', va='center', wrap=True, transform=ax_joints.transAxes)
+
+    buffer = BytesIO()
+    figure.savefig(buffer, format=file_format)
+    return buffer.getvalue()
+
+
+class PreviewRenderer:
+    """Renders previews on a background thread and keeps the most recent ones, keyed by move hash and format"""
+
+    def __init__(self, servo_controller, workspace_limits=WorkSpaceLimits, cache_size=32):
+        self.servo_controller = servo_controller
+        self.workspace_limits = workspace_limits
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.RLock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='preview')
+
+    def request(self, move, file_format='png'):
+        """
+        Start rendering a preview, unless it is already rendered or being rendered
+        :return: concurrent.futures.Future with the image as bytes
+        """
+        if file_format not in MIME_TYPES:
+            raise ValueError("unsupported preview format {}".format(file_format))
+        key = (get_move_hash(move, self.servo_controller.robot_config), file_format)
+        with self.lock:
+            future = self.cache.get(key)
+            if future is not None:
+                self.cache.move_to_end(key)
+                return future
+            future = self.executor.submit(self._render, move, file_format)
+            self.cache[key] = future
+            future.add_done_callback(lambda done: self._forget_failed(key, done))
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return future
+
+    def _render(self, move, file_format):
+        return render_preview(get_preview_data(move, self.servo_controller, self.workspace_limits), file_format)
+
+    def _forget_failed(self, key, future):
+        # so the next request tries again
+        if future.exception() is not None:
+            with self.lock:
+                if self.cache.get(key) is future:
+                    del self.cache[key]
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
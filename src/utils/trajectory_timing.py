@@ -0,0 +1,256 @@
+"""
+Time optimal parameterization (TOPP) of a path in joint space.
+The path is given by its samples (i.e. every step of a spline solved with the inverse kinematics), the geometry stays
+the same but the speed along the path is chosen as high as the velocity and acceleration limits of the joints allow,
+starting and stopping at rest.
+
+With s the arc length along the path in joint space, the velocity of joint j is q'_j(s) * ds/dt and the acceleration
+q'_j(s) * d2s/dt2 + q''_j(s) * (ds/dt)^2. Both are linear in x = (ds/dt)^2 and u = d2s/dt2, so the limits give
+a maximum x at every sample and a range of allowed u for every x. The acceleration along the path is constant between
+two samples, so the arc length is quadratic in time there, and the limits are checked at both ends of every segment.
+A backward pass finds the highest x at every sample from which the robot can still brake in time without leaving the
+allowed range anywhere after it, a forward pass then accelerates as hard as possible while staying below those speeds.
+"""
+
+from math import ceil
+
+import numpy as np
+from numba import jit
+from scipy.interpolate import CubicSpline
+
+import src.global_constants
+from src.utils.movement_exception import MovementException
+
+
+def get_time_optimal_trajectory(trajectory, velocity_limits, acceleration_limits, dt=None):
+    """
+    :param trajectory: (steps, 7) array of angles, only the shape of the path is used, not the timing
+    :param velocity_limits: array with the maximum velocity of every joint in rad/s, starts at 1
+    :param acceleration_limits: array with the maximum acceleration of every joint in rad/s^2, starts at 1
+    :param dt: time between the steps of the result, defaults to one step of global_constants.steps_per_second
+    :return: (steps, 7) array of angles one dt apart and the (steps,) array of their timestamps
+    """
+    if dt is None:
+        dt = 1.0 / src.global_constants.steps_per_second
+
+    trajectory = np.ascontiguousarray(trajectory, dtype=np.float64)
+    if not np.all(np.isfinite(trajectory)):
+        raise MovementException("the trajectory contains angles that are not finite")
+
+    path = remove_repeated_steps(trajectory)
+    if len(path) < 2:
+        return trajectory[:1].copy(), np.zeros(min(len(trajectory), 1), dtype=np.float64)
+
+    arc_lengths, squared_speeds, sample_times = calculate_topp_profile(
+        path, np.ascontiguousarray(velocity_limits, dtype=np.float64),
+        np.ascontiguousarray(acceleration_limits, dtype=np.float64))
+
+    total_steps = int(ceil(sample_times[-1] / dt))
+    timestamps = np.arange(total_steps + 1, dtype=np.float64) * dt
+    arc_lengths_at_timestamps = get_arc_lengths_at(timestamps, arc_lengths, squared_speeds, sample_times)
+    # a spline through the samples, linear interpolation would make the joint velocities jump at every sample
+    angles = CubicSpline(arc_lengths, path, axis=0)(arc_lengths_at_timestamps)
+    # exactly where the path starts and ends, moves are chained on their end angles
+    angles[0] = path[0]
+    angles[-1] = path[-1]
+    return angles, timestamps
+
+
+def get_arc_lengths_at(timestamps, arc_lengths, squared_speeds, sample_times):
+    """Position along the path at every timestamp, interpolating linearly in time would make the speed jump"""
+    segments = np.clip(np.searchsorted(sample_times, timestamps, side='right') - 1, 0, len(sample_times) - 2)
+    segment_times = sample_times[segments + 1] - sample_times[segments]
+    # the last timestamp can be a little after the end of the path
+    elapsed = np.minimum(timestamps - sample_times[segments], segment_times)
+    segment_lengths = arc_lengths[segments + 1] - arc_lengths[segments]
+    accelerations = (squared_speeds[segments + 1] - squared_speeds[segments]) / (2 * segment_lengths)
+    quadratic = arc_lengths[segments] + np.sqrt(squared_speeds[segments]) * elapsed + 0.5 * accelerations * elapsed ** 2
+
+    # a segment that starts and ends at rest has no constant acceleration, it is only there for a path of one segment
+    at_rest = (squared_speeds[segments] <= 0) & (squared_speeds[segments + 1] <= 0)
+    linear = arc_lengths[segments] + segment_lengths * elapsed / segment_times
+    arc_lengths_at_timestamps = np.clip(np.where(at_rest, linear, quadratic), arc_lengths[segments],
+                                        arc_lengths[segments + 1])
+    arc_lengths_at_timestamps[timestamps >= sample_times[-1]] = arc_lengths[-1]
+    return arc_lengths_at_timestamps
+
+
+def remove_repeated_steps(trajectory, tolerance=1e-9):
+    """Drop steps that do not move, the arc length has to increase along the path"""
+    if len(trajectory) < 2:
+        return trajectory
+    moves = np.max(np.abs(np.diff(trajectory, axis=0)), axis=1) > tolerance
+    return trajectory[np.concatenate(([True], moves))]
+
+
+@jit(nopython=True, cache=True)
+def get_acceleration_range(first_derivative, second_derivative, x, acceleration_limits):
+    """:return: the lowest and highest d2s/dt2 that keeps every joint within its acceleration limit at (ds/dt)^2 = x"""
+    lowest = -np.inf
+    highest = np.inf
+    for joint in range(1, first_derivative.shape[0]):
+        limit = acceleration_limits[joint]
+        if limit <= 0:
+            continue
+        derivative = first_derivative[joint]
+        centripetal = second_derivative[joint] * x
+        if abs(derivative) < 1e-12:
+            continue
+        bound_1 = (-limit - centripetal) / derivative
+        bound_2 = (limit - centripetal) / derivative
+        lowest = max(lowest, min(bound_1, bound_2))
+        highest = min(highest, max(bound_1, bound_2))
+    return lowest, highest
+
+
+@jit(nopython=True, cache=True)
+def get_maximum_squared_speed(first_derivative, second_derivative, velocity_limits, acceleration_limits):
+    """:return: the highest (ds/dt)^2 at a sample that the velocity limits and the acceleration limits allow"""
+    maximum = np.inf
+    for joint in range(1, first_derivative.shape[0]):
+        derivative = abs(first_derivative[joint])
+        if velocity_limits[joint] > 0 and derivative > 1e-12:
+            maximum = min(maximum, (velocity_limits[joint] / derivative) ** 2)
+        # a joint that does not move along the path can still be accelerated by the curvature
+        if acceleration_limits[joint] > 0 and derivative <= 1e-12 and abs(second_derivative[joint]) > 1e-12:
+            maximum = min(maximum, acceleration_limits[joint] / abs(second_derivative[joint]))
+
+    # the allowed range of d2s/dt2 gets smaller for higher speeds, find where it becomes empty
+    lowest, highest = get_acceleration_range(first_derivative, second_derivative, maximum, acceleration_limits)
+    if lowest <= highest:
+        return maximum
+    low = 0.0
+    high = maximum
+    for _ in range(50):
+        middle = 0.5 * (low + high)
+        lowest, highest = get_acceleration_range(first_derivative, second_derivative, middle, acceleration_limits)
+        if lowest <= highest:
+            low = middle
+        else:
+            high = middle
+    return low
+
+
+@jit(nopython=True, cache=True)
+def get_segment_acceleration_range(first_derivatives, second_derivatives, i, x, segment_length, acceleration_limits):
+    """
+    :return: the lowest and highest constant d2s/dt2 between sample i and i + 1 that keeps every joint within its
+             acceleration limit at both samples, when (ds/dt)^2 = x at sample i
+    """
+    lowest = -np.inf
+    highest = np.inf
+    for joint in range(1, first_derivatives.shape[1]):
+        limit = acceleration_limits[joint]
+        if limit <= 0:
+            continue
+        for sample in range(i, i + 2):
+            derivative = first_derivatives[sample, joint]
+            if sample > i:
+                # (ds/dt)^2 at the next sample is x + 2 * segment_length * d2s/dt2
+                derivative += 2 * segment_length * second_derivatives[sample, joint]
+            centripetal = second_derivatives[sample, joint] * x
+            if abs(derivative) < 1e-12:
+                continue
+            bound_1 = (-limit - centripetal) / derivative
+            bound_2 = (limit - centripetal) / derivative
+            lowest = max(lowest, min(bound_1, bound_2))
+            highest = min(highest, max(bound_1, bound_2))
+    return lowest, highest
+
+
+@jit(nopython=True, cache=True)
+def can_reach_next_sample(first_derivatives, second_derivatives, i, x, segment_length, next_squared_speed,
+                          acceleration_limits):
+    """:return: whether an allowed d2s/dt2 at (ds/dt)^2 = x leads to a (ds/dt)^2 between 0 and next_squared_speed"""
+    lowest, highest = get_segment_acceleration_range(first_derivatives, second_derivatives, i, x, segment_length,
+                                                     acceleration_limits)
+    lowest = max(lowest, -x / (2 * segment_length))
+    highest = min(highest, (next_squared_speed - x) / (2 * segment_length))
+    return lowest <= highest
+
+
+@jit(nopython=True, cache=True)
+def get_controllable_squared_speed(first_derivatives, second_derivatives, i, maximum, segment_length,
+                                   next_squared_speed, acceleration_limits):
+    """
+    :return: the highest (ds/dt)^2 at sample i, at most maximum, from which the next sample can be reached at a
+             (ds/dt)^2 of at most next_squared_speed, standing still always can
+    """
+    if can_reach_next_sample(first_derivatives, second_derivatives, i, maximum, segment_length, next_squared_speed,
+                             acceleration_limits):
+        return maximum
+    # the (ds/dt)^2 that can reach the next sample form an interval that starts at 0
+    low = 0.0
+    high = maximum
+    for _ in range(50):
+        middle = 0.5 * (low + high)
+        if can_reach_next_sample(first_derivatives, second_derivatives, i, middle, segment_length,
+                                 next_squared_speed, acceleration_limits):
+            low = middle
+        else:
+            high = middle
+    return low
+
+
+@jit(nopython=True, cache=True)
+def calculate_topp_profile(path, velocity_limits, acceleration_limits):
+    """:return: arc length, (ds/dt)^2 and time of every sample of the path"""
+    number_of_samples = path.shape[0]
+    number_of_joints = path.shape[1]
+
+    # arc length along the path
+    segment_lengths = np.zeros(number_of_samples - 1, dtype=np.float64)
+    for i in range(number_of_samples - 1):
+        segment_lengths[i] = np.sqrt(np.sum((path[i + 1, 1:] - path[i, 1:]) ** 2))
+
+    # first and second derivative of the angles to the arc length
+    first_derivatives = np.zeros((number_of_samples, number_of_joints), dtype=np.float64)
+    second_derivatives = np.zeros((number_of_samples, number_of_joints), dtype=np.float64)
+    for i in range(number_of_samples):
+        if i == 0:
+            first_derivatives[i] = (path[1] - path[0]) / segment_lengths[0]
+        elif i == number_of_samples - 1:
+            first_derivatives[i] = (path[i] - path[i - 1]) / segment_lengths[i - 1]
+        else:
+            forward = (path[i + 1] - path[i]) / segment_lengths[i]
+            backward = (path[i] - path[i - 1]) / segment_lengths[i - 1]
+            first_derivatives[i] = 0.5 * (forward + backward)
+            second_derivatives[i] = 2 * (forward - backward) / (segment_lengths[i] + segment_lengths[i - 1])
+
+    maximum_squared_speeds = np.zeros(number_of_samples, dtype=np.float64)
+    for i in range(number_of_samples):
+        maximum_squared_speeds[i] = get_maximum_squared_speed(first_derivatives[i], second_derivatives[i],
+                                                              velocity_limits, acceleration_limits)
+
+    # backward pass, the highest (ds/dt)^2 at every sample from which the robot can still stop at the end
+    controllable_squared_speeds = np.zeros(number_of_samples, dtype=np.float64)
+    for i in range(number_of_samples - 2, -1, -1):
+        controllable_squared_speeds[i] = get_controllable_squared_speed(
+            first_derivatives, second_derivatives, i, maximum_squared_speeds[i], segment_lengths[i],
+            controllable_squared_speeds[i + 1], acceleration_limits)
+
+    # forward pass, start at rest and accelerate as hard as the limits and the speeds of the backward pass allow
+    squared_speeds = np.zeros(number_of_samples, dtype=np.float64)
+    for i in range(number_of_samples - 1):
+        _, highest = get_segment_acceleration_range(first_derivatives, second_derivatives, i, squared_speeds[i],
+                                                    segment_lengths[i], acceleration_limits)
+        acceleration = min(highest, (controllable_squared_speeds[i + 1] - squared_speeds[i]) / (2 * segment_lengths[i]))
+        squared_speeds[i + 1] = max(squared_speeds[i] + 2 * segment_lengths[i] * acceleration, 0.0)
+
+    sample_times = np.zeros(number_of_samples, dtype=np.float64)
+    for i in range(number_of_samples - 1):
+        speed_sum = np.sqrt(squared_speeds[i]) + np.sqrt(squared_speeds[i + 1])
+        if speed_sum > 1e-12:
+            segment_time = 2 * segment_lengths[i] / speed_sum
+        else:
+            # both ends at rest (a path of a single segment), accelerate for half of it and brake for the other half
+            lowest, highest = get_acceleration_range(first_derivatives[i], second_derivatives[i], 0.0,
+                                                     acceleration_limits)
+            acceleration = max(min(highest, -lowest), 1e-12)
+            segment_time = 2 * np.sqrt(segment_lengths[i] / acceleration)
+        sample_times[i + 1] = sample_times[i] + segment_time
+
+    arc_lengths = np.zeros(number_of_samples, dtype=np.float64)
+    for i in range(number_of_samples - 1):
+        arc_lengths[i + 1] = arc_lengths[i] + segment_lengths[i]
+    return arc_lengths, squared_speeds, sample_times
@@ -100,6 +100,10 @@ class XboxPoseUpdater:
         dy = self.dt * self.v_y
         dz = self.dt * self.v_z
 
+        alpha, gamma = self.get_orientation(old_pose, center)
+        alpha = np.clip(alpha, -pi / 2, pi / 2)
+        gamma = np.clip(gamma, -pi / 2, pi / 2)
+
         if self.workspace_limits is None:
             x = old_pose.x + dx
             y = old_pose.y + dy
@@ -116,9 +120,9 @@ class XboxPoseUpdater:
                 x, y = new_x, new_y
                 z = new_z if new_z > self.workspace_limits.z_min else old_pose.z
 
-        alpha, gamma = self.get_orientation(old_pose, center)
-        alpha = np.clip(alpha, -pi / 2, pi / 2)
-        gamma = np.clip(gamma, -pi / 2, pi / 2)
+            reachability_grid = getattr(self.workspace_limits, 'reachability_grid', None)
+            if reachability_grid is not None and not reachability_grid.is_reachable(x, y, z, alpha, gamma):
+                x, y, z = old_pose.x, old_pose.y, old_pose.z
 
         return Pose(x, y, z, flip=old_pose.flip, alpha=alpha, gamma=gamma, beta=0.0)
 
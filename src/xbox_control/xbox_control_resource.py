@@ -2,7 +2,7 @@ from __future__ import division
 
 import threading
 
-from flask import Blueprint, request
+from flask import Blueprint, request, Response
 from flask import jsonify
 
 import src.global_constants
@@ -24,7 +24,7 @@ running_thread = None
 
 @xbox_api.route('/test', methods=['GET'])
 def test():
-    resp = jsonify(Pose(5.5, 2.0, 3.0).__dict__)
+    resp = jsonify(Pose(5.5, 2.0, 3.0).to_json())
     return resp
 
 
@@ -151,6 +151,28 @@ def speed():
     resp = jsonify(success=True)
     return resp
 
+
+@xbox_api.route('/preview/<int:index>', methods=['GET'])
+def preview(index):
+    """Image of a recorded move, answers 202 while it is still being rendered in the background"""
+    from src.utils.trajectory_preview import MIME_TYPES
+    file_format = request.args.get('format', 'png')
+    if file_format not in MIME_TYPES:
+        return jsonify(success=False), 400
+
+    xbox_robot_controller = global_objects.get_xbox_robot_controller(src.global_constants.dynamixel_robot_arm_port)
+    recorded_moves = xbox_robot_controller.recorded_moves
+    if not (0 <= index < len(recorded_moves)):
+        return jsonify(success=False), 404
+
+    preview_renderer = global_objects.get_preview_renderer(src.global_constants.dynamixel_robot_arm_port)
+    future = preview_renderer.request(recorded_moves[index], file_format)
+    if not future.done():
+        return jsonify(success=True, ready=False), 202
+    if future.exception() is not None:
+        return jsonify(success=False, error=str(future.exception())), 500
+    return Response(future.result(), mimetype=MIME_TYPES[file_format])
+
 # @xbox_api.route('/video_feed')
 # def video_feed():
 #     return Response(get_image(), mimetype='multipart/x-mixed-replace; boundary=frame')
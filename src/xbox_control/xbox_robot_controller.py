@@ -1,21 +1,26 @@
 from __future__ import division
 
-import json
 import threading
 from copy import copy
 
-import jsonpickle
 import numpy as np
 from src.reinforcementlearning.environment.scenario import medium_scenarios
 
 from src.global_constants import WorkSpaceLimits
+from src.kinematics.collision import is_in_collision
+from src.kinematics.jacobian_ik import inverse_kinematics_with_fallback
+from src.kinematics.kinematics import inverse_kinematics_closest
 from src.kinematics.kinematics_utils import Pose
 from src.utils.decorators import synchronized_with_lock, timer
 from src.utils.linalg_utils import get_center
 from src.utils.movement import PoseToPoseMovement, SplineMovement
 from src.utils.movement_exception import MovementException
+from src.utils.move_file import save_moves, load_moves
+from src.utils.move_library import get_blended_trajectory
 from src.utils.movement_utils import pose_to_pose, from_current_angles_to_pose
-from time import sleep
+from src.utils.online_spline import PoseStreamFilter
+from src.utils.robot_controller_utils import get_joint_speed_limits, get_recommended_wait_time
+from src.utils.trajectory_executor import TrajectoryExecutor
 import logging as log
 
 
@@ -38,6 +43,12 @@ class XboxRobotController:
         self.move_speed = 10
         self.recorded_moves = []
         self.gripper_state = 0
+        # the angles that were sent to the servos last
+        self.previous_angles = None
+        # pick the wrist flip that is closest to the current angles instead of using buttons.a
+        self.auto_flip = True
+        # smooths the poses of the controller before they are sent to the robot, current_pose is the raw input
+        self.pose_filter = PoseStreamFilter()
         self.current_scenario_id = None
         # dependency inject?
         self.scenarios = medium_scenarios
@@ -89,6 +100,7 @@ class XboxRobotController:
 
         self.servo_controller.enable_servos()
         self.current_pose = copy(self.start_pose)
+        self.auto_flip = True
         if self.thread is None:
             self.thread = threading.Thread(target=self.__start_internal, args=())
             self.thread.start()
@@ -108,22 +120,53 @@ class XboxRobotController:
 
         # self.current_pose = pose_to_pose(self.current_pose, Pose(0, 25, 10), self.servo_controller, 2)
 
-        pose_update_sleep_time = self.pose_updater.dt
-
-        while True:
-            if self.is_done():
-                break
-
-            self.current_pose = self.pose_updater.get_updated_pose_from_controller(self.current_pose,
-                                                                                   self.find_center_mode, self.center)
-            recommended_time, time_taken = self.servo_controller.move_to_pose(self.current_pose)
-            self.handle_buttons()
-
-            time_to_sleep = np.maximum(np.maximum(recommended_time, pose_update_sleep_time) - time_taken, 0)
-            sleep(time_to_sleep)
+        self.previous_angles = self.servo_controller.pose_to_angles(self.current_pose)
+        self.pose_filter.reset(self.current_pose)
+        executor = TrajectoryExecutor(self.servo_controller, rate=1.0 / self.pose_updater.dt)
+        stats = executor.run(self.get_next_angles, get_wait_time=get_recommended_wait_time)
+        log.info(stats)
 
         self.stop_robot()
 
+    def get_next_angles(self):
+        """
+        One step of the control loop, called by the executor right after the previous angles were sent
+        :return: the angles to send next or None to stop
+        """
+        if self.is_done():
+            return None
+
+        pose_before_buttons = self.current_pose
+        self.handle_buttons()
+        if self.current_pose is not pose_before_buttons:
+            # a recorded move or reset moved the robot somewhere else
+            self.previous_angles = self.servo_controller.pose_to_angles(self.current_pose)
+            self.pose_filter.reset(self.current_pose)
+
+        previous_pose = self.current_pose
+        self.current_pose = self.pose_updater.get_updated_pose_from_controller(self.current_pose,
+                                                                               self.find_center_mode, self.center)
+        target_pose = self.pose_filter.update(self.current_pose)
+        if self.auto_flip:
+            target_pose.flip = select_closest_flip(self.previous_angles, target_pose,
+                                                   self.servo_controller.robot_config)
+            self.current_pose.flip = target_pose.flip
+
+        angles, is_exact = inverse_kinematics_with_fallback(target_pose, self.servo_controller.robot_config,
+                                                            self.previous_angles)
+        if is_in_collision(angles, self.servo_controller.robot_config, WorkSpaceLimits.collision_boxes,
+                           WorkSpaceLimits.z_min):
+            # stay where we are, the next input of the controller probably moves away from the collision
+            angles = self.previous_angles
+            is_exact = False
+        if not is_exact:
+            # the robot only gets as close as it can, don't let the pose drift further away from the robot,
+            # the filter would otherwise keep the rejected poses and still move towards them
+            self.current_pose = previous_pose
+            self.pose_filter.reset(previous_pose)
+        self.previous_angles = angles
+        return angles
+
     def stop_robot(self):
         from_current_angles_to_pose(self.start_pose, self.servo_controller, 4)
         self.servo_controller.disable_servos()
@@ -144,7 +187,10 @@ class XboxRobotController:
         elif buttons.b:
             self.current_pose = reset_orientation(self.current_pose, self.dynamixel_robot_config,
                                                   self.servo_controller)
+            self.auto_flip = True
         elif buttons.a:
+            # flipping by hand turns off picking the flip automatically, until the orientation is reset or a restart
+            self.auto_flip = False
             self.current_pose.flip = not self.current_pose.flip
         elif buttons.y:
             self.recorded_positions.append(self.current_pose)
@@ -197,17 +243,12 @@ class XboxRobotController:
     def save_recorded_moves_to_file(self, filename):
         if len(self.recorded_moves) < 1:
             return False
-        json_string = jsonpickle.encode(self.recorded_moves, make_refs=False)
-        with open(filename, 'w') as outfile:
-            json.dump(json.loads(json_string), outfile, indent=4)
+        save_moves(filename, self.recorded_moves)
         return True
 
     @synchronized_with_lock("lock")
     def restore_recorded_moves_from_file(self, filename):
-        with open(filename, 'r') as infile:
-            string = infile.read()
-        moves = jsonpickle.decode(string)
-        self.recorded_moves = moves
+        self.recorded_moves = load_moves(filename)
 
     @synchronized_with_lock("lock")
     def clear_recorded_moves_and_positions(self):
@@ -235,31 +276,35 @@ class XboxRobotController:
         return True
 
     def playback_recorded_moves(self, recorded_moves):
+        """Play the moves as one blended trajectory, the robot does not stop between the moves"""
         recorded_moves[0].go_to_start_of_move(self.servo_controller)
         try:
-            for move in recorded_moves:
-                move.move(self.servo_controller)
+            angles, timestamps = get_blended_trajectory(recorded_moves, self.servo_controller, WorkSpaceLimits,
+                                                        start_angles=self.servo_controller.get_current_angles())
         except MovementException as e:
             log.warning(e)
             from_current_angles_to_pose(self.start_pose, self.servo_controller, 4)
             return self.start_pose
 
-        return recorded_moves[-1].poses[-1]
+        TrajectoryExecutor(self.servo_controller).follow_timed(angles, timestamps)
+        return recorded_moves[-1].get_joint_trajectory(self.servo_controller)[1]
 
 
 def create_move(servo_controller, poses, speed, center, workspace_limits):
     time = determine_time(poses, speed)
 
     if len(poses) == 2:  # and np.allclose([poses[0].x, poses[0].y, poses[0].z], [poses[1].x, poses[1].y, poses[1].z]):
-        return PoseToPoseMovement(poses, time, center, workspace_limits)  # orientation adjustment
+        move = PoseToPoseMovement(poses, time, center, workspace_limits)  # orientation adjustment
+    else:
+        move = SplineMovement(poses, time, center, workspace_limits)
 
-    move = SplineMovement(poses, time, center, workspace_limits)
     try:
-        is_ok = move.check_workspace_limits(servo_controller, workspace_limits)
+        # the angles are only calculated here, playing the move back or saving it uses them as they are
+        move.compile(servo_controller)
     except MovementException:
         print("invalid move")
         return None
-    return move if is_ok else None
+    return move
 
 
 def determine_time(poses, speed):
@@ -283,6 +328,16 @@ def determine_time(poses, speed):
     return dr / speed
 
 
+def select_closest_flip(previous_angles, new_pose, robot_config):
+    """
+    :return: the flip for new_pose that needs the least time to move to from previous_angles, only elbow up solutions
+             are considered because that is what the robot controllers use
+    """
+    _, flip, _ = inverse_kinematics_closest(new_pose, robot_config, previous_angles,
+                                            joint_speeds=get_joint_speed_limits(), allow_elbow_down=False)
+    return flip
+
+
 def reset_orientation(current_pose, dynamixel_robot_config, dynamixel_servo_controller):
     current_pose.flip = False
     dynamixel_robot_config.restore_initial_values()
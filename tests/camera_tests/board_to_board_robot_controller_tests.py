@@ -0,0 +1,33 @@
+import unittest
+
+import numpy as np
+
+from src import global_constants
+from src.camera_control.board_to_board_robot_controller import apply_workspace_limits
+from src.kinematics.kinematics_utils import calculate_euler_matrix_from_angles, RobotConfig
+from src.kinematics.reachability import ReachabilityGrid
+
+
+class ApplyWorkspaceLimitsTests(unittest.TestCase):
+
+    def setUp(self):
+        # a single voxel around (0, 30, 10) that is only reachable with alpha = pi / 2
+        reachable = np.zeros((1, 1, 1, 2, 1), dtype=bool)
+        reachable[0, 0, 0, 1, 0] = True
+        self.grid = ReachabilityGrid(reachable, [0, 30, 10], 2.0, [0, np.pi / 2], [0], RobotConfig().fingerprint())
+        self.previous_grid = getattr(global_constants.WorkSpaceLimits, 'reachability_grid', None)
+        global_constants.WorkSpaceLimits.reachability_grid = self.grid
+
+    def tearDown(self):
+        global_constants.WorkSpaceLimits.reachability_grid = self.previous_grid
+
+    def test_reachability_uses_the_orientation_of_the_target(self):
+        reachable_orientation = calculate_euler_matrix_from_angles(np.pi / 2, 0, 0)
+        unreachable_orientation = calculate_euler_matrix_from_angles(0, 0, 0)
+
+        self.assertEqual((0, 30, 10), apply_workspace_limits(0, 25, 10, 0, 30, 10, reachable_orientation))
+        self.assertEqual((0, 25, 10), apply_workspace_limits(0, 25, 10, 0, 30, 10, unreachable_orientation))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+import unittest
+
+import numpy as np
+
+from src.global_constants import WorkSpaceLimits
+from src.kinematics.collision import get_clearances, get_trajectory_clearances, is_in_collision, \
+    find_first_collision, get_capsule_points, get_box_array, segment_segment_distance, segment_box_distance, \
+    point_box_distance_and_normal, get_batch_clearances
+from src.kinematics.kinematics import inverse_kinematics, forward_position_kinematics
+from src.kinematics.kinematics_utils import RobotConfig, Pose
+
+test_config = RobotConfig(d1=13.92, a2=20, d4=22, d6=12)
+
+
+class Box:
+    """Same attributes as a BoxObstacle, without having to import pybullet"""
+
+    def __init__(self, dimensions, raw_base_center_position, alpha=0):
+        self.half_extends = [i / 2 for i in dimensions]
+        self.base_center_position = [raw_base_center_position[0], raw_base_center_position[1],
+                                     raw_base_center_position[2] + dimensions[2] / 2]
+        self.alpha = alpha
+
+
+class DistanceTests(unittest.TestCase):
+
+    def test_segment_segment_distance(self):
+        p1, q1 = np.array([0., 0, 0]), np.array([10., 0, 0])
+
+        self.assertAlmostEqual(3, segment_segment_distance(p1, q1, np.array([5., -5, 3]), np.array([5., 5, 3])))
+        self.assertAlmostEqual(5, segment_segment_distance(p1, q1, np.array([15., 0, 0]), np.array([20., 0, 0])))
+        self.assertAlmostEqual(2, segment_segment_distance(p1, q1, np.array([0., 2, 0]), np.array([10., 2, 0])))
+        self.assertAlmostEqual(0, segment_segment_distance(p1, q1, np.array([5., -1, 0]), np.array([5., 1, 0])))
+
+    def test_segment_box_distance(self):
+        box = np.array([0, 0, 0, 1, 1, 1, 0], dtype=np.float64)
+
+        self.assertAlmostEqual(2, segment_box_distance(np.array([-5., 0, 3]), np.array([5., 0, 3]), box), places=5)
+        self.assertAlmostEqual(0, segment_box_distance(np.array([-5., 0, 0]), np.array([5., 0, 0]), box), places=5)
+        self.assertAlmostEqual(np.sqrt(2), segment_box_distance(np.array([2., 2, 0]), np.array([5., 5, 0]), box),
+                               places=5)
+
+    def test_segment_box_distance_rotated_box(self):
+        box = np.array([0, 0, 0, 1, 1, 1, np.pi / 4], dtype=np.float64)
+
+        # the corner of the rotated box points along the x-axis
+        distance = segment_box_distance(np.array([3., -1, 0]), np.array([3., 1, 0]), box)
+
+        self.assertAlmostEqual(3 - np.sqrt(2), distance, places=5)
+
+    def test_point_box_distance_and_normal(self):
+        box = np.array([0, 0, 0, 1, 1, 1, 0], dtype=np.float64)
+        normal = np.empty(3)
+
+        self.assertAlmostEqual(2, point_box_distance_and_normal(np.array([3., 0, 0]), box, normal))
+        np.testing.assert_allclose([1, 0, 0], normal)
+        self.assertAlmostEqual(-0.5, point_box_distance_and_normal(np.array([0., 0, -0.5]), box, normal))
+        np.testing.assert_allclose([0, 0, -1], normal)
+
+    def test_point_box_distance_and_normal_rotated_box(self):
+        box = np.array([0, 0, 0, 1, 1, 1, np.pi / 2], dtype=np.float64)
+        normal = np.empty(3)
+
+        self.assertAlmostEqual(2, point_box_distance_and_normal(np.array([0., 3, 0]), box, normal))
+        np.testing.assert_allclose([0, 1, 0], normal, atol=1e-9)
+
+
+class CollisionTests(unittest.TestCase):
+
+    def setUp(self):
+        self.angles = inverse_kinematics(Pose(0, 30, 10), test_config)
+
+    def test_capsule_points_follow_forward_kinematics(self):
+        p1, p2, _, p4, p6 = forward_position_kinematics(self.angles, test_config)
+
+        points = get_capsule_points(self.angles, test_config)
+
+        np.testing.assert_allclose([[0, 0, 0], p1, p2, p4, p6], points, atol=1e-9)
+
+    def test_free_pose(self):
+        clearances = get_clearances(self.angles, test_config)
+
+        self.assertGreater(clearances[0], 0)
+        self.assertEqual(np.inf, clearances[1])
+        self.assertAlmostEqual(10, clearances[2])
+        self.assertFalse(is_in_collision(self.angles, test_config))
+
+    def test_box_obstacle(self):
+        boxes = get_box_array([Box([10, 10, 20], [0, 30, 0])])
+
+        self.assertTrue(is_in_collision(self.angles, test_config, boxes))
+        self.assertFalse(is_in_collision(self.angles, test_config, get_box_array([Box([10, 10, 20], [30, 0, 0])])))
+
+    def test_floor(self):
+        self.assertFalse(is_in_collision(self.angles, test_config, floor_height=5))
+        self.assertTrue(is_in_collision(self.angles, test_config, floor_height=11))
+
+    def test_pose_on_the_floor(self):
+        angles = inverse_kinematics(Pose(0, 30, WorkSpaceLimits.z_min), test_config)
+        trajectory = np.linspace(self.angles, angles, 20)
+
+        self.assertFalse(is_in_collision(angles, test_config, floor_height=WorkSpaceLimits.z_min))
+        self.assertEqual(-1, find_first_collision(trajectory, test_config, floor_height=WorkSpaceLimits.z_min))
+        self.assertTrue(is_in_collision(angles, test_config, floor_height=WorkSpaceLimits.z_min, floor_margin=1))
+
+    def test_self_collision(self):
+        # the forearm points straight down and the gripper is bent back through the base
+        angles = np.array([0, np.pi / 2, np.pi / 3, -np.pi / 3, 0, -np.pi / 2, 0])
+
+        clearances = get_clearances(angles, test_config)
+
+        self.assertLess(clearances[0], 0)
+        self.assertGreater(clearances[2], 0)
+
+    def test_trajectory(self):
+        folded = np.array([0, np.pi / 2, np.pi / 3, -np.pi / 3, 0, -np.pi / 2, 0])
+        trajectory = np.linspace(self.angles, folded, 50)
+
+        clearances = get_trajectory_clearances(trajectory, test_config)
+        first_collision = find_first_collision(trajectory, test_config)
+
+        self.assertEqual((50, 3), clearances.shape)
+        np.testing.assert_allclose(get_clearances(trajectory[20], test_config), clearances[20])
+        self.assertGreater(first_collision, 0)
+        self.assertLess(np.min(clearances[first_collision]), 0)
+        self.assertTrue(np.all(clearances[:first_collision] >= 0))
+        self.assertEqual(-1, find_first_collision(trajectory[:first_collision], test_config))
+
+    def test_batch_with_own_obstacles(self):
+        boxes = get_box_array([Box([10, 10, 30], [0, 30, 0]), Box([4, 4, 4], [30, 0, 0])])
+        batch_boxes = np.zeros((2, 2, 7))
+        batch_boxes[0] = boxes
+        batch_boxes[1, 0] = boxes[1]
+
+        clearances = get_batch_clearances(np.array([self.angles, self.angles]), test_config, batch_boxes, [2, 1])
+
+        np.testing.assert_allclose(get_clearances(self.angles, test_config, boxes=boxes), clearances[0])
+        np.testing.assert_allclose(get_clearances(self.angles, test_config, boxes=boxes[1:]), clearances[1])
+        self.assertLess(clearances[0, 1], 0)
+        self.assertGreater(clearances[1, 1], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+
+import numpy as np
+
+from src.kinematics.ik_cache import InverseKinematicsCache
+from src.kinematics.kinematics import inverse_kinematics
+from src.kinematics.kinematics_utils import RobotConfig, Pose
+
+test_config = RobotConfig(d1=10.0, a2=15.0, d4=25.0, d6=5.0)
+
+
+class InverseKinematicsCacheTests(unittest.TestCase):
+
+    def test_same_solution_as_inverse_kinematics(self):
+        cache = InverseKinematicsCache()
+        pose = Pose(5, 25, 20, alpha=0.2, gamma=-0.3)
+
+        np.testing.assert_allclose(inverse_kinematics(pose, test_config), cache.inverse_kinematics(pose, test_config))
+
+    def test_hits_and_misses(self):
+        cache = InverseKinematicsCache()
+        pose = Pose(5, 25, 20)
+
+        cache.inverse_kinematics(pose, test_config)
+        cache.inverse_kinematics(Pose(5, 25, 20 + 1e-6), test_config)
+        cache.inverse_kinematics(Pose(5, 25, 21), test_config)
+
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(2, cache.misses)
+        self.assertEqual(2, len(cache))
+
+    def test_flip_and_robot_config_are_part_of_the_key(self):
+        cache = InverseKinematicsCache()
+        other_config = RobotConfig(d1=10.0, a2=15.0, d4=25.0, d6=6.0)
+
+        cache.inverse_kinematics(Pose(5, 25, 20), test_config)
+        cache.inverse_kinematics(Pose(5, 25, 20, flip=True), test_config)
+        cache.inverse_kinematics(Pose(5, 25, 20), other_config)
+
+        self.assertEqual(0, cache.hits)
+        self.assertEqual(3, len(cache))
+
+    def test_least_recently_used_is_dropped(self):
+        cache = InverseKinematicsCache(max_size=2)
+        pose1, pose2, pose3 = Pose(5, 25, 20), Pose(5, 25, 21), Pose(5, 25, 22)
+
+        cache.inverse_kinematics(pose1, test_config)
+        cache.inverse_kinematics(pose2, test_config)
+        cache.inverse_kinematics(pose1, test_config)
+        cache.inverse_kinematics(pose3, test_config)
+
+        self.assertEqual(2, len(cache))
+        self.assertIn(cache.get_key(pose1, test_config), cache._cache)
+        self.assertNotIn(cache.get_key(pose2, test_config), cache._cache)
+
+    def test_returned_angles_can_be_changed(self):
+        cache = InverseKinematicsCache()
+        pose = Pose(5, 25, 20)
+
+        angles = cache.inverse_kinematics(pose, test_config)
+        angles[1] += 1.0
+
+        np.testing.assert_allclose(inverse_kinematics(pose, test_config), cache.inverse_kinematics(pose, test_config))
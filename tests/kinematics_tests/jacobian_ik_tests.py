@@ -0,0 +1,77 @@
+import unittest
+
+import numpy as np
+
+from src.kinematics.jacobian_ik import jacobian, inverse_kinematics_dls, inverse_kinematics_with_fallback, \
+    calculate_dh_frames
+from src.kinematics.kinematics import inverse_kinematics, forward_position_kinematics, forward_orientation_kinematics
+from src.kinematics.kinematics_utils import RobotConfig, Pose, joint_limits
+
+test_config = RobotConfig(d1=13.92, a2=20, d4=22, d6=12)
+
+
+def get_tip_frame(angles):
+    return calculate_dh_frames(np.asarray(angles, dtype=np.float64), test_config.d1, test_config.a2, test_config.d4,
+                               test_config.d6)[6]
+
+
+class JacobianTests(unittest.TestCase):
+
+    def setUp(self):
+        self.angles = np.array([0, 1.2, 0.8, 1.1, 0.3, 0.7, -0.4])
+
+    def test_frames_match_forward_kinematics(self):
+        frame = get_tip_frame(self.angles)
+
+        _, _, _, _, tip = forward_position_kinematics(self.angles, test_config)
+        np.testing.assert_allclose(tip, frame[:3, 3], atol=1e-9)
+        np.testing.assert_allclose(forward_orientation_kinematics(self.angles), frame[:3, :3], atol=1e-9)
+
+    def test_linear_velocity_matches_finite_differences(self):
+        result = jacobian(self.angles, test_config)
+        epsilon = 1e-6
+
+        self.assertEqual((6, 6), result.shape)
+        for joint in range(1, 7):
+            moved_angles = self.angles.copy()
+            moved_angles[joint] += epsilon
+            velocity = (get_tip_frame(moved_angles)[:3, 3] - get_tip_frame(self.angles)[:3, 3]) / epsilon
+            np.testing.assert_allclose(velocity, result[:3, joint - 1], atol=1e-4)
+
+
+class DampedLeastSquaresTests(unittest.TestCase):
+
+    def setUp(self):
+        self.pose = Pose(5, 30, 15, alpha=0.2, gamma=-0.3)
+        self.angles = inverse_kinematics(self.pose, test_config)
+
+    def test_converges_from_nearby_angles(self):
+        angles, error = inverse_kinematics_dls(self.pose, test_config, self.angles + 0.1)
+
+        self.assertLess(error, 1e-3)
+        np.testing.assert_allclose(self.angles[1:], angles[1:], atol=1e-3)
+
+    def test_out_of_reach_stays_within_joint_limits(self):
+        angles, error = inverse_kinematics_dls(Pose(0, 80, 15), test_config, self.angles)
+
+        self.assertTrue(np.all(np.isfinite(angles)))
+        self.assertTrue(np.all(angles[1:] >= joint_limits[1:, 0]))
+        self.assertTrue(np.all(angles[1:] <= joint_limits[1:, 1]))
+        self.assertGreater(error, 1)
+
+    def test_fallback(self):
+        angles, is_exact = inverse_kinematics_with_fallback(self.pose, test_config, self.angles)
+        self.assertTrue(is_exact)
+        np.testing.assert_allclose(self.angles, angles)
+
+        far_away = Pose(0, 80, 15)
+        angles, is_exact = inverse_kinematics_with_fallback(far_away, test_config, self.angles)
+        self.assertFalse(is_exact)
+        # moved from the previous angles towards the target
+        self.assertLess(np.linalg.norm(self.get_tip(angles) - [0, 80, 15]),
+                        np.linalg.norm(self.get_tip(self.angles) - [0, 80, 15]))
+
+    @staticmethod
+    def get_tip(angles):
+        _, _, _, _, tip = forward_position_kinematics(angles, test_config)
+        return tip
@@ -0,0 +1,62 @@
+import unittest
+
+import numpy as np
+import pybullet as p
+
+from src.kinematics.collision import get_clearances, get_trajectory_clearances, get_batch_clearances
+from src.kinematics.jit_warmup import warmup_kernels, KERNEL_SIGNATURES, get_kernel
+from src.kinematics.kinematics import inverse_kinematics, batch_inverse_kinematics, \
+    batch_forward_position_kinematics, batch_forward_orientation_kinematics, batch_jacobian_transpose_on_f
+from src.kinematics.kinematics_utils import RobotConfig, Pose, calculate_euler_matrices_from_angles
+from src.reinforcementlearning.environment.repulsive_force_engine import RepulsiveForceEngine
+from src.reinforcementlearning.environment.robot_env_utils import get_target_points, get_attractive_force_world, \
+    get_control_point_positions, get_repulsive_forces_batch, fill_observation
+from src.simulation.simulation_utils import start_simulated_robot
+from src.utils.obstacle import BoxObstacle
+
+# integer link lengths, like the configs in global_constants
+test_config = RobotConfig(d1=13.92, a2=20, d4=22, d6=5)
+
+
+class WarmupTests(unittest.TestCase):
+
+    def test_reports_every_kernel(self):
+        compile_times = warmup_kernels()
+
+        self.assertEqual(len(KERNEL_SIGNATURES), len(compile_times))
+        for kernel_time in compile_times.values():
+            self.assertGreaterEqual(kernel_time, 0)
+
+    def test_no_compilation_after_warmup(self):
+        warmup_kernels()
+        signature_counts = {name: len(get_kernel(module, name).signatures) for module, name, _ in KERNEL_SIGNATURES}
+
+        pose = Pose(5, 25, 20, flip=1)
+        angles = inverse_kinematics(pose, test_config)
+        inverse_kinematics(Pose(5, 25, 20, euler_matrix=np.eye(3)[:, ::-1]), test_config)
+        all_angles = batch_inverse_kinematics(np.array([[5, 25, 20]]), np.eye(3)[np.newaxis], False, test_config)
+        batch_forward_position_kinematics(all_angles, test_config)
+        batch_forward_orientation_kinematics(all_angles)
+        batch_jacobian_transpose_on_f(np.zeros((1, 3, 3)), all_angles, test_config, 2)
+        calculate_euler_matrices_from_angles(np.zeros(2), np.zeros(2), np.zeros(2))
+        get_clearances(angles, test_config, boxes=[[0, 30, 10, 5, 5, 10, 0]], floor_height=0)
+        get_trajectory_clearances(all_angles, test_config)
+        boxes = np.array([[[0, 30, 10, 5, 5, 10, 0]]])
+        get_batch_clearances(all_angles, test_config, boxes, [1])
+        get_repulsive_forces_batch(get_control_point_positions(all_angles, test_config, 10), [7, 7, 4.5], [1, 2, 1],
+                                   boxes, [1])
+        fill_observation(np.zeros(17, dtype=np.float32), np.zeros(3), np.zeros((3, 3)), pose)
+        simulated_robot = start_simulated_robot(use_gui=False)
+        obstacle = BoxObstacle([10, 10, 10], [0, 30, 0])
+        obstacle.build(simulated_robot.physics_client)
+        RepulsiveForceEngine(simulated_robot.control_points, [obstacle], repulsive_cutoff_distance=8,
+                             clip_force=6).get_forces(np.array([[0, 20, 10], [0, 25, 10], [0, 30, 10]]))
+        p.disconnect(simulated_robot.physics_client)
+        _, point_2, point_3 = get_target_points(pose, 5)
+        get_attractive_force_world(np.array([[0, 0, 0], [1, 2, 3], [4, 5, 6]]), np.array([point_2, point_2, point_3]),
+                                   attractive_cutoff_distance=2, weights=[1, 2, 1])
+
+        self.assertEqual(7, angles.shape[0])
+        for module, name, _ in KERNEL_SIGNATURES:
+            self.assertEqual(signature_counts[name], len(get_kernel(module, name).signatures),
+                             '{} was compiled again'.format(name))
@@ -1,7 +1,13 @@
 import unittest
+from copy import copy
 
-from src.kinematics.kinematics import inverse_kinematics
-from src.kinematics.kinematics_utils import RobotConfig, Pose
+import jsonpickle
+
+from src.kinematics.kinematics import inverse_kinematics, batch_inverse_kinematics, forward_position_kinematics, \
+    forward_orientation_kinematics, jacobian_transpose_on_f, batch_forward_position_kinematics, \
+    batch_forward_orientation_kinematics, batch_jacobian_transpose_on_f, inverse_kinematics_closest, \
+    calculate_ik_all_solutions
+from src.kinematics.kinematics_utils import RobotConfig, Pose, PoseArray
 from numpy import pi, sin, cos
 import numpy as np
 
@@ -55,6 +61,142 @@ class InverseKinematicsTests(unittest.TestCase):
                                    .format(i, actual_angles[i], expected[i]))
 
 
+class BatchInverseKinematicsTests(unittest.TestCase):
+
+    def test_matches_single_pose_solution(self):
+        poses = [Pose(x, 25, z, flip=flip, alpha=0.3 * x / 20, gamma=-0.2 * z / 20)
+                 for x in np.linspace(-20, 20, 5) for z in np.linspace(5, 25, 4) for flip in (False, True)]
+        positions = np.array([[pose.x, pose.y, pose.z] for pose in poses])
+        rotation_matrices = np.array([pose.get_euler_matrix() for pose in poses])
+        flips = np.array([pose.flip for pose in poses])
+
+        angles = batch_inverse_kinematics(positions, rotation_matrices, flips, test_config)
+
+        self.assertEqual((len(poses), 7), angles.shape)
+        for i, pose in enumerate(poses):
+            np.testing.assert_allclose(inverse_kinematics(pose, test_config), angles[i], atol=1e-12)
+
+    def test_single_flip_for_all_poses(self):
+        pose = Pose(0, test_config.d4 * sin(pi / 4) + test_config.d6,
+                    (test_config.d1 + test_config.a2) - test_config.d4 * cos(pi / 4))
+        positions = np.array([[pose.x, pose.y, pose.z]] * 3)
+        rotation_matrices = np.array([pose.get_euler_matrix()] * 3)
+
+        angles = batch_inverse_kinematics(positions, rotation_matrices, False, test_config)
+
+        for row in angles:
+            np.testing.assert_allclose([0, pi / 2, pi / 2, -pi / 4, 0.0, pi / 4, 0.0], row, atol=1e-2)
+
+    def test_wrong_shapes(self):
+        self.assertRaises(ValueError, lambda: batch_inverse_kinematics(np.zeros((2, 2)), np.zeros((2, 3, 3)),
+                                                                       False, test_config))
+        self.assertRaises(ValueError, lambda: batch_inverse_kinematics(np.zeros((2, 3)), np.zeros((3, 3, 3)),
+                                                                       False, test_config))
+
+
+class BatchForwardKinematicsTests(unittest.TestCase):
+
+    def setUp(self):
+        random_generator = np.random.default_rng(42)
+        self.angles = random_generator.uniform(-pi, pi, (20, 7))
+        self.forces = random_generator.normal(size=(20, 3, 3))
+
+    def test_forward_position_kinematics(self):
+        points = batch_forward_position_kinematics(self.angles, test_config)
+
+        self.assertEqual((20, 5, 3), points.shape)
+        for i in range(self.angles.shape[0]):
+            np.testing.assert_allclose(np.array(forward_position_kinematics(self.angles[i], test_config)), points[i],
+                                       atol=1e-12)
+
+    def test_forward_orientation_kinematics(self):
+        orientations = batch_forward_orientation_kinematics(self.angles)
+
+        self.assertEqual((20, 3, 3), orientations.shape)
+        for i in range(self.angles.shape[0]):
+            np.testing.assert_allclose(forward_orientation_kinematics(self.angles[i]), orientations[i], atol=1e-12)
+
+    def test_jacobian_transpose_on_f(self):
+        joint_forces = batch_jacobian_transpose_on_f(self.forces, self.angles, test_config, 11.2)
+
+        self.assertEqual((20, 7), joint_forces.shape)
+        for i in range(self.angles.shape[0]):
+            np.testing.assert_allclose(jacobian_transpose_on_f(self.forces[i], self.angles[i], test_config, 11.2),
+                                       joint_forces[i], atol=1e-12)
+
+    def test_forward_kinematics_of_inverse_kinematics(self):
+        pose = Pose(10, 25, 15, alpha=0.2, gamma=-0.3)
+        angles = inverse_kinematics(pose, test_config)
+
+        tip = batch_forward_position_kinematics(np.array([angles]), test_config)[0, 4]
+        orientation = batch_forward_orientation_kinematics(np.array([angles]))[0]
+
+        np.testing.assert_allclose([pose.x, pose.y, pose.z], tip, atol=1e-6)
+        np.testing.assert_allclose(pose.get_euler_matrix(), orientation, atol=1e-6)
+
+
+class InverseKinematicsClosestTests(unittest.TestCase):
+
+    def setUp(self):
+        self.pose = Pose(10, 25, 15, alpha=0.2, gamma=-0.3)
+
+    def test_every_solution_reaches_the_pose(self):
+        for allow_elbow_down in [False, True]:
+            for flip in [False, True]:
+                for elbow_up in [True, False]:
+                    if not allow_elbow_down and not elbow_up:
+                        continue
+                    # start at a solution, it should be picked again
+                    solution = self.get_solution(flip, elbow_up)
+                    angles, closest_flip, closest_elbow_up = inverse_kinematics_closest(
+                        self.pose, test_config, solution, allow_elbow_down=allow_elbow_down)
+
+                    self.assertEqual((flip, elbow_up), (closest_flip, closest_elbow_up))
+                    np.testing.assert_allclose(solution, angles)
+                    self.assert_reaches_pose(angles)
+
+    def test_same_as_inverse_kinematics(self):
+        for flip in [False, True]:
+            self.pose.flip = flip
+            np.testing.assert_allclose(inverse_kinematics(self.pose, test_config), self.get_solution(flip, True))
+
+    def test_nearby_angles_pick_the_same_branch(self):
+        flipped = self.get_solution(True, True)
+        current_angles = flipped + 0.1
+
+        angles, flip, elbow_up = inverse_kinematics_closest(self.pose, test_config, current_angles)
+
+        self.assertTrue(flip)
+        self.assertTrue(elbow_up)
+
+    def test_joint_speeds_are_used(self):
+        up, down = self.get_solution(False, True), self.get_solution(False, False)
+        # halfway between both solutions, joint 2 and 3 decide which one is closest
+        current_angles = (up + down) / 2
+        current_angles[2] = up[2]
+        current_angles[3] = down[3]
+        slow_joint_2 = np.ones(7)
+        slow_joint_2[2] = 0.01
+        slow_joint_3 = np.ones(7)
+        slow_joint_3[3] = 0.01
+
+        _, _, elbow_up = inverse_kinematics_closest(self.pose, test_config, current_angles, slow_joint_2)
+        self.assertTrue(elbow_up)
+        _, _, elbow_up = inverse_kinematics_closest(self.pose, test_config, current_angles, slow_joint_3)
+        self.assertFalse(elbow_up)
+
+    def get_solution(self, flip, elbow_up):
+        t = self.pose.get_euler_matrix()
+        solutions = calculate_ik_all_solutions(self.pose.x, self.pose.y, self.pose.z, test_config.d1, test_config.d6,
+                                               test_config.a2, test_config.d4, t)
+        return solutions[(0 if elbow_up else 2) + (1 if flip else 0)]
+
+    def assert_reaches_pose(self, angles):
+        _, _, _, _, tip = forward_position_kinematics(angles, test_config)
+        np.testing.assert_allclose([self.pose.x, self.pose.y, self.pose.z], tip, atol=1e-6)
+        np.testing.assert_allclose(self.pose.get_euler_matrix(), forward_orientation_kinematics(angles), atol=1e-6)
+
+
 class PoseTest(unittest.TestCase):
 
     def test_default_euler_matrix(self):
@@ -117,3 +259,45 @@ class PoseTest(unittest.TestCase):
 
         self.assertTrue(np.array_equal(matrix, expected_grid),
                         "did not get the expected matrix.Expected: {}, actual: {}".format(expected_grid, matrix))
+
+    def test_euler_matrix_is_cached_until_the_angles_change(self):
+        pose = Pose(0, 0, 0, alpha=0.3)
+        matrix = pose.get_euler_matrix()
+
+        self.assertIs(matrix, pose.get_euler_matrix())
+
+        pose.gamma = 0.5
+        np.testing.assert_allclose(Pose(0, 0, 0, alpha=0.3, gamma=0.5).get_euler_matrix(), pose.get_euler_matrix())
+
+    def test_copy_and_json(self):
+        pose = Pose(1, 2, 3, flip=True, alpha=0.3, beta=0.1, gamma=-0.2, time=4)
+
+        self.assertEqual(pose, copy(pose))
+        self.assertEqual(pose, jsonpickle.decode(jsonpickle.encode(pose)))
+        self.assertEqual(1.0, pose.to_json()['x'])
+
+
+class PoseArrayTests(unittest.TestCase):
+
+    def setUp(self):
+        self.poses = [Pose(i, 2 * i, 3, flip=i % 2 == 0, alpha=0.1 * i, time=i) for i in range(40)]
+        self.poses.append(Pose(1, 2, 3, euler_matrix=np.eye(3)))
+
+    def test_round_trip(self):
+        pose_array = PoseArray(capacity=1)
+        for pose in self.poses:
+            pose_array.append(pose)
+
+        self.assertEqual(len(self.poses), len(pose_array))
+        self.assertEqual(self.poses, pose_array.to_poses())
+        self.assertEqual(self.poses[-1], pose_array[-1])
+        np.testing.assert_allclose([pose.x for pose in self.poses], pose_array.x)
+
+    def test_slice(self):
+        pose_array = PoseArray.from_poses(self.poses)
+
+        reversed_array = pose_array[::-1]
+
+        self.assertEqual(self.poses[::-1], list(reversed_array))
+        np.testing.assert_allclose(np.array([pose.get_euler_matrix() for pose in self.poses[::-1]]),
+                                   reversed_array.euler_matrices)
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.kinematics.reachability import build_reachability_grid, ReachabilityGrid, load_reachability_grid
+from src.kinematics.kinematics_utils import RobotConfig
+from src.utils.movement_utils import check_workspace_limits
+
+test_config = RobotConfig(d1=13.92, a2=20, d4=22, d6=12)
+
+
+class DummyWorkspaceLimits:
+    radius_min = 20
+    radius_max = 57
+    y_min = 12.1
+    z_min = 0
+    reachability_grid = None
+
+
+class ReachabilityGridTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.grid = build_reachability_grid(test_config, DummyWorkspaceLimits, resolution=2.0,
+                                           alphas=[-np.pi / 2, 0, np.pi / 2], gammas=[0])
+
+    def test_reachable(self):
+        self.assertTrue(self.grid.is_reachable(0, 30, 10))
+        self.assertTrue(self.grid.is_reachable(20, 20, 10, alpha=-np.pi / 2))
+
+    def test_not_reachable(self):
+        # too far away for the arm
+        self.assertFalse(self.grid.is_reachable(0, 56, 5))
+        # outside of the grid
+        self.assertFalse(self.grid.is_reachable(0, -10, 10))
+        self.assertFalse(self.grid.is_reachable(0, 30, -10))
+
+    def test_vectorized_lookup(self):
+        x = np.array([0, 0, 0])
+        y = np.array([30, 56, -10])
+        z = np.array([10, 5, 10])
+
+        reachable = self.grid.is_reachable(x, y, z, alpha=np.zeros(3))
+
+        np.testing.assert_array_equal([True, False, False], reachable)
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'grid')
+            self.grid.save(path)
+
+            loaded = ReachabilityGrid.load(path)
+
+            self.assertIsInstance(loaded.reachable, np.memmap)
+            np.testing.assert_array_equal(self.grid.reachable, loaded.reachable)
+            self.assertEqual(self.grid.is_reachable(0, 30, 10), loaded.is_reachable(0, 30, 10))
+            self.assertIsNotNone(load_reachability_grid(path, test_config))
+            self.assertIsNone(load_reachability_grid(path, RobotConfig(d1=10, a2=20, d4=22, d6=12)))
+            del loaded
+
+    def test_check_workspace_limits_uses_grid(self):
+        class LimitsWithGrid(DummyWorkspaceLimits):
+            reachability_grid = self.grid
+
+        # the last step is within the radius limits, but the arm can't reach it with this orientation
+        x_steps, y_steps, z_steps = np.array([0, 0, 30.0]), np.array([30.0, 35.0, 40.0]), np.array([10.0, 10.0, 10.0])
+
+        self.assertTrue(check_workspace_limits(x_steps, y_steps, z_steps, 3, DummyWorkspaceLimits))
+        self.assertFalse(check_workspace_limits(x_steps, y_steps, z_steps, 3, LimitsWithGrid))
@@ -2,7 +2,8 @@ import unittest
 import numpy as np
 
 from src.reinforcementlearning.environment.occupancy_grid_util import is_point_in_obstacle, get_height_tallest_obstacle, \
-    create_hilbert_curve_from_obstacles, create_occupancy_grid_from_obstacles
+    create_hilbert_curve_from_obstacles, create_occupancy_grid_from_obstacles, create_obstacle_maps, \
+    get_grid_cell_centers, get_obstacles_for_point, max_height
 from src.utils.obstacle import BoxObstacle
 
 
@@ -120,3 +121,60 @@ class OccupancyGridTest(unittest.TestCase):
         self.assertTrue(np.array_equal(grid, expected_grid),
                         "did not get the expected array. Expected: {}, actual: {}".format(expected_grid, grid))
 
+
+def get_reference_heights(points, obstacles):
+    """The height channel calculated one point at a time"""
+    heights = np.zeros(len(points))
+    for i, point in enumerate(points):
+        intersecting_obstacles = get_obstacles_for_point(point, obstacles)
+        if intersecting_obstacles.size != 0:
+            heights[i] = min(1.0, get_height_tallest_obstacle(intersecting_obstacles) / max_height)
+    return heights
+
+
+class ObstacleMapsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.obstacles = [BoxObstacle([10, 20, 10], [10, 20, 0], alpha=np.pi / 4),
+                          BoxObstacle([10, 20, 50], [-10, 20, 0], alpha=-np.pi / 4),
+                          BoxObstacle([5, 5, 20], [-8, 15, 0], alpha=0.3)]
+
+    def test_high_resolution_grid_same_as_per_point(self):
+        grid = create_obstacle_maps(self.obstacles, 40, 40, 64, 64, channels=('height',))
+
+        cell_centers = get_grid_cell_centers(40, 40, 64, 64).reshape(-1, 2)
+        expected_grid = get_reference_heights(cell_centers, self.obstacles).reshape(64, 64)
+
+        self.assertEqual((64, 64, 1), grid.shape)
+        self.assertEqual(np.float32, grid.dtype)
+        np.testing.assert_allclose(grid[:, :, 0], expected_grid, atol=1e-6)
+
+    def test_hilbert_curve_same_as_per_point(self):
+        curve = create_hilbert_curve_from_obstacles(self.obstacles, grid_len_x=40, grid_len_y=40, iteration=4)
+
+        # the cells along the curve are the cells of a 16 by 16 grid
+        grid = create_occupancy_grid_from_obstacles(self.obstacles, 40, 40, 2.5)
+        self.assertAlmostEqual(np.sum(grid), np.sum(curve), places=3)
+        self.assertTrue(np.array_equal(np.sort(grid.ravel()), np.sort(curve.astype(np.float32))))
+
+    def test_clearance(self):
+        obstacle = BoxObstacle([2, 2, 10], [0, 5, 0])
+        maps = create_obstacle_maps([obstacle], 10, 10, 10, 10, max_clearance=4)
+
+        heights, clearances = maps[:, :, 0], maps[:, :, 1]
+        # cells 4 and 5 along x are at -0.5 and 0.5, cells 4 and 5 along y at 4.5 and 5.5
+        self.assertEqual(0, clearances[4, 4])
+        self.assertAlmostEqual(0.25, heights[4, 4])
+        self.assertAlmostEqual(0.5 / 4, clearances[4, 6])  # y is 6.5, 0.5 from the side of the obstacle
+        self.assertAlmostEqual(np.sqrt(2 * 1.5 ** 2) / 4, clearances[7, 7])  # 1.5 from a corner in x and y
+        self.assertEqual(1, clearances[0, 0])
+
+    def test_no_obstacles(self):
+        maps = create_obstacle_maps([], 10, 10, 5, 5)
+
+        self.assertTrue(np.array_equal(maps[:, :, 0], np.zeros((5, 5))))
+        self.assertTrue(np.array_equal(maps[:, :, 1], np.ones((5, 5))))
+
+    def test_unknown_channel(self):
+        with self.assertRaises(ValueError):
+            create_obstacle_maps(self.obstacles, channels=('color',))
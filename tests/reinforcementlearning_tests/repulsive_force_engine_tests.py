@@ -0,0 +1,83 @@
+import unittest
+
+import numpy as np
+import pybullet as p
+
+from src.kinematics.kinematics_utils import Pose
+from src.reinforcementlearning.environment.repulsive_force_engine import RepulsiveForceEngine, get_box_aabbs
+from src.reinforcementlearning.environment.robot_env_utils import get_repulsive_forces_world
+from src.robot_controllers.simulated_robot.simulated_robot_controller import read_control_point_positions
+from src.simulation.simulation_utils import start_simulated_robot
+from src.utils.obstacle import BoxObstacle
+
+
+class BoundingBoxTests(unittest.TestCase):
+
+    def test_rotated_box(self):
+        boxes = np.array([[0, 30, 5, 2, 1, 5, 0], [0, 30, 5, 1, 1, 5, np.pi / 4]], dtype=np.float64)
+
+        aabbs = get_box_aabbs(boxes)
+
+        np.testing.assert_allclose([-2, 29, 0, 2, 31, 10], aabbs[0])
+        np.testing.assert_allclose([-np.sqrt(2), 30 - np.sqrt(2), 0, np.sqrt(2), 30 + np.sqrt(2), 10], aabbs[1])
+
+
+class RepulsiveForceEngineTests(unittest.TestCase):
+
+    def setUp(self):
+        self.simulated_robot = start_simulated_robot(use_gui=False)
+        self.physics_client = self.simulated_robot.physics_client
+        self.floor = BoxObstacle([1000, 1000, 1], [0, 0, -1])
+        self.floor.build(self.physics_client)
+        self.control_points = self.simulated_robot.control_points
+
+    def tearDown(self):
+        p.disconnect(self.physics_client)
+
+    def get_forces(self, obstacles, pose):
+        self.simulated_robot.reset_to_pose(pose)
+        p.stepSimulation(physicsClientId=self.physics_client)
+        obstacle_ids = [obstacle.obstacle_id for obstacle in obstacles] + [self.floor.obstacle_id]
+        expected = get_repulsive_forces_world(self.simulated_robot.body_id, np.array(self.control_points),
+                                              obstacle_ids, self.physics_client, repulsive_cutoff_distance=8,
+                                              clip_force=6)
+        engine = RepulsiveForceEngine(self.control_points, obstacles, repulsive_cutoff_distance=8, clip_force=6)
+        positions = read_control_point_positions(self.control_points, compute_forward_kinematics=True)
+        return expected, engine.get_forces(positions)
+
+    def assert_forces(self, expected, forces):
+        """the simulation approximates the distance to edges and corners of boxes, so the directions can differ a bit"""
+        np.testing.assert_allclose(np.linalg.norm(expected, axis=1), np.linalg.norm(forces, axis=1), atol=0.05)
+        for expected_force, force in zip(expected, forces):
+            if np.linalg.norm(expected_force) > 0.01:
+                cosine = np.dot(expected_force, force) / (np.linalg.norm(expected_force) * np.linalg.norm(force))
+                self.assertGreater(cosine, 0.99)
+
+    def test_same_as_the_simulation(self):
+        obstacles = [BoxObstacle([10, 40, 15], [-10, 35, 0]), BoxObstacle([10, 20, 20], [10, 35, 0], alpha=np.pi / 4)]
+        for obstacle in obstacles:
+            obstacle.build(self.physics_client)
+
+        for pose in [Pose(-20, 15, 10), Pose(0, 25, 25), Pose(20, 20, 12)]:
+            expected, forces = self.get_forces(obstacles, pose)
+
+            self.assert_forces(expected, forces)
+
+    def test_floor_is_a_plane(self):
+        expected, forces = self.get_forces([], Pose(0, 30, 9))
+
+        self.assertGreater(forces[2, 2], 0)
+        self.assert_forces(expected, forces)
+
+    def test_obstacle_beyond_the_cutoff(self):
+        obstacle = BoxObstacle([5, 5, 5], [30, -30, 0])
+        obstacle.build(self.physics_client)
+
+        expected, forces = self.get_forces([obstacle], Pose(-20, 30, 25))
+
+        np.testing.assert_allclose(np.zeros((3, 3)), forces)
+        np.testing.assert_allclose(expected, forces)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,9 +4,12 @@ import numpy as np
 from numpy import pi
 import pybullet as p
 
-from src.kinematics.kinematics_utils import Pose
+from src.kinematics.kinematics import inverse_kinematics
+from src.kinematics.kinematics_utils import Pose, RobotConfig
 from src.reinforcementlearning.environment.robot_env_utils import get_attractive_force_world, get_target_points, \
-    get_repulsive_forces_world, get_clipped_state, get_normalized_current_angles, get_de_normalized_current_angles
+    get_repulsive_forces_world, get_clipped_state, get_normalized_current_angles, get_de_normalized_current_angles, \
+    get_control_point_positions, get_repulsive_forces_batch, fill_observation
+from src.robot_controllers.simulated_robot.simulated_robot_controller import read_control_point_positions
 from src.simulation.simulation_utils import start_simulated_robot
 from src.utils.obstacle import BoxObstacle
 
@@ -95,6 +98,72 @@ class TestRobotEnvUtils(unittest.TestCase):
                                    .format(i, actual_vector[i], expected_vector[i]))
 
 
+class ObservationTests(unittest.TestCase):
+
+    def test_fill_observation(self):
+        observation = np.full(17, np.nan, dtype=np.float32)
+        repulsive_forces = np.array([[0, 0, 0], [0.5, 0, 0], [0, 3, 4]], dtype=np.float64)
+
+        fill_observation(observation, np.array([0, 0, 2.0]), repulsive_forces, Pose(20, 40, 10, alpha=np.pi / 2))
+
+        np.testing.assert_allclose([0, 0, 1, 0, 0, 0, 0.5, 0, 0, 0, 0.6, 0.8, 0.5, 1, 0.25, 0.5, 0], observation,
+                                   rtol=1e-6)
+
+    def test_fill_raw_observation(self):
+        observation = np.zeros(17, dtype=np.float32)
+
+        fill_observation(observation, np.array([0, 0, 2.0]), np.zeros((3, 3)), Pose(20, 40, 10), raw_obs=True)
+
+        self.assertEqual(2, observation[2])
+
+
+class BatchRepulsiveForcesTests(unittest.TestCase):
+
+    def setUp(self):
+        self.radii = np.array([1.0])
+        self.weights = np.array([1.0])
+        self.boxes = np.array([[[0, 0, 5, 1, 1, 5, 0]]], dtype=np.float64)
+
+    def test_floor_pushes_up(self):
+        forces = get_repulsive_forces_batch(np.array([[[20., 0, 2]]]), self.radii, self.weights, self.boxes, [0])
+
+        expected_force = (1 / 1 - 1 / 2) * (1 / 1 ** 2)
+        np.testing.assert_allclose([0, 0, expected_force], forces[0, 0])
+
+    def test_box_pushes_away(self):
+        forces = get_repulsive_forces_batch(np.array([[[2.5, 0, 5]]]), self.radii, self.weights, self.boxes, [1])
+
+        self.assertGreater(forces[0, 0, 0], 0)
+        self.assertAlmostEqual(0, forces[0, 0, 1])
+        self.assertAlmostEqual(0, forces[0, 0, 2])
+
+    def test_only_the_obstacles_of_the_state_are_used(self):
+        control_points = np.array([[[2.5, 0, 5]], [[2.5, 0, 5]]])
+        boxes = np.repeat(self.boxes, 2, axis=0)
+
+        forces = get_repulsive_forces_batch(control_points, self.radii, self.weights, boxes, [1, 0])
+
+        self.assertGreater(forces[0, 0, 0], 0)
+        np.testing.assert_allclose(np.zeros(3), forces[1, 0])
+
+    def test_clipped_force(self):
+        forces = get_repulsive_forces_batch(np.array([[[1.5, 0, 5]]]), self.radii, self.weights, self.boxes, [1],
+                                            clip_force=3)
+
+        np.testing.assert_allclose([3, 0, 0], forces[0, 0])
+
+    def test_control_point_positions(self):
+        robot_config = RobotConfig(d1=13.92, a2=20, d4=22, d6=12)
+        pose = Pose(-20, 15, 10)
+        angles = inverse_kinematics(pose, robot_config)
+
+        control_points = get_control_point_positions(np.array([angles]), robot_config, 11)
+
+        np.testing.assert_allclose([pose.x, pose.y, pose.z], control_points[0, 2], atol=1e-6)
+        # halfway between the elbow and the wrist
+        self.assertAlmostEqual(11, np.linalg.norm(control_points[0, 1] - control_points[0, 0]))
+
+
 class ObstacleIntegrationTests(unittest.TestCase):
 
     def setUp(self):
@@ -141,6 +210,15 @@ class ObstacleIntegrationTests(unittest.TestCase):
         self.assertAlmostEqual(control_point_3_vec[2], 0, places=2,
                                msg="control point 2 should only point in the x direction, not also in the z direction")
 
+    def test_control_point_positions_in_one_call(self):
+        self.simulated_robot.reset_to_pose(Pose(-20, 15, 10))
+        p.stepSimulation(self.physics_client)
+        control_points = self.simulated_robot.control_points
+
+        positions = read_control_point_positions(control_points)
+
+        np.testing.assert_allclose([control_point.position for control_point in control_points], positions)
+
 
 class AnglesTest(unittest.TestCase):
 
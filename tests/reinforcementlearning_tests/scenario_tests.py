@@ -0,0 +1,33 @@
+import unittest
+
+from src.kinematics.kinematics_utils import Pose
+from src.reinforcementlearning.environment.scenario import Scenario, split_scenarios
+
+
+def get_scenarios(number_of_scenarios):
+    return [Scenario([], Pose(-20, 20, 10), Pose(20, 20, i)) for i in range(number_of_scenarios)]
+
+
+class SplitScenariosTests(unittest.TestCase):
+
+    def test_round_robin(self):
+        scenarios = get_scenarios(5)
+
+        parts = split_scenarios(scenarios, 2)
+
+        self.assertEqual([scenarios[0], scenarios[2], scenarios[4]], parts[0])
+        self.assertEqual([scenarios[1], scenarios[3]], parts[1])
+
+    def test_more_parts_than_scenarios(self):
+        scenarios = get_scenarios(2)
+
+        parts = split_scenarios(scenarios, 3)
+
+        self.assertEqual([[scenarios[0]], [scenarios[1]], [scenarios[0]]], parts)
+
+    def test_no_scenarios(self):
+        self.assertRaises(ValueError, split_scenarios, [], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import functools
+import unittest
+
+import numpy as np
+from tf_agents.environments import py_environment
+from tf_agents.specs import array_spec
+from tf_agents.trajectories import time_step as ts
+
+from src.reinforcementlearning.environment.shared_memory_py_environment import SharedMemoryPyEnvironment
+
+
+class CountingEnv(py_environment.PyEnvironment):
+    """The observation is its id and the number of steps, the reward the sum of the action"""
+
+    def __init__(self, env_id=0, fail=False):
+        super().__init__()
+        if fail:
+            raise ValueError("could not create the environment")
+        self._env_id = env_id
+        self._steps = 0
+        self._observation_spec = {
+            'observation': array_spec.ArraySpec((2,), np.float32),
+            'grid': array_spec.ArraySpec((2, 2, 1), np.float32)
+        }
+        self._action_spec = array_spec.BoundedArraySpec((5,), np.float32, minimum=-1, maximum=1)
+
+    def observation_spec(self):
+        return self._observation_spec
+
+    def action_spec(self):
+        return self._action_spec
+
+    def _get_observation(self):
+        return {'observation': np.array([self._env_id, self._steps], dtype=np.float32),
+                'grid': np.full((2, 2, 1), self._env_id, dtype=np.float32)}
+
+    def _reset(self):
+        self._steps = 0
+        return ts.restart(self._get_observation())
+
+    def _step(self, action):
+        self._steps += 1
+        return ts.transition(self._get_observation(), reward=float(np.sum(action)))
+
+
+class SharedMemoryPyEnvironmentTest(unittest.TestCase):
+
+    def setUp(self):
+        self.env = SharedMemoryPyEnvironment([functools.partial(CountingEnv, env_id=i) for i in range(3)])
+
+    def tearDown(self):
+        self.env.close()
+
+    def test_specs_of_the_workers(self):
+        self.assertTrue(self.env.batched)
+        self.assertEqual(3, self.env.batch_size)
+        self.assertEqual((5,), self.env.action_spec().shape)
+        self.assertEqual((2, 2, 1), self.env.observation_spec()['grid'].shape)
+
+    def test_every_worker_fills_its_row(self):
+        self.env.reset()
+        actions = np.array([[0.1] * 5, [0.2] * 5, [-1] * 5], dtype=np.float32)
+
+        self.env.step(actions)
+        time_step = self.env.step(actions)
+
+        np.testing.assert_allclose([[0, 2], [1, 2], [2, 2]], time_step.observation['observation'])
+        np.testing.assert_allclose([0, 1, 2], time_step.observation['grid'][:, 1, 1, 0])
+        np.testing.assert_allclose([0.5, 1.0, -5], time_step.reward, rtol=1e-6)
+        self.assertTrue(np.all(time_step.is_mid()))
+
+    def test_time_steps_are_copies(self):
+        first = self.env.reset()
+        self.env.step(np.zeros((3, 5), dtype=np.float32))
+
+        np.testing.assert_allclose([0, 0, 0], first.observation['observation'][:, 1])
+
+    def test_failing_constructor(self):
+        self.assertRaises(RuntimeError, SharedMemoryPyEnvironment, [CountingEnv, functools.partial(CountingEnv,
+                                                                                                    fail=True)])
+
+
+if __name__ == '__main__':
+    unittest.main()
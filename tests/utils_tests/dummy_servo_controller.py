@@ -0,0 +1,14 @@
+from src.kinematics.kinematics import inverse_kinematics
+from src.kinematics.kinematics_utils import RobotConfig
+
+
+class DummyServoController:
+    """A servo controller without servos, for the tests of moves that only need the inverse kinematics"""
+
+    def __init__(self):
+        self.robot_config = RobotConfig(d1=10.0, a2=15.0, d4=25.0, d6=5.0)
+        self.ik_calls = 0
+
+    def pose_to_angles(self, pose):
+        self.ik_calls += 1
+        return inverse_kinematics(pose, self.robot_config)
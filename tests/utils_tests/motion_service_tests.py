@@ -0,0 +1,117 @@
+import asyncio
+import threading
+import unittest
+from concurrent.futures import CancelledError
+
+import numpy as np
+import numpy.testing as test
+
+from src.kinematics.kinematics_utils import Pose
+from src.utils.motion_service import MotionService
+from src.utils.movement import PoseToPoseMovement
+from tests.utils_tests.dummy_servo_controller import DummyServoController
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 100.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class BlockingServoController(DummyServoController):
+    """Remembers the setpoints, the first one blocks until released so a move can be caught while playing"""
+
+    def __init__(self, start_pose):
+        super().__init__()
+        self.current_angles = self.pose_to_angles(start_pose)
+        self.sent_angles = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def get_current_angles(self):
+        return self.current_angles
+
+    def move_servos(self, angles):
+        self.started.set()
+        self.release.wait()
+        self.sent_angles.append(angles)
+        self.current_angles = angles
+
+
+def get_move():
+    return PoseToPoseMovement([Pose(-20, 20, 5), Pose(0, 25, 10)], 1)
+
+
+class MotionServiceTests(unittest.TestCase):
+
+    def setUp(self):
+        self.servo_controller = BlockingServoController(Pose(-20, 20, 5))
+        clock = FakeClock()
+        self.service = MotionService(self.servo_controller, clock=clock.time, sleep=clock.sleep)
+
+    def tearDown(self):
+        self.servo_controller.release.set()
+        self.service.shutdown()
+
+    def test_submitted_move_is_played(self):
+        move = get_move()
+
+        handle = self.service.submit(move)
+        stop_pose = handle.result(timeout=10)
+
+        self.assertEqual(move.compiled_trajectory.stop_pose, stop_pose)
+        self.assertEqual(1.0, handle.progress)
+        self.assertFalse(handle.cancelled())
+        test.assert_allclose(move.compiled_trajectory.angles, self.servo_controller.sent_angles)
+
+    def test_moves_to_the_start_first(self):
+        self.servo_controller.current_angles = self.servo_controller.pose_to_angles(Pose(0, 25, 10))
+        move = get_move()
+
+        self.service.submit(move).result(timeout=10)
+
+        sent_angles = np.array(self.servo_controller.sent_angles)
+        self.assertGreater(len(sent_angles), len(move.compiled_trajectory))
+        test.assert_allclose(move.compiled_trajectory.angles[-1], sent_angles[-1])
+
+    def test_cancel_while_playing(self):
+        self.servo_controller.release.clear()
+        handle = self.service.submit(get_move())
+        self.servo_controller.started.wait(timeout=10)
+
+        self.assertTrue(handle.cancel())
+        self.servo_controller.release.set()
+
+        self.assertRaises(CancelledError, handle.result, 10)
+        self.assertTrue(handle.cancelled())
+        self.assertEqual(1, len(self.servo_controller.sent_angles))
+
+    def test_preempt_cancels_playing_and_queued_moves(self):
+        self.servo_controller.release.clear()
+        playing = self.service.submit(get_move())
+        self.servo_controller.started.wait(timeout=10)
+        queued = self.service.submit(get_move(), reverse=True)
+
+        preempting = self.service.submit(get_move(), reverse=True, preempt=True)
+        self.servo_controller.release.set()
+
+        self.assertEqual(Pose(-20, 20, 5), preempting.result(timeout=10))
+        self.assertTrue(playing.cancelled())
+        self.assertTrue(queued.cancelled())
+
+    def test_handle_can_be_awaited(self):
+        async def play():
+            return await self.service.submit(get_move())
+
+        self.assertEqual(Pose(0, 25, 10), asyncio.run(play()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+
+import jsonpickle
+import numpy as np
+import numpy.testing as test
+
+from src.global_constants import WorkSpaceLimits
+from src.kinematics.kinematics_utils import Pose
+from src.utils.move_file import save_moves, load_moves, convert_json_moves, load_json_moves
+from src.utils.movement import SplineMovement, PoseToPoseMovement
+from tests.utils_tests.dummy_servo_controller import DummyServoController
+
+
+def get_moves():
+    spline = SplineMovement([Pose(-20, 20, 5), Pose(0, 30, 10, alpha=0.3), Pose(20, 20, 5, flip=True)], 2,
+                            center=[0, 40, 0], s=1.5)
+    pose_to_pose = PoseToPoseMovement([Pose(20, 20, 5), Pose(0, 25, 10, euler_matrix=np.eye(3))], 1,
+                                      workspace_limits=WorkSpaceLimits)
+    pose_to_pose.compile(DummyServoController())
+    return [spline, pose_to_pose]
+
+
+class MoveFileTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'moves')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_save_and_load(self):
+        moves = get_moves()
+
+        save_moves(self.path, moves)
+        loaded = load_moves(self.path + '.json')
+
+        self.assertIsInstance(loaded[0], SplineMovement)
+        self.assertIsInstance(loaded[1], PoseToPoseMovement)
+        self.assertEqual(moves[0].time, loaded[0].time)
+        self.assertEqual(moves[0].center, loaded[0].center)
+        self.assertEqual(1.5, loaded[0]._s)
+        self.assertIsNone(loaded[0].workspace_limits)
+        self.assertIs(WorkSpaceLimits, loaded[1].workspace_limits)
+        self.assertEqual(moves[0].poses, loaded[0].poses)
+        self.assertTrue(loaded[0].poses[2].flip)
+        test.assert_allclose(np.eye(3), loaded[1].poses[1].get_euler_matrix())
+
+    def test_compiled_trajectory_is_memory_mapped(self):
+        moves = get_moves()
+
+        save_moves(self.path, moves)
+        loaded = load_moves(self.path)
+
+        self.assertIsNone(loaded[0].compiled_trajectory)
+        compiled_trajectory = loaded[1].compiled_trajectory
+        self.assertIsInstance(compiled_trajectory.angles.base, np.memmap)
+        test.assert_allclose(moves[1].compiled_trajectory.angles, compiled_trajectory.angles)
+        test.assert_allclose(moves[1].compiled_trajectory.timestamps, compiled_trajectory.timestamps)
+        self.assertEqual(moves[1].compiled_trajectory.stop_pose, compiled_trajectory.stop_pose)
+        self.assertTrue(compiled_trajectory.matches(DummyServoController().robot_config))
+
+    def test_convert_json_moves(self):
+        moves = get_moves()
+        with open(self.path + '.json', 'w') as file:
+            file.write(jsonpickle.encode(moves, make_refs=False))
+
+        # the old files can only be read after converting them
+        with self.assertRaises(ValueError):
+            load_moves(self.path)
+        convert_json_moves(self.path + '.json')
+        loaded = load_moves(self.path)
+
+        self.assertTrue(os.path.exists(self.path + '.angles.npy'))
+        # the original file is kept next to the converted one
+        self.assertEqual(moves[0].poses, load_json_moves(self.path + '.json.bak')[0].poses)
+        self.assertEqual(moves[0].poses, loaded[0].poses)
+        test.assert_allclose(moves[1].compiled_trajectory.angles, loaded[1].compiled_trajectory.angles)
+
+
+if __name__ == '__main__':
+    unittest.main()
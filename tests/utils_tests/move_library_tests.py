@@ -0,0 +1,91 @@
+import unittest
+
+import numpy as np
+import numpy.testing as test
+
+from src.kinematics.kinematics_utils import Pose
+from src.utils.move_library import MoveLibrary, get_chained_path, blend_junctions, get_arc_lengths
+from src.utils.movement import PoseToPoseMovement, SplineMovement
+from tests.utils_tests.dummy_servo_controller import DummyServoController
+
+
+def get_library():
+    return MoveLibrary({'left': PoseToPoseMovement([Pose(-20, 20, 5), Pose(0, 25, 10)], 1),
+                        'right': PoseToPoseMovement([Pose(0, 25, 10), Pose(20, 20, 5)], 1),
+                        'up': SplineMovement([Pose(20, 22, 5), Pose(15, 25, 15), Pose(10, 25, 20)], 2)})
+
+
+class MoveLibraryTests(unittest.TestCase):
+
+    def test_find_moves_starting_near(self):
+        library = get_library()
+
+        self.assertEqual('right', library.find_moves_starting_near([1, 25, 10])[0][0])
+        self.assertEqual([], library.find_moves_starting_near([0, 40, 40], max_distance=5))
+        self.assertEqual('left', library.find_moves_ending_near([0, 26, 10])[0][0])
+
+    def test_find_next_moves(self):
+        library = get_library()
+
+        self.assertEqual(['right'], [name for name, _ in library.find_next_moves('left')])
+        self.assertEqual(['up'], [name for name, _ in library.find_next_moves('right', max_distance=5)])
+
+    def test_index_is_updated(self):
+        library = get_library()
+        library.find_moves_starting_near([0, 0, 0])
+
+        library.add('down', PoseToPoseMovement([Pose(0, 40, 10), Pose(0, 40, 5)], 1))
+        library.remove('right')
+
+        self.assertEqual('down', library.find_moves_starting_near([0, 40, 10])[0][0])
+        self.assertNotIn('right', library)
+
+    def test_chain_does_not_stop_at_the_junction(self):
+        library = get_library()
+        servo_controller = DummyServoController()
+
+        angles, timestamps = library.get_chain(['left', 'right'], servo_controller)
+
+        left = library['left'].get_joint_trajectory(servo_controller)[0]
+        right = library['right'].get_joint_trajectory(servo_controller)[0]
+        test.assert_allclose(left[0], angles[0])
+        test.assert_allclose(right[-1], angles[-1])
+        # faster than stopping in between
+        separate_duration = library['left'].compiled_trajectory.duration + library['right'].compiled_trajectory.duration
+        self.assertLess(timestamps[-1], separate_duration)
+        # and somewhere around the junction the robot keeps moving
+        closest = np.argmin(np.linalg.norm(angles[:, 1:] - left[-1, 1:], axis=1))
+        self.assertGreater(np.max(np.abs(angles[closest + 1] - angles[closest - 1])), 1e-3)
+
+    def test_transition_between_moves_that_do_not_connect(self):
+        library = get_library()
+        servo_controller = DummyServoController()
+
+        angles, _ = library.get_chain(['right', 'left'], servo_controller)
+
+        test.assert_allclose(library['left'].get_joint_trajectory(servo_controller)[0][-1], angles[-1])
+        self.assertLess(np.max(np.abs(np.diff(angles[:, 1:], axis=0))), 0.2)
+
+
+class BlendTests(unittest.TestCase):
+
+    def test_corner_is_rounded_off(self):
+        first = np.zeros((11, 7))
+        first[:, 1] = np.linspace(0, 1, 11)
+        second = np.zeros((11, 7))
+        second[:, 1] = 1
+        second[:, 2] = np.linspace(0, 1, 11)
+
+        path, junctions = get_chained_path([first, second])
+        blended = blend_junctions(path, junctions, 0.2)
+
+        self.assertEqual([10], junctions)
+        test.assert_allclose(path[0], blended[0])
+        test.assert_allclose(path[-1], blended[-1])
+        # the corner at (1, 0) is not visited anymore
+        self.assertGreater(np.min(np.linalg.norm(blended[:, 1:3] - [1, 0], axis=1)), 0.05)
+        self.assertTrue(np.all(np.diff(get_arc_lengths(blended)) >= 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,13 +1,19 @@
 import unittest
 
-from src.kinematics.kinematics_utils import Pose
+import jsonpickle
+
+from src.kinematics.kinematics import inverse_kinematics, batch_forward_position_kinematics
+from src.kinematics.kinematics_utils import Pose, RobotConfig
 from src.utils import linalg_utils
 import numpy as np
 from numpy import pi
 import numpy.testing as test
 
 from src.utils.movement_exception import MovementException
-from src.utils.movement_utils import b_spline_curve, b_spline_curve_calculate_only
+from src.utils.movement import SplineMovement, PoseToPoseMovement, LinearMovement, CircularMovement
+from src.utils.movement_utils import b_spline_curve, b_spline_curve_calculate_only, find_first_workspace_violation, \
+    find_first_joint_limit_violation, slerp_orientations
+from tests.utils_tests.dummy_servo_controller import DummyServoController
 
 
 class GetCentreTests(unittest.TestCase):
@@ -194,3 +200,156 @@ class BSplineCurveTests(unittest.TestCase):
         self.assertAlmostEqual(stop_pose.y, pose5.y, places=1)
         self.assertAlmostEqual(stop_pose.z, pose5.z, places=1)
 
+
+class WorkspaceViolationTests(unittest.TestCase):
+
+    def test_first_violating_step(self):
+        x_steps = np.array([0.0, 0.0, 0.0, 0.0, 50.0])
+        y_steps = np.array([20.0, 25.0, 30.0, 10.0, 20.0])
+        z_steps = np.array([10.0, 10.0, 10.0, 10.0, 10.0])
+
+        # step 3 is below y_min, step 4 outside of radius_max
+        self.assertEqual(3, find_first_workspace_violation(x_steps, y_steps, z_steps, DummyWorkspaceLimits))
+        self.assertEqual(-1, find_first_workspace_violation(x_steps[:3], y_steps[:3], z_steps[:3],
+                                                            DummyWorkspaceLimits))
+
+    def test_below_z_min(self):
+        index = find_first_workspace_violation([0.0, 0.0], [20.0, 20.0], [10.0, 4.0], DummyWorkspaceLimits)
+
+        self.assertEqual(1, index)
+
+    def test_joint_limits(self):
+        trajectory = np.tile([0, pi / 2, pi / 2, 0, 0, 0, 0], (4, 1))
+        trajectory[2, 5] = pi
+        trajectory[3, 1] = np.nan
+
+        self.assertEqual(2, find_first_joint_limit_violation(trajectory))
+        self.assertEqual(-1, find_first_joint_limit_violation(trajectory[:2]))
+
+
+class JointTrajectoryTests(unittest.TestCase):
+
+    def test_spline_trajectory_is_only_calculated_once(self):
+        poses = [Pose(-20, 20, 5), Pose(0, 30, 10), Pose(20, 20, 5)]
+        move = SplineMovement(poses, 2)
+        servo_controller = DummyServoController()
+
+        trajectory, stop_pose = move.get_joint_trajectory(servo_controller)
+        same_trajectory, _ = move.get_joint_trajectory(servo_controller)
+        reversed_trajectory, _ = move.get_joint_trajectory(servo_controller, reverse=True)
+
+        self.assertIs(trajectory, same_trajectory)
+        self.assertEqual(7, trajectory.shape[1])
+        self.assertEqual(poses[-1], stop_pose)
+        test.assert_allclose(inverse_kinematics(poses[0], servo_controller.robot_config), trajectory[0], atol=1e-6)
+        test.assert_allclose(inverse_kinematics(poses[-1], servo_controller.robot_config), trajectory[-1], atol=1e-6)
+        test.assert_allclose(trajectory[-1], reversed_trajectory[0], atol=1e-6)
+
+    def test_pose_to_pose_trajectory(self):
+        poses = [Pose(-20, 20, 5), Pose(20, 20, 5)]
+        move = PoseToPoseMovement(poses, 1)
+        servo_controller = DummyServoController()
+
+        trajectory, stop_pose = move.get_joint_trajectory(servo_controller)
+        move.get_joint_trajectory(servo_controller)
+
+        self.assertEqual(2, servo_controller.ik_calls)
+        self.assertEqual(poses[-1], stop_pose)
+        test.assert_allclose(servo_controller.pose_to_angles(poses[0]), trajectory[0])
+        test.assert_allclose(servo_controller.pose_to_angles(poses[-1]), trajectory[-1])
+
+    def test_compiled_trajectory_is_stored(self):
+        move = SplineMovement([Pose(-20, 20, 5), Pose(0, 30, 10), Pose(20, 20, 5)], 2)
+        servo_controller = DummyServoController()
+        compiled_trajectory = move.compile(servo_controller)
+
+        restored = jsonpickle.decode(jsonpickle.encode(move))
+        trajectory, stop_pose = restored.get_joint_trajectory(servo_controller)
+
+        self.assertEqual(move.time, restored.time)
+        self.assertEqual(compiled_trajectory.stop_pose, stop_pose)
+        test.assert_allclose(compiled_trajectory.angles, trajectory)
+        test.assert_allclose(compiled_trajectory.timestamps, restored.compiled_trajectory.timestamps)
+
+    def test_compiled_trajectory_of_another_config_is_not_used(self):
+        move = PoseToPoseMovement([Pose(-20, 20, 5), Pose(20, 20, 5)], 1)
+        move.compile(DummyServoController())
+        other_servo_controller = DummyServoController()
+        other_servo_controller.robot_config = RobotConfig(d1=10.0, a2=15.0, d4=25.0, d6=10.0)
+
+        trajectory, _ = move.get_joint_trajectory(other_servo_controller)
+
+        self.assertEqual(2, other_servo_controller.ik_calls)
+        test.assert_allclose(other_servo_controller.pose_to_angles(move.poses[0]), trajectory[0])
+
+    def test_timestamps(self):
+        move = PoseToPoseMovement([Pose(-20, 20, 5), Pose(20, 20, 5)], 1)
+
+        compiled_trajectory = move.compile(DummyServoController())
+
+        self.assertEqual(0, compiled_trajectory.timestamps[0])
+        self.assertTrue(np.all(np.diff(compiled_trajectory.timestamps) >= 0.01 - 1e-12))
+        test.assert_allclose(compiled_trajectory.timestamps[-1] - compiled_trajectory.timestamps[::-1],
+                             compiled_trajectory.reversed_timestamps())
+
+
+def get_tip_positions(trajectory, robot_config):
+    return batch_forward_position_kinematics(trajectory, robot_config)[:, -1]
+
+
+class CartesianMovementTests(unittest.TestCase):
+
+    def test_linear_movement_is_straight(self):
+        servo_controller = DummyServoController()
+        move = LinearMovement([Pose(-10, 25, 10, alpha=0.2), Pose(10, 30, 15, alpha=-0.2)], 2)
+
+        trajectory, stop_pose = move.get_joint_trajectory(servo_controller)
+
+        positions = get_tip_positions(trajectory, servo_controller.robot_config)
+        start, stop = np.array([-10, 25, 10]), np.array([10, 30, 15])
+        direction = (stop - start) / np.linalg.norm(stop - start)
+        offsets = positions - start
+        distances_to_line = np.linalg.norm(offsets - np.outer(offsets @ direction, direction), axis=1)
+        self.assertLess(np.max(distances_to_line), 0.05)
+        test.assert_allclose(start, positions[0], atol=1e-6)
+        test.assert_allclose(stop, positions[-1], atol=1e-6)
+        self.assertEqual(move.poses[-1], stop_pose)
+
+    def test_circular_movement_through_three_poses(self):
+        servo_controller = DummyServoController()
+        move = CircularMovement([Pose(-10, 25, 10), Pose(0, 35, 10), Pose(10, 25, 10)], 2)
+
+        trajectory, _ = move.get_joint_trajectory(servo_controller)
+
+        positions = get_tip_positions(trajectory, servo_controller.robot_config)
+        # the circle through the 3 points has its centre at (0, 25, 10) and a radius of 10
+        test.assert_allclose(10, np.linalg.norm(positions - [0, 25, 10], axis=1), atol=0.05)
+        self.assertGreater(np.max(positions[:, 1]), 34.9)
+
+    def test_circular_movement_around_center(self):
+        servo_controller = DummyServoController()
+        center = [0, 40, 10]
+        move = CircularMovement([Pose(-10, 30, 10), Pose(10, 30, 10)], 2, center=center)
+
+        trajectory, _ = move.get_joint_trajectory(servo_controller)
+
+        positions = get_tip_positions(trajectory, servo_controller.robot_config)
+        test.assert_allclose(np.sqrt(200), np.linalg.norm(positions - center, axis=1), atol=0.05)
+        # the short way around, in front of the center
+        self.assertLess(np.min(positions[:, 1]), 26)
+        # the start pose already looks at the center, the robot does not have to turn first
+        test.assert_allclose(inverse_kinematics(move.poses[0], servo_controller.robot_config), trajectory[0],
+                             atol=1e-6)
+
+    def test_circular_movement_needs_a_center(self):
+        self.assertRaises(ValueError, lambda: CircularMovement([Pose(-10, 25, 10), Pose(10, 25, 10)], 2))
+
+    def test_slerp_orientations(self):
+        start = np.eye(3)
+        stop = np.array([[0.0, -1.0, 0.0], [1.0, 0.0, 0.0], [0.0, 0.0, 1.0]])
+
+        orientations = slerp_orientations(start, stop, np.array([0.0, 0.5, 1.0]))
+
+        test.assert_allclose(start, orientations[0], atol=1e-12)
+        test.assert_allclose(stop, orientations[2], atol=1e-12)
+        test.assert_allclose([np.sqrt(0.5), np.sqrt(0.5)], orientations[1][:2, 0], atol=1e-12)
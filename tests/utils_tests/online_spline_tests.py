@@ -0,0 +1,75 @@
+import unittest
+
+import numpy as np
+import numpy.testing as test
+
+from src.kinematics.kinematics_utils import Pose, calculate_euler_matrix_from_angles
+from src.utils.online_spline import FixedLagSplineFilter, PoseStreamFilter
+
+
+class FixedLagSplineFilterTests(unittest.TestCase):
+
+    def test_starts_at_rest(self):
+        spline_filter = FixedLagSplineFilter(3)
+        spline_filter.reset([1.0, 2.0])
+
+        smoothed = spline_filter.update([1.0, 2.0])
+
+        test.assert_allclose([1.0, 2.0], smoothed)
+
+    def test_constant_input_is_reached(self):
+        spline_filter = FixedLagSplineFilter(3)
+        spline_filter.reset([0.0])
+
+        outputs = [spline_filter.update([5.0])[0] for _ in range(20)]
+
+        self.assertAlmostEqual(5.0, outputs[-1])
+        self.assertTrue(np.all(np.diff(outputs) >= -1e-12), "the output should not overshoot a step")
+
+    def test_ramp_is_followed_with_a_fixed_lag(self):
+        spline_filter = FixedLagSplineFilter(4)
+        spline_filter.reset([0.0])
+
+        outputs = np.array([spline_filter.update([float(i)])[0] for i in range(100)])
+
+        test.assert_allclose(np.arange(80, 100) - spline_filter.lag, outputs[80:])
+
+    def test_output_is_smooth(self):
+        spline_filter = FixedLagSplineFilter(3)
+        spline_filter.reset([0.0])
+        noisy_input = np.random.default_rng(0).normal(size=300)
+
+        outputs = np.array([spline_filter.update([sample])[0] for sample in noisy_input])
+
+        self.assertLess(np.std(np.diff(outputs, 2)), 0.2 * np.std(np.diff(noisy_input, 2)))
+
+
+class PoseStreamFilterTests(unittest.TestCase):
+
+    def test_angles_are_smoothed(self):
+        pose_filter = PoseStreamFilter(2)
+        pose_filter.reset(Pose(0, 20, 10))
+
+        for _ in range(20):
+            pose = pose_filter.update(Pose(10, 20, 10, flip=True, alpha=0.5))
+
+        self.assertAlmostEqual(10, pose.x)
+        self.assertAlmostEqual(0.5, pose.alpha)
+        self.assertTrue(pose.flip)
+
+    def test_euler_matrix_stays_a_rotation(self):
+        pose_filter = PoseStreamFilter(2)
+        pose_filter.reset(Pose(0, 20, 10, euler_matrix=calculate_euler_matrix_from_angles(0.0, 0.0, 0.0)))
+        target = calculate_euler_matrix_from_angles(1.0, 0.0, 0.5)
+
+        pose = pose_filter.update(Pose(0, 20, 10, euler_matrix=target))
+        for _ in range(3):
+            pose = pose_filter.update(Pose(0, 20, 10, euler_matrix=target))
+
+        euler_matrix = pose.get_euler_matrix()
+        test.assert_allclose(np.eye(3), euler_matrix @ euler_matrix.T, atol=1e-9)
+        self.assertAlmostEqual(1.0, np.linalg.det(euler_matrix))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -214,4 +214,26 @@ class Servo3Test(unittest.TestCase):
 
         # then
         target = servo3.target_position
-        self.assertEqual(48, target, "got a wrong target")
\ No newline at end of file
+        self.assertEqual(48, target, "got a wrong target")
+
+    def test_max_joint_velocity_without_gear(self):
+        # given
+        servo = Servo(0, 4096, 0, 2 * pi, EXTENDED_POSITION_CONTROL, profile_velocity=100, profile_acceleration=10)
+
+        # when
+        velocity = servo.get_max_joint_velocity()
+        acceleration = servo.get_max_joint_acceleration()
+
+        # then
+        self.assertAlmostEqual(100 * 0.229 * 2 * pi / 60, velocity)
+        self.assertAlmostEqual(10 * 214.577 * 2 * pi / 3600, acceleration)
+
+    def test_max_joint_velocity_with_gear(self):
+        # given, the joint turns half a revolution for every revolution of the motor
+        servo = Servo(0, 4096, 0, pi, EXTENDED_POSITION_CONTROL, profile_velocity=100, profile_acceleration=10)
+
+        # when
+        velocity = servo.get_max_joint_velocity()
+
+        # then
+        self.assertAlmostEqual(0.5 * 100 * 0.229 * 2 * pi / 60, velocity)
@@ -0,0 +1,123 @@
+import unittest
+
+import numpy as np
+
+from src.utils.trajectory_executor import TrajectoryExecutor
+
+
+class FakeClock:
+    """Time only moves when sleeping or when something takes time"""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class RecordingServoController:
+
+    def __init__(self, clock, write_time=0.0):
+        self.clock = clock
+        self.write_time = write_time
+        self.send_times = []
+        self.sent_angles = []
+
+    def move_servos(self, angles):
+        self.send_times.append(self.clock.time())
+        self.sent_angles.append(angles)
+        self.clock.now += self.write_time
+
+
+class TrajectoryExecutorTests(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def create_executor(self, servo_controller, rate=100):
+        return TrajectoryExecutor(servo_controller, rate=rate, clock=self.clock.time, sleep=self.clock.sleep)
+
+    def test_writing_does_not_add_up(self):
+        # every write takes 3ms, with sleep(dt) after each write 100 steps would take 1.3 seconds
+        servo_controller = RecordingServoController(self.clock, write_time=0.003)
+        trajectory = np.zeros((101, 7))
+
+        stats = self.create_executor(servo_controller).follow(trajectory)
+
+        np.testing.assert_allclose(np.diff(servo_controller.send_times), 0.01)
+        self.assertAlmostEqual(1.0, stats.duration)
+        self.assertAlmostEqual(100, stats.achieved_rate)
+        self.assertEqual(101, stats.setpoints)
+        self.assertEqual(0, stats.overruns)
+
+    def test_next_setpoint_is_calculated_after_sending(self):
+        servo_controller = RecordingServoController(self.clock)
+        calculation_times = []
+
+        def setpoints():
+            for i in range(5):
+                calculation_times.append(self.clock.time())
+                self.clock.now += 0.004  # calculating takes 4ms
+                yield np.full(7, i, dtype=np.float64)
+
+        stats = self.create_executor(servo_controller).follow(setpoints())
+
+        self.assertEqual(5, stats.setpoints)
+        np.testing.assert_allclose(np.diff(servo_controller.send_times), 0.01)
+        # the calculation of setpoint i + 1 starts as soon as setpoint i is sent
+        np.testing.assert_allclose(servo_controller.send_times[:-1], calculation_times[1:])
+
+    def test_overrun_restarts_the_schedule(self):
+        servo_controller = RecordingServoController(self.clock)
+        steps = iter(range(6))
+
+        def get_next_setpoint():
+            step = next(steps, None)
+            if step == 3:
+                self.clock.now += 0.05  # something blocked for 5 periods
+            return None if step is None else np.zeros(7)
+
+        stats = self.create_executor(servo_controller).run(get_next_setpoint)
+
+        send_times = np.array(servo_controller.send_times) - servo_controller.send_times[0]
+        # no burst of setpoints to catch up, after the overrun the steps are a period apart again
+        np.testing.assert_allclose([0, 0.01, 0.02, 0.07, 0.08, 0.09], send_times, atol=1e-9)
+        self.assertEqual(1, stats.overruns)
+        self.assertAlmostEqual(0.04, stats.max_jitter)
+
+    def test_wait_time(self):
+        servo_controller = RecordingServoController(self.clock)
+        trajectory = np.array([[0.0] * 7, [1.0] * 7, [1.0] * 7])
+
+        def get_wait_time(previous, angles):
+            return 0 if previous is None else np.max(np.abs(angles - previous)) * 0.5
+
+        self.create_executor(servo_controller).follow(trajectory, get_wait_time=get_wait_time)
+
+        np.testing.assert_allclose([0.01, 0.5], np.diff(servo_controller.send_times))
+
+    def test_timestamps(self):
+        servo_controller = RecordingServoController(self.clock, write_time=0.002)
+        timestamps = np.array([0, 0.01, 0.05, 0.06, 0.065])
+
+        stats = self.create_executor(servo_controller).follow_timed(np.zeros((5, 7)), timestamps)
+
+        # steps closer together than a period are still sent a period apart
+        np.testing.assert_allclose([0.01, 0.04, 0.01, 0.01], np.diff(servo_controller.send_times))
+        self.assertEqual(0, stats.overruns)
+
+    def test_empty_trajectory(self):
+        servo_controller = RecordingServoController(self.clock)
+
+        stats = self.create_executor(servo_controller).follow(np.zeros((0, 7)))
+
+        self.assertEqual(0, stats.setpoints)
+        self.assertEqual(0, stats.achieved_rate)
+        self.assertEqual([], servo_controller.sent_angles)
+
+
+if __name__ == '__main__':
+    unittest.main()
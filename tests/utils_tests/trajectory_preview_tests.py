@@ -0,0 +1,87 @@
+import importlib.util
+import unittest
+
+import numpy as np
+import numpy.testing as test
+
+from src.global_constants import WorkSpaceLimits
+from src.kinematics.kinematics_utils import Pose, RobotConfig, calculate_euler_matrix_from_angles, \
+    get_orientation_angles
+from src.utils.movement import PoseToPoseMovement, SplineMovement
+from src.utils.trajectory_preview import get_move_hash, get_preview_data, PreviewRenderer
+from tests.utils_tests.dummy_servo_controller import DummyServoController
+
+
+class TrajectoryPreviewTests(unittest.TestCase):
+
+    def test_move_hash_changes_with_the_move(self):
+        robot_config = DummyServoController().robot_config
+        move = PoseToPoseMovement([Pose(-20, 20, 5), Pose(0, 25, 10)], 1)
+
+        self.assertEqual(get_move_hash(move, robot_config),
+                         get_move_hash(PoseToPoseMovement([Pose(-20, 20, 5), Pose(0, 25, 10)], 1), robot_config))
+        self.assertNotEqual(get_move_hash(move, robot_config),
+                            get_move_hash(PoseToPoseMovement([Pose(-20, 20, 5), Pose(0, 25, 11)], 1), robot_config))
+        self.assertNotEqual(get_move_hash(move, robot_config),
+                            get_move_hash(move, RobotConfig(d1=10.0, a2=15.0, d4=25.0, d6=6.0)))
+
+    def test_orientation_angles(self):
+        orientations = np.array([calculate_euler_matrix_from_angles(0.3, 0.2, -0.5),
+                                 calculate_euler_matrix_from_angles(-1.0, 0.0, 1.2)])
+
+        alphas, gammas = get_orientation_angles(orientations)
+
+        test.assert_allclose([0.3, -1.0], alphas)
+        test.assert_allclose([-0.5, 1.2], gammas)
+        test.assert_allclose((0.3, -0.5), get_orientation_angles(orientations[0]))
+
+    def test_violations_of_a_move_that_leaves_the_workspace(self):
+        # dips below the minimum radius between the first and the last pose
+        move = SplineMovement([Pose(-20, 15, 10), Pose(0, 12, 10), Pose(20, 15, 10)], 2,
+                              workspace_limits=WorkSpaceLimits)
+
+        data = get_preview_data(move, DummyServoController())
+
+        self.assertIsNone(data['error'])
+        self.assertEqual((3, 3), data['knots'].shape)
+        self.assertEqual(len(data['angles']), len(data['positions']))
+        test.assert_allclose([-20, 15, 10], data['positions'][0], atol=1e-6)
+        self.assertTrue(np.any(data['violations']))
+        self.assertFalse(data['violations'][0])
+
+    def test_violations_of_a_move_past_the_maximum_radius(self):
+        # the inverse kinematics clamps the targets it can't reach, the angles alone look like a valid path
+        move = SplineMovement([Pose(0, 20, 10), Pose(0, 80, 10), Pose(0, 120, 10)], 2)
+
+        data = get_preview_data(move, DummyServoController())
+
+        self.assertIsNone(data['error'])
+        self.assertEqual(len(data['requested_path']), len(data['violations']))
+        beyond_maximum_radius = np.linalg.norm(data['requested_path'], axis=1) > WorkSpaceLimits.radius_max
+        self.assertTrue(np.any(beyond_maximum_radius))
+        self.assertTrue(np.all(data['violations'][beyond_maximum_radius]))
+        self.assertFalse(data['violations'][0])
+
+    def test_unreachable_stop_pose_of_a_pose_to_pose_move(self):
+        move = PoseToPoseMovement([Pose(-20, 25, 10), Pose(0, 90, 10)], 1)
+
+        data = get_preview_data(move, DummyServoController(), workspace_limits=None)
+
+        self.assertTrue(data['violations'][-1])
+        self.assertFalse(np.any(data['violations'][:-1]))
+
+    @unittest.skipUnless(importlib.util.find_spec('matplotlib'), 'matplotlib is not installed')
+    def test_renderer_caches_by_move_hash(self):
+        renderer = PreviewRenderer(DummyServoController())
+        move = PoseToPoseMovement([Pose(-20, 20, 5), Pose(0, 25, 10)], 1)
+
+        image = renderer.request(move).result(timeout=60)
+        cached = renderer.request(PoseToPoseMovement([Pose(-20, 20, 5), Pose(0, 25, 10)], 1))
+        renderer.shutdown()
+
+        self.assertTrue(image.startswith(b'\x89PNG'))
+        self.assertIs(image, cached.result())
+
+
+if __name__ == '__main__':
+    unittest.main()
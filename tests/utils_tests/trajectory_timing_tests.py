@@ -0,0 +1,100 @@
+import unittest
+
+import numpy as np
+import numpy.testing as test
+
+from src.utils.movement_exception import MovementException
+from src.utils.trajectory_timing import get_time_optimal_trajectory
+
+dt = 0.01
+velocity_limits = np.array([0, 2.0, 1.0, 3.0, 6.0, 6.0, 6.0])
+acceleration_limits = np.array([0, 10.0, 5.0, 15.0, 30.0, 30.0, 30.0])
+
+
+def get_curved_path(steps=200):
+    s = np.linspace(0, 1, steps)
+    path = np.zeros((steps, 7))
+    path[:, 1] = np.sin(np.pi * s)
+    path[:, 2] = 1.5 * s
+    path[:, 3] = -s ** 2
+    path[:, 5] = 0.5 * np.cos(2 * np.pi * s)
+    return path
+
+
+def get_circling_path(steps=300):
+    """Three small circles in the first two joints, the curvature limits the speed more than the velocity limits"""
+    s = np.linspace(0, 1, steps)
+    path = np.zeros((steps, 7))
+    path[:, 1] = 0.3 * np.sin(6 * np.pi * s)
+    path[:, 2] = 0.3 * np.cos(6 * np.pi * s)
+    path[:, 3] = 0.5 * s
+    return path
+
+
+class TimeOptimalTrajectoryTests(unittest.TestCase):
+
+    def test_path_is_followed_from_start_to_end(self):
+        path = get_curved_path()
+
+        angles, timestamps = get_time_optimal_trajectory(path, velocity_limits, acceleration_limits, dt)
+
+        test.assert_allclose(path[0], angles[0])
+        test.assert_allclose(path[-1], angles[-1])
+        test.assert_allclose(np.arange(len(angles)) * dt, timestamps)
+
+    def test_limits_are_respected(self):
+        angles, _ = get_time_optimal_trajectory(get_curved_path(), velocity_limits, acceleration_limits, dt)
+
+        velocities = np.diff(angles, axis=0) / dt
+        accelerations = np.diff(velocities, axis=0) / dt
+        # a little room for the interpolation between the samples of the path
+        self.assertTrue(np.all(np.abs(velocities) <= velocity_limits * 1.02 + 1e-9))
+        self.assertTrue(np.all(np.abs(accelerations) <= acceleration_limits * 1.02 + 1e-9))
+
+    def test_acceleration_limits_are_respected_on_a_high_curvature_path(self):
+        for step_time in [dt, 0.002]:
+            angles, _ = get_time_optimal_trajectory(get_circling_path(), velocity_limits, acceleration_limits,
+                                                    step_time)
+
+            velocities = np.diff(angles, axis=0) / step_time
+            accelerations = np.diff(velocities, axis=0) / step_time
+            self.assertTrue(np.all(np.abs(accelerations) <= acceleration_limits * 1.02 + 1e-9),
+                            "highest acceleration relative to its limit: {}".format(
+                                np.max(np.abs(accelerations[:, 1:]) / acceleration_limits[1:])))
+
+    def test_straight_line_reaches_the_velocity_limit(self):
+        path = np.zeros((100, 7))
+        path[:, 2] = np.linspace(0, 2, 100)
+
+        angles, timestamps = get_time_optimal_trajectory(path, velocity_limits, acceleration_limits, dt)
+
+        # accelerate for 0.2 s over 0.1 rad, cruise 1.8 rad at 1 rad/s and brake for 0.2 s
+        self.assertAlmostEqual(2.2, timestamps[-1], delta=0.05)
+        self.assertAlmostEqual(velocity_limits[2], np.max(np.diff(angles[:, 2]) / dt), delta=0.05)
+
+    def test_higher_limits_make_a_faster_move(self):
+        path = get_curved_path()
+
+        _, slow_timestamps = get_time_optimal_trajectory(path, velocity_limits, acceleration_limits, dt)
+        _, fast_timestamps = get_time_optimal_trajectory(path, 2 * velocity_limits, 4 * acceleration_limits, dt)
+
+        self.assertLess(fast_timestamps[-1], slow_timestamps[-1])
+
+    def test_path_without_movement(self):
+        path = np.tile(get_curved_path()[0], (10, 1))
+
+        angles, timestamps = get_time_optimal_trajectory(path, velocity_limits, acceleration_limits, dt)
+
+        self.assertEqual(1, len(angles))
+        test.assert_allclose([0.0], timestamps)
+
+    def test_angles_that_are_not_finite(self):
+        path = get_curved_path()
+        path[10, 3] = np.nan
+
+        with self.assertRaises(MovementException):
+            get_time_optimal_trajectory(path, velocity_limits, acceleration_limits, dt)
+
+
+if __name__ == '__main__':
+    unittest.main()
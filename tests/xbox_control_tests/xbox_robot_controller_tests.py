@@ -1,10 +1,20 @@
 import unittest
 
-from src.kinematics.kinematics_utils import Pose
+from src.kinematics.kinematics import inverse_kinematics
+from src.kinematics.kinematics_utils import Pose, RobotConfig
 from src.utils.movement import SplineMovement, PoseToPoseMovement
 from src.xbox_control.xbox_robot_controller import determine_time, create_move
 
 
+class DummyServoController:
+
+    def __init__(self):
+        self.robot_config = RobotConfig(d1=13.92, a2=20, d4=22, d6=12)
+
+    def pose_to_angles(self, pose):
+        return inverse_kinematics(pose, self.robot_config)
+
+
 class UtilsTests(unittest.TestCase):
 
     def test_determine_time(self):
@@ -32,7 +42,7 @@ class UtilsTests(unittest.TestCase):
         pose3 = Pose(1, 1, 0)
         poses = [pose1, pose2, pose3]
 
-        move = create_move(None, poses, 1, None, workspace_limits=None)
+        move = create_move(DummyServoController(), poses, 1, None, workspace_limits=None)
         self.assertIsInstance(move, SplineMovement)
 
     def test_not_in_workspace_limits(self):
@@ -47,22 +57,23 @@ class UtilsTests(unittest.TestCase):
         pose3 = Pose(1, 1, 0)
         poses = [pose1, pose2, pose3]
 
-        move = create_move(None, poses, 1, None, workspace_limits=MockWorkSpaceLimits)
+        move = create_move(DummyServoController(), poses, 1, None, workspace_limits=MockWorkSpaceLimits)
         self.assertIsNone(move)
 
     def test_in_workspace_limits(self):
         class MockWorkSpaceLimits:
             radius_min = 0
-            radius_max = 10
+            radius_max = 50
             y_min = 0
             z_min = 0
 
-        pose1 = Pose(1, 1, 1)
-        pose2 = Pose(2, 1, 1)
-        pose3 = Pose(2, 2, 1)
+        # poses the robot can actually reach, the move is compiled and checked for collisions
+        pose1 = Pose(-20, 20, 5)
+        pose2 = Pose(0, 30, 10)
+        pose3 = Pose(20, 20, 5)
         poses = [pose1, pose2, pose3]
 
-        move = create_move(None, poses, 1, None, workspace_limits=MockWorkSpaceLimits)
+        move = create_move(DummyServoController(), poses, 1, None, workspace_limits=MockWorkSpaceLimits)
         self.assertIsInstance(move, SplineMovement)
 
     def test_create_move_pose_to_pose(self):
@@ -70,5 +81,13 @@ class UtilsTests(unittest.TestCase):
         pose2 = Pose(0, 0, 0)
         poses = [pose1, pose2]
 
-        move = create_move(None, poses, 1, None, None)
+        move = create_move(DummyServoController(), poses, 1, None, None)
         self.assertIsInstance(move, PoseToPoseMovement)
+
+    def test_create_move_compiles_the_move(self):
+        poses = [Pose(-20, 20, 5), Pose(0, 30, 10), Pose(20, 20, 5)]
+
+        move = create_move(DummyServoController(), poses, 10, None, None)
+
+        self.assertIsNotNone(move.compiled_trajectory)
+        self.assertEqual(len(move.compiled_trajectory.angles), len(move.compiled_trajectory.timestamps))